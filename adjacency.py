@@ -0,0 +1,244 @@
+"""
+Board topologies: which squares of a minesweeper board are neighbors,
+and a flat index of the neighbors of every square, built once per board
+shape and shared by every board of that shape.
+"""
+
+from __future__ import division
+import array
+import binascii
+from collections import OrderedDict
+import threading
+import config as cfg
+
+class Topology(object):
+    """
+    This class describes which squares are neighbors: the (row, col)
+    steps from a square to its neighbors, one list for squares in even
+    rows and one for squares in odd rows, taken around the edges of the
+    board if wrap is set. Every step must have one that leads back, so
+    that a square is a neighbor of its neighbors; the engines count the
+    mines next to each square by walking out from the mines. offset_rows
+    is set for grids drawn with their odd rows shifted half a square.
+    """
+    def __init__(self, name, steps, odd_steps = None, wrap = False,
+                 offset_rows = False):
+        self.name = name
+        self.steps = (steps, steps if odd_steps is None else odd_steps)
+        self.wrap = wrap
+        self.offset_rows = offset_rows
+        # How many rows or columns away the farthest neighbor is.
+        self.reach = max(max(abs(dr), abs(dc))
+                         for dr, dc in self.steps[0] + self.steps[1])
+
+    def neighbors(self, r, c, width, height):
+        """
+        Return the (row, col) of each neighbor of the square at row r,
+        column c of a width x height board, working them out from the
+        steps. AdjacencyIndex keeps the result for every square.
+        """
+        if not self.wrap:
+            return [(r + dr, c + dc) for dr, dc in self.steps[r & 1]
+                    if 0 <= r + dr < height and 0 <= c + dc < width]
+        result = []
+        for dr, dc in self.steps[r & 1]:
+            square = ((r + dr) % height, (c + dc) % width)
+            if square != (r, c) and square not in result:
+                result.append(square)
+        return result
+
+def box(radius):
+    """
+    Return the steps to every square within radius rows and columns,
+    in row-major order.
+    """
+    return [(dr, dc) for dr in range(-radius, radius + 1)
+            for dc in range(-radius, radius + 1) if dr or dc]
+
+# Largest N of a 'radiusN' topology: a square has (2N + 1) ** 2 - 1
+# neighbors, and the 'array' engine keeps neighbor counts in bytes.
+MAX_RADIUS = 7
+
+# {name: Topology}; 'radiusN' topologies are added when first used.
+TOPOLOGIES = {
+    'square': Topology('square', box(1)),
+    'torus': Topology('torus', box(1), wrap = True),
+    # Odd rows are shifted half a square to the right.
+    'hex': Topology('hex', [(-1, -1), (-1, 0), (0, -1), (0, 1), (1, -1), (1, 0)],
+                    [(-1, 0), (-1, 1), (0, -1), (0, 1), (1, 0), (1, 1)],
+                    offset_rows = True),
+    'knight': Topology('knight', [(-2, -1), (-2, 1), (-1, -2), (-1, 2),
+                                  (1, -2), (1, 2), (2, -1), (2, 1)]),
+}
+
+def get_topology(name):
+    """
+    Return the Topology with the given name: one of TOPOLOGIES, or
+    'radiusN' for the squares within N rows and columns. Raise ValueError
+    for any other name.
+    """
+    topology = TOPOLOGIES.get(name)
+    if topology is None and name.startswith('radius'):
+        radius = name[len('radius'):]
+        if radius.isdigit() and 1 <= int(radius) <= MAX_RADIUS:
+            topology = TOPOLOGIES[name] = Topology(name, box(int(radius)))
+    if topology is None:
+        raise ValueError('unknown topology: {}'.format(name))
+    return topology
+
+class AdjacencyIndex(object):
+    """
+    This class holds the neighbors of every square of a width x height
+    board under a topology, in compressed sparse row form: the flat
+    indices (row * width + col) of the neighbors of square i are
+    ids[offsets[i]:offsets[i + 1]], in the order of the topology's steps.
+    Rows far enough from the top and bottom edges have the same neighbors
+    as any other such row of their parity, moved down, so one of them is
+    worked out and the others are copied from it.
+    """
+    def __init__(self, topology, width, height):
+        self.topology = topology
+        self.width = width
+        self.height = height
+        self.offsets = array.array('I', [0])
+        self.ids = array.array('I')
+        self._masks = None
+        templates = {}
+        reach = topology.reach
+        for r in range(height):
+            base = r * width
+            inner = reach <= r < height - reach
+            template = templates.get(r & 1) if inner else None
+            if template is None:
+                ids, ends = self.row(r)
+                if inner:
+                    templates[r & 1] = ([j - base for j in ids], ends)
+            else:
+                ids = [j + base for j in template[0]]
+                ends = template[1]
+            start = len(self.ids)
+            self.ids.fromlist(ids)
+            self.offsets.fromlist([start + end for end in ends])
+
+    def row(self, r):
+        """
+        Return (ids, ends) for row r: the flat indices of the neighbors of
+        its squares, one square after another, and the number of them up
+        to the end of each square.
+        """
+        width = self.width
+        ids = []
+        ends = []
+        for c in range(width):
+            ids.extend([nr * width + nc for nr, nc in
+                        self.topology.neighbors(r, c, width, self.height)])
+            ends.append(len(ids))
+        return ids, ends
+
+    def count_mines(self, mines):
+        """
+        Return a bytearray holding the number of mines next to each
+        square, given the mine layout as a bytearray of 0/1 values.
+        The layout is read as one big integer with a byte per square, so
+        for each step its mines are moved onto their neighbors with one
+        shift, and masked to the columns (and, if the steps depend on it,
+        the rows) the step is taken from; the bytes never carry, as no
+        square has more than 255 neighbors. Wrapping topologies walk out
+        from each mine through the index instead.
+        """
+        squares = self.width * self.height
+        if self.topology.wrap or not squares:
+            counts = bytearray(squares)
+            offsets = self.offsets
+            ids = self.ids
+            find = mines.find
+            i = find(b'\x01')
+            while i != -1:
+                for j in ids[offsets[i]:offsets[i + 1]]:
+                    counts[j] += 1
+                i = find(b'\x01', i + 1)
+            return counts
+        layout = int(binascii.hexlify(bytes(mines)), 16)
+        total = 0
+        for shift, mask in self.masks():
+            if shift >= 0:
+                total += layout << shift & mask
+            else:
+                total += layout >> -shift & mask
+        digits = '%x' % total
+        return bytearray(binascii.unhexlify(
+            '0' * (2 * squares - len(digits)) + digits))
+
+    def masks(self):
+        """
+        Return a (shift, mask) pair for each step, used by count_mines:
+        the number of bits to shift the layout left, and the integer with
+        a 1 byte for each square the step leads from to a square in the
+        board. The masks are built once per index, and only set when
+        complete, as indexes are shared between threads.
+        """
+        if self._masks is None:
+            width = self.width
+            height = self.height
+            steps = self.topology.steps
+            parities = [0] if steps[0] == steps[1] else [0, 1]
+            pairs = []
+            masks = {}
+            for parity in parities:
+                for dr, dc in steps[parity]:
+                    key = dc, parity
+                    if key not in masks:
+                        row = bytearray(width)
+                        row[max(0, -dc):max(0, width - dc)] = (
+                            b'\x01' * max(0, width - abs(dc)))
+                        if len(parities) == 1:
+                            rows = row * height
+                        else:
+                            empty = bytearray(width)
+                            rows = bytearray().join(
+                                row if r & 1 == parity else empty
+                                for r in range(height))
+                        masks[key] = int(binascii.hexlify(bytes(rows)), 16)
+                    pairs.append((8 * (dr * width + dc), masks[key]))
+            self._masks = pairs
+        return self._masks
+
+    def around(self, i):
+        """
+        Return the flat indices of the neighbors of square i.
+        """
+        return self.ids[self.offsets[i]:self.offsets[i + 1]]
+
+    def neighbors(self, r, c):
+        """
+        Return the (row, col) of each neighbor of the square at row r,
+        column c.
+        """
+        width = self.width
+        i = r * width + c
+        return [divmod(j, width)
+                for j in self.ids[self.offsets[i]:self.offsets[i + 1]]]
+
+_indexes = OrderedDict()
+_indexes_lock = threading.Lock()
+
+def index(topology, width, height):
+    """
+    Return the AdjacencyIndex of a width x height board under the named
+    topology. The cfg.ADJACENCY_CACHE most recently used indexes are kept,
+    so boards of the same shape share one. Boards may be made on several
+    threads at once, so the cache is only touched under _indexes_lock.
+    """
+    key = (topology, width, height)
+    with _indexes_lock:
+        adjacency = _indexes.pop(key, None)
+        if adjacency is not None:
+            _indexes[key] = adjacency
+            return adjacency
+    adjacency = AdjacencyIndex(get_topology(topology), width, height)
+    with _indexes_lock:
+        adjacency = _indexes.pop(key, adjacency)
+        if len(_indexes) >= cfg.ADJACENCY_CACHE:
+            _indexes.popitem(last = False)
+        _indexes[key] = adjacency
+    return adjacency
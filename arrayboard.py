@@ -0,0 +1,350 @@
+"""
+An array-backed Board engine for large minesweeper games.
+"""
+
+from __future__ import division
+from board import (Board, layout_to_str, str_to_layout,
+                   COVERED, REVEALED, FLAGGED, EXPLODED)
+
+class ArrayBoard(Board):
+    """
+    A Board that keeps the mine layout, the player's marks and the
+    number of neighboring mines of each square in flat bytearrays,
+    indexed by row * width + col. The neighbor counts are computed once
+    per layout, by AdjacencyIndex.count_mines, when they are first
+    needed, so dealing a board stays cheap and revealing a square never
+    has to look at its neighbors.
+    The territory and display attributes are read-only views that behave
+    like the lists used by Board.
+    """
+    def __init__(self, territory_str = None, topology = None):
+        """
+        If a string is supplied, create a board from that string.
+        Otherwise, create a random board. See Board for topology.
+        """
+        self.width = 0
+        self.height = 0
+        self.mines = bytearray()
+        self._counts = bytearray()
+        self.state = bytearray()
+        Board.__init__(self, territory_str, topology)
+
+    @property
+    def counts(self):
+        """
+        The number of neighboring mines of each square, computed from the
+        mine array the first time it is read after the layout changes.
+        """
+        if self._counts is None:
+            self._counts = self.adjacency.count_mines(self.mines)
+        return self._counts
+
+    @property
+    def territory_str(self):
+        """
+        The text form of the mine layout, rebuilt from the mine array
+        when the layout was not loaded from text.
+        """
+        if self._territory_str is None and self.width:
+            self._territory_str = layout_to_str(self.layout(), self.width)
+        return self._territory_str
+
+    @territory_str.setter
+    def territory_str(self, value):
+        self._territory_str = value
+
+    def make_territory(self):
+        """
+        Convert a territory string into the mine array, and drop the
+        neighbor counts of the old layout.
+        """
+        if self._territory_str:
+            self.set_layout(*str_to_layout(self._territory_str))
+        elif self.mines:
+            self.set_layout(self.mines, self.width, self.height)
+
+    def load_layout(self, layout, width, height):
+        """
+        Use a bytearray of width * height 0/1 values as the mine layout,
+        and clear all of the player's marks.
+        """
+        self._territory_str = None
+        self.set_layout(layout, width, height)
+
+    def load_territory(self, territory):
+        """
+        Copy the mines of a mapfile.MapFile into the mine array, which
+        reads every square of the map and takes time in proportion to its
+        size; see sparseboard.SparseBoard.load_territory for a
+        constant-time load.
+        """
+        self.load_layout(territory.layout(), territory.width, territory.height)
+        self.dead = False
+
+    def set_layout(self, mines, width, height):
+        """
+        Store the mine array, clear the player's marks and drop the
+        neighbor counts of the old layout, leaving territory_str untouched.
+        """
+        self.mines = mines
+        self.width = width
+        self.height = height
+        self.state = bytearray(width * height)
+        self.make_views()
+        self.make_adjacency(width, height)
+        self.reset_counters(mines.count(b'\x01'), width * height)
+        self._counts = None
+
+    def layout(self):
+        """
+        Return the mine layout as a bytearray of 0/1 values.
+        """
+        return self.mines
+
+    def make_views(self):
+        """
+        Create the territory and display views of the board.
+        """
+        self.territory = _TerritoryView(self)
+        self.display = _DisplayView(self)
+
+    def territory_row(self, r):
+        """
+        Return row r of the mine layout as a string of '0'/'1' characters.
+        """
+        width = self.width
+        return layout_to_str(self.mines[r * width:(r + 1) * width], width)[:-1]
+
+    def has_mine(self, r, c):
+        """
+        Return True if the square at row r, column c contains a mine.
+        """
+        return self.mines[r * self.width + c] == 1
+
+    def mark_mine(self, r, c):
+        """
+        Declare that the square at row r, column c contains a mine.
+        """
+        if self.journal is not None:
+            self.journal.record('flag', r, c)
+        i = r * self.width + c
+        self.tally(r, c, -1)
+        self.state[i] = FLAGGED
+        self.tally(r, c, 1)
+        self.mines_left -= 1
+
+    def unmark_mine(self, r, c):
+        """
+        Undeclare a mine in the sqaure at row r, column c.
+        """
+        if self.journal is not None:
+            self.journal.record('unflag', r, c)
+        i = r * self.width + c
+        self.tally(r, c, -1)
+        self.state[i] = COVERED
+        self.tally(r, c, 1)
+        self.mines_left += 1
+
+    def tally(self, r, c, sign):
+        """
+        Add (sign = 1) or remove (sign = -1) the square at row r, column c
+        from the counters of covered squares and flags used by check_win.
+        """
+        i = r * self.width + c
+        value = self.state[i]
+        if value == COVERED:
+            if self.mines[i]:
+                self.covered_mines += sign
+            else:
+                self.covered_safe += sign
+        elif value == FLAGGED:
+            if self.mines[i]:
+                self.correct_flags += sign
+            else:
+                self.wrong_flags += sign
+
+    def covered_neighbors(self, r, c):
+        """
+        Return only the neighbors that have not yet been marked by the player.
+        """
+        width = self.width
+        state = self.state
+        return [divmod(j, width) for j in self.adjacency.around(r * width + c)
+                if state[j] == COVERED]
+
+    def neighbor_mines(self, r, c):
+        """
+        Return a list of neighbor squares that contain mines.
+        """
+        width = self.width
+        mines = self.mines
+        return [divmod(j, width) for j in self.adjacency.around(r * width + c)
+                if mines[j]]
+
+    def mark_safe(self, r, c, limit = None):
+        """
+        Declare that the square at row r, column c does not contain a mine.
+        If wrong, the player loses. If correct, the square is revealed,
+        and the reveal spreads through every connected square that has no
+        neighboring mines, using an explicit stack of flat indices.
+        See Board.mark_safe for limit.
+        Return a list of (row, col) pairs for the squares that changed.
+        """
+        state = self.state
+        start = r * self.width + c
+        if state[start] == REVEALED:
+            return []
+        if self.journal is not None:
+            self.journal.record('safe', r, c)
+        self.tally(r, c, -1)
+        if self.mines[start]:
+            self.dead = True
+            state[start] = EXPLODED
+            if self.stats is not None:
+                self.stats.record_move(1, 0)
+            return [(r, c)]
+        state[start] = REVEALED
+        self.unfinished.append(start)
+        return self.resume(limit)
+
+    def resume(self, limit = None):
+        """
+        Carry on an unfinished reveal; see Board.resume.
+        """
+        width = self.width
+        state = self.state
+        counts = self.counts
+        offsets = self.adjacency.offsets
+        ids = self.adjacency.ids
+        revealed = []
+        stack = self.unfinished
+        before = len(stack)
+        if limit is None:
+            limit = len(state)
+        depth = before
+        while stack and len(revealed) < limit:
+            i = stack.pop()
+            revealed.append(divmod(i, width))
+            if counts[i]:
+                continue
+            for j in ids[offsets[i]:offsets[i + 1]]:
+                if state[j] == COVERED:
+                    state[j] = REVEALED
+                    stack.append(j)
+            depth = max(depth, len(stack))
+        self.covered_safe -= len(revealed) + len(stack) - before
+        if self.stats is not None:
+            self.stats.record_move(len(revealed), depth)
+        return revealed
+
+    def clear_marks(self):
+        """
+        Forget every mark the player has made.
+        """
+        self.state = bytearray(len(self.mines))
+        self.reset_counters(self.mine_count, len(self.mines))
+
+    def square_state(self, r, c):
+        """
+        Return the state of the square at row r, column c.
+        """
+        return self.state[r * self.width + c]
+
+    def set_square_state(self, r, c, state):
+        """
+        Set the state of the square at row r, column c, without updating
+        the counters.
+        """
+        self.state[r * self.width + c] = state
+
+    def snapshot(self):
+        """
+        Return a copy of the state array; see Board.snapshot.
+        """
+        return bytearray(self.state)
+
+    def restore(self, states):
+        """
+        Replace the state array with a snapshot; see Board.restore.
+        """
+        self.state[:] = states
+        self.recount(states)
+
+    def cell(self, r, c):
+        """
+        Return the display value of the square at row r, column c:
+        the hidden, mine or error character, or a neighbor count.
+        """
+        i = r * self.width + c
+        value = self.state[i]
+        if value == REVEALED:
+            return self.counts[i]
+        return _STATE_CHARS[value]
+
+_STATE_CHARS = {COVERED: ' ', FLAGGED: 'x', EXPLODED: '!'}
+
+class _TerritoryView(object):
+    """
+    A read-only list of '0'/'1' row strings backed by an ArrayBoard,
+    or a subclass, through its territory_row method.
+    """
+    def __init__(self, board):
+        self.board = board
+
+    def __len__(self):
+        return self.board.height
+
+    def __getitem__(self, r):
+        if r < 0:
+            r += self.board.height
+        if not 0 <= r < self.board.height:
+            raise IndexError(r)
+        return self.board.territory_row(r)
+
+    def __iter__(self):
+        for r in range(self.board.height):
+            yield self[r]
+
+class _DisplayView(object):
+    """
+    A read-only list of display rows backed by an ArrayBoard,
+    or a subclass, through its cell method.
+    """
+    def __init__(self, board):
+        self.board = board
+
+    def __len__(self):
+        return self.board.height
+
+    def __getitem__(self, r):
+        if r < 0:
+            r += self.board.height
+        if not 0 <= r < self.board.height:
+            raise IndexError(r)
+        return _DisplayRow(self.board, r)
+
+    def __iter__(self):
+        for r in range(self.board.height):
+            yield _DisplayRow(self.board, r)
+
+class _DisplayRow(object):
+    """
+    A read-only display row of an ArrayBoard.
+    """
+    def __init__(self, board, r):
+        self.board = board
+        self.r = r
+
+    def __len__(self):
+        return self.board.width
+
+    def __getitem__(self, c):
+        if c < 0:
+            c += self.board.width
+        if not 0 <= c < self.board.width:
+            raise IndexError(c)
+        return self.board.cell(self.r, c)
+
+    def __iter__(self):
+        for c in range(self.board.width):
+            yield self.board.cell(self.r, c)
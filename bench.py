@@ -0,0 +1,327 @@
+"""
+Time the board engines, map loading and the pygame renderer, and compare
+the results against a saved baseline.
+
+    python bench.py run --output bench.json
+    python bench.py compare baseline.json bench.json
+"""
+
+from __future__ import division, print_function
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import config as cfg
+import maps
+import mapfile
+
+# Use the most precise clock Python provides.
+_timer = getattr(time, 'perf_counter', time.time)
+
+def measure(func, setup = None, repeat = cfg.BENCH_REPEAT, number = 1):
+    """
+    Time func, repeat times. Before each repeat, setup (if given) is
+    called outside the timing, and its result is passed to func, which
+    is then called number times. Return the seconds per call of each
+    repeat.
+    """
+    times = []
+    for i in range(repeat):
+        arg = setup() if setup is not None else None
+        start = _timer()
+        for j in range(number):
+            func(arg)
+        times.append((_timer() - start) / number)
+    return times
+
+def summarize(times, number):
+    """
+    Return the statistics saved for one benchmark, in seconds per call.
+    """
+    ordered = sorted(times)
+    middle = len(ordered) // 2
+    if len(ordered) % 2:
+        median = ordered[middle]
+    else:
+        median = (ordered[middle - 1] + ordered[middle]) / 2
+    return {'best': ordered[0], 'median': median,
+            'mean': sum(ordered) / len(ordered),
+            'repeat': len(ordered), 'number': number}
+
+def open_board(size):
+    """
+    Return the territory string of a size x size board with no mines,
+    the worst case for a flood fill.
+    """
+    return ('0' * size + '\n') * size
+
+def played_board(engine, level, seed):
+    """
+    Return a board at the given level with about half of its safe
+    squares revealed, as it might be in the middle of a game.
+    """
+    width, mines = cfg.LEVELS[level]
+    rng = random.Random(seed)
+    board = maps.make_board(engine = engine)
+    board.randomize(width, width, mines, rng = rng)
+    target = board.covered_safe // 2
+    while board.covered_safe > target:
+        r, c = rng.randrange(width), rng.randrange(width)
+        if board.has_mine(r, c):
+            if board.display[r][c] == cfg.HIDDEN_CHAR:
+                board.mark_mine(r, c)
+        else:
+            board.mark_safe(r, c)
+    return board
+
+def every_square(board, method):
+    """
+    Call method(r, c) for every square of board.
+    """
+    width = len(board.territory[0])
+    for r in range(len(board.territory)):
+        for c in range(width):
+            method(r, c)
+
+def board_benchmarks(engine, seed, scales, open_sizes):
+    """
+    Yield (name, func, setup, number) for the benchmarks of one engine.
+    """
+    for level in sorted(cfg.LEVELS):
+        board = maps.make_board(engine = engine)
+        rng = random.Random(seed)
+        yield ('reset/{}/level{}'.format(engine, level),
+               lambda arg, board = board, level = level, rng = rng:
+               board.reset(level, rng),
+               None, 20)
+    width, mines = cfg.LEVELS[max(cfg.LEVELS)]
+    for scale in scales:
+        board = maps.make_board(engine = engine)
+        rng = random.Random(seed)
+        yield ('reset/{}/x{}'.format(engine, scale),
+               lambda arg, board = board, scale = scale, rng = rng:
+               board.randomize(width * scale, width * scale,
+                               mines * scale ** 2, rng = rng),
+               None, 1)
+    for size in open_sizes:
+        yield ('mark_safe/{}/open{}'.format(engine, size),
+               lambda board: board.mark_safe(0, 0),
+               lambda size = size: maps.make_board(open_board(size), engine), 1)
+    board = played_board(engine, max(cfg.LEVELS), seed)
+    yield ('check_win/{}'.format(engine),
+           lambda arg, board = board: board.check_win(), None, 10000)
+    yield ('neighbors/{}'.format(engine),
+           lambda arg, board = board: every_square(board, board.neighbors),
+           None, 10)
+    yield ('neighbor_mines/{}'.format(engine),
+           lambda arg, board = board: every_square(board,
+                                                   board.neighbor_mines),
+           None, 10)
+
+def map_benchmarks(engine, directory, size):
+    """
+    Yield (name, func, setup, number) for loading a size x size map,
+    in the text and binary formats, from directory.
+    """
+    for extension in ('.txt', cfg.BINARY_MAP_EXTENSION):
+        def load(arg, extension = extension):
+            cwd = os.getcwd()
+            os.chdir(directory)
+            try:
+                maps.load_map('1', extension, engine)
+            finally:
+                os.chdir(cwd)
+        yield ('load_map/{}/{}{}'.format(engine, size, extension),
+               load, None, 1)
+
+def write_maps(directory, size, seed):
+    """
+    Write a size x size map with 15% mines to directory as map1.txt
+    and map1 with the binary extension.
+    """
+    board = maps.make_board(engine = 'array')
+    board.randomize(size, size, int(size * size * 0.15), seed = seed)
+    text_name = os.path.join(directory, 'map1.txt')
+    with open(text_name, 'w') as text_file:
+        text_file.write(board.territory_str)
+    binary_name = os.path.join(directory,
+                               'map1' + cfg.BINARY_MAP_EXTENSION)
+    with open(text_name, 'r') as text_file:
+        with open(binary_name, 'wb') as binary_file:
+            mapfile.text_to_binary(text_file, binary_file, seed)
+
+def draw_benchmarks(engines, seed):
+    """
+    Yield (name, func, setup, number) for full redraws of the pygame
+    board, using SDL's dummy video driver so no window is opened.
+    Yield nothing if pygame is not installed.
+    """
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    try:
+        from minesweeperPG import MinesweeperPygame
+    except ImportError:
+        return
+    game = None
+    for engine in engines:
+        for level in sorted(cfg.LEVELS):
+            board = played_board(engine, level, seed)
+            if game is None:
+                game = MinesweeperPygame(board)
+                game.open_display()
+            def draw(arg, board = board):
+                game.board = board
+                game.set_square_size()
+                game.full_redraw = True
+                game.draw_board()
+            yield 'draw_board/{}/level{}'.format(engine, level), draw, None, 10
+
+def environment():
+    """
+    Return a dictionary describing the machine and code being measured.
+    """
+    meta = {'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'platform': platform.platform(),
+            'machine': platform.machine(),
+            'processor': platform.processor(),
+            'cpus': multiprocessing.cpu_count(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'engine': cfg.ENGINE,
+            'dirty_rendering': cfg.DIRTY_RENDERING}
+    try:
+        import pygame
+        meta['pygame'] = pygame.version.ver
+    except ImportError:
+        meta['pygame'] = None
+    try:
+        with open(os.devnull, 'w') as devnull:
+            commit = subprocess.check_output(
+                ['git', 'rev-parse', 'HEAD'], stderr = devnull,
+                cwd = os.path.dirname(os.path.abspath(__file__)))
+        meta['commit'] = commit.decode('ascii').strip()
+    except (OSError, subprocess.CalledProcessError):
+        meta['commit'] = None
+    return meta
+
+def run(engines = None, repeat = cfg.BENCH_REPEAT, seed = 0, match = None,
+        quick = False, log = None):
+    """
+    Run the benchmarks whose names contain match (or all of them) on the
+    given engines and return the results, with environment metadata,
+    as a dictionary ready to be saved as JSON. If log is a file, print
+    each result to it as it is measured.
+    """
+    engines = engines or sorted(maps.ENGINES)
+    scales = cfg.BENCH_SCALES[:2] if quick else cfg.BENCH_SCALES
+    open_sizes = (100,) if quick else (100, 300)
+    map_size = 100 if quick else 300
+    directory = tempfile.mkdtemp()
+    results = {}
+    try:
+        write_maps(directory, map_size, seed)
+        groups = [board_benchmarks(engine, seed, scales, open_sizes)
+                  for engine in engines]
+        groups += [map_benchmarks(engine, directory, map_size)
+                   for engine in engines]
+        groups.append(draw_benchmarks(engines, seed))
+        for group in groups:
+            for name, func, setup, number in group:
+                if match and match not in name:
+                    continue
+                times = measure(func, setup, repeat, number)
+                results[name] = summarize(times, number)
+                if log is not None:
+                    print('{:<32} {:>12.1f} us'.format(
+                        name, results[name]['median'] * 1e6), file = log)
+    finally:
+        shutil.rmtree(directory)
+    meta = environment()
+    meta.update({'seed': seed, 'repeat': repeat, 'quick': quick})
+    return {'meta': meta, 'results': results}
+
+def compare(baseline, current, threshold = cfg.BENCH_THRESHOLD):
+    """
+    Compare the median times of two sets of results. Return a list of
+    (name, baseline seconds, current seconds, verdict) tuples, where
+    verdict is 'slower' if the current time is more than threshold
+    (a fraction) above the baseline, 'faster' if it is as far below,
+    'same' otherwise, and 'new' or 'gone' for benchmarks in only one set.
+    """
+    old = baseline['results']
+    new = current['results']
+    rows = []
+    for name in sorted(set(old) | set(new)):
+        if name not in old:
+            rows.append((name, None, new[name]['median'], 'new'))
+            continue
+        if name not in new:
+            rows.append((name, old[name]['median'], None, 'gone'))
+            continue
+        before = old[name]['median']
+        after = new[name]['median']
+        if after > before * (1 + threshold):
+            verdict = 'slower'
+        elif after * (1 + threshold) < before:
+            verdict = 'faster'
+        else:
+            verdict = 'same'
+        rows.append((name, before, after, verdict))
+    return rows
+
+def main(argv = None):
+    """
+    Run or compare benchmarks from the command line. compare exits with
+    status 1 if any benchmark regressed.
+    """
+    parser = argparse.ArgumentParser(description = __doc__.split('\n\n')[0])
+    commands = parser.add_subparsers(dest = 'command')
+    run_parser = commands.add_parser('run', help = 'run the benchmarks')
+    run_parser.add_argument('--output', help = 'file to save the results to')
+    run_parser.add_argument('--engines',
+                            help = 'comma-separated engines to measure')
+    run_parser.add_argument('--repeat', type = int, default = cfg.BENCH_REPEAT)
+    run_parser.add_argument('--seed', type = int, default = 0)
+    run_parser.add_argument('--filter', dest = 'match',
+                            help = 'only run benchmarks whose names contain this')
+    run_parser.add_argument('--quick', action = 'store_true',
+                            help = 'use smaller boards and fewer scales')
+    compare_parser = commands.add_parser(
+        'compare', help = 'compare results against a baseline')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('--threshold', type = float,
+                                default = cfg.BENCH_THRESHOLD)
+    args = parser.parse_args(argv)
+    if args.command == 'run':
+        engines = args.engines.split(',') if args.engines else None
+        report = run(engines, args.repeat, args.seed, args.match,
+                     args.quick, sys.stdout)
+        if args.output:
+            with open(args.output, 'w') as file_obj:
+                json.dump(report, file_obj, indent = 2, sort_keys = True)
+    elif args.command == 'compare':
+        with open(args.baseline) as file_obj:
+            baseline = json.load(file_obj)
+        with open(args.current) as file_obj:
+            current = json.load(file_obj)
+        rows = compare(baseline, current, args.threshold)
+        for name, before, after, verdict in rows:
+            print('{:<32} {:>12} {:>12}  {}'.format(
+                name,
+                '-' if before is None else '{:.1f}'.format(before * 1e6),
+                '-' if after is None else '{:.1f}'.format(after * 1e6),
+                verdict))
+        if any(verdict == 'slower' for name, before, after, verdict in rows):
+            sys.exit(1)
+    else:
+        parser.print_help()
+
+if __name__ == '__main__':
+    main()
@@ -3,8 +3,62 @@ The Board class for a minesweeper game.
 """
 
 from __future__ import division
-import random
+import array
 import config as cfg
+import adjacency
+import generator
+
+# CELL STATES, as stored by ArrayBoard and in snapshots:
+COVERED = 0
+REVEALED = 1
+FLAGGED = 2
+EXPLODED = 3
+
+# Display values of the cell states, and back.
+_STATE_CHARS = {COVERED: ' ', FLAGGED: 'x', EXPLODED: '!'}
+_CHAR_STATES = {' ': COVERED, 'x': FLAGGED, '!': EXPLODED}
+
+# MOVES, by name or code, for Board.apply_moves:
+SAFE = 0
+FLAG = 1
+UNFLAG = 2
+CHORD = 3
+_MOVE_CODES = {'safe': SAFE, 'flag': FLAG, 'unflag': UNFLAG, 'chord': CHORD,
+               SAFE: SAFE, FLAG: FLAG, UNFLAG: UNFLAG, CHORD: CHORD}
+
+# Translation tables between the '0'/'1' text format and 0/1 bytes.
+_FROM_TEXT = bytearray(range(256))
+_FROM_TEXT[ord('0')] = 0
+_FROM_TEXT[ord('1')] = 1
+_FROM_TEXT = bytes(_FROM_TEXT)
+_TO_TEXT = bytearray(range(256))
+_TO_TEXT[0] = ord('0')
+_TO_TEXT[1] = ord('1')
+_TO_TEXT = bytes(_TO_TEXT)
+
+def layout_to_str(layout, width):
+    """
+    Convert a bytearray of 0/1 values into a territory string
+    with rows of the given width.
+    """
+    rows = [layout[start:start + width]
+            for start in range(0, len(layout), width)]
+    text = bytearray(b'\n').join(rows) + bytearray(b'\n')
+    return text.translate(_TO_TEXT).decode('ascii')
+
+def str_to_layout(territory_str):
+    """
+    Convert a territory string into a (layout, width, height) tuple,
+    where layout is a bytearray of 0/1 values. Raise ValueError if the
+    rows are not all the same length.
+    """
+    rows = territory_str.splitlines()
+    data = ''.join(rows)
+    if any(len(row) != len(rows[0]) for row in rows):
+        raise ValueError('territory rows differ in length')
+    if not isinstance(data, bytes):
+        data = data.encode('ascii')
+    return bytearray(data).translate(_FROM_TEXT), len(rows[0]), len(rows)
 
 class Board(object):
     """
@@ -14,46 +68,148 @@ class Board(object):
     flag a mine there), load a new board, create a random board, and check
     if the game has been won.
     """
-    def __init__(self, territory_str = None):
+    # An instrument.FrameStats (or anything with a record_move method)
+    # told about every reveal, or None.
+    stats = None
+    # A journal.JournalWriter (or anything with a record method) told
+    # about every move before it is made, or None.
+    journal = None
+    # The (row, col) revealed when the board was dealt by reset, or None.
+    start = None
+    # The name of the board's topology; see adjacency.get_topology.
+    topology = cfg.TOPOLOGY
+    # A message for the player about the board dealt by reset, or None.
+    notice = None
+
+    def __init__(self, territory_str = None, topology = None):
         """
         If a string is supplied, create a board from that string.
-        Otherwise, create a random board.
+        Otherwise, create a random board. topology names the topology
+        to play with, by default cfg.TOPOLOGY.
         """
+        if topology is not None:
+            self.topology = topology
         self.territory_str = territory_str
         self.territory = None
         self.make_territory()
-        self.reset()
+        self.dead = False
 
-    def reset(self, difficulty = None):
+    def reset(self, difficulty = None, rng = None):
         """
         Create a random board using the paramaters associated with the
-        given difficulty level.
-        """
-        if difficulty is not None:
-            row_length, self.mines_left = cfg.LEVELS[difficulty]
-            board_size = row_length ** 2
-            choices = list(range(board_size))
-            random.shuffle(choices)
-            mines = choices[:self.mines_left]
-            self.territory_str = ''
-            for row in range(row_length):
-                for col in range(row_length):
-                    if row * row_length + col in mines:
-                        self.territory_str += '1'
-                    else:
-                        self.territory_str += '0'
-                self.territory_str += '\n'
-        self.make_territory()
+        given difficulty level, drawn from the random.Random object rng
+        if one is given. With cfg.NO_GUESS, the board is one that
+        can be cleared by logic alone, taken from a noguess pool, and its
+        start square is revealed. If no such board can be had quickly,
+        a random board with the start area kept clear is dealt instead,
+        and self.notice is set to cfg.NOGUESS_FALLBACK_NOTICE for the
+        player; otherwise it is None.
+        """
+        self.notice = None
+        if difficulty is not None and cfg.NO_GUESS:
+            import noguess
+            row_length, mines = cfg.LEVELS[difficulty]
+            try:
+                layout, start = noguess.take_board(row_length, row_length,
+                                                   mines, self.topology)
+            except ValueError:
+                start = noguess.start_square(row_length, row_length)
+                layout = generator.random_layout(row_length, row_length,
+                                                 mines, rng, safe = start,
+                                                 topology = self.topology)
+                self.notice = cfg.NOGUESS_FALLBACK_NOTICE
+            self.load_layout(layout, row_length, row_length)
+            self.dead = False
+            self.start = start
+            self.mark_safe(*start)
+        elif difficulty is not None:
+            row_length, mines = cfg.LEVELS[difficulty]
+            self.randomize(row_length, row_length, mines, rng)
+        else:
+            self.make_territory()
+            self.dead = False
+
+    def randomize(self, width, height, mines, rng = None, seed = None,
+                  safe = None):
+        """
+        Create a random width x height board with the given number of mines.
+        See generator.random_layout for the rng, seed and safe arguments;
+        the squares kept clear around safe are its neighbors.
+        """
+        layout = generator.random_layout(width, height, mines, rng, seed, safe,
+                                         topology = self.topology)
+        self.load_layout(layout, width, height)
         self.dead = False
 
+    def load_layout(self, layout, width, height):
+        """
+        Use a bytearray of width * height 0/1 values as the mine layout,
+        and clear all of the player's marks.
+        """
+        self.territory_str = layout_to_str(layout, width)
+        self.make_territory()
+
     def make_territory(self):
         """
         Convert a territory string into a list of strings,
         the data structure used to keep track of game state.
+        A mapped territory loaded by load_territory is used as it is.
         """
         if self.territory_str:
             self.territory = self.territory_str.splitlines()
-            self.display = [[' ' for col in row] for row in self.territory]
+            mine_count = sum(row.count('1') for row in self.territory)
+        elif self.territory:
+            mine_count = self.territory.mines
+        else:
+            return
+        width = len(self.territory[0])
+        self.display = [[' '] * width for row in range(len(self.territory))]
+        self.make_adjacency(width, len(self.territory))
+        self.reset_counters(mine_count, len(self.territory) * width)
+
+    def make_adjacency(self, width, height):
+        """
+        Look up the adjacency index of a width x height board under the
+        board's topology, building it if no board of that shape has.
+        """
+        self.adjacency = adjacency.index(self.topology, width, height)
+
+    def reset_counters(self, mine_count, squares):
+        """
+        Set mines_left and the counters used by check_win for a board of
+        the given size that the player has not marked yet, and forget
+        any unfinished reveal and the undo history.
+        """
+        self.unfinished = []
+        self.undo_stack = []
+        self.redo_stack = []
+        self.start = None
+        self.mine_count = mine_count
+        self.mines_left = mine_count
+        self.covered_mines = mine_count
+        self.covered_safe = squares - mine_count
+        self.correct_flags = 0
+        self.wrong_flags = 0
+
+    def load_territory(self, territory):
+        """
+        Play on a read-only territory whose squares are read on demand,
+        such as a mapfile.MapFile. The display is still built square by
+        square, which takes time in proportion to the board's size; see
+        sparseboard.SparseBoard.load_territory for a constant-time load.
+        """
+        self.territory_str = None
+        self.territory = territory
+        self.make_territory()
+        self.dead = False
+
+    def layout(self):
+        """
+        Return the mine layout as a bytearray of 0/1 values.
+        """
+        if self.territory_str:
+            return str_to_layout(self.territory_str)[0]
+        return self.territory.layout()
 
     def has_mine(self, r, c):
         """
@@ -65,25 +221,47 @@ class Board(object):
         """
         Declare that the square at row r, column c contains a mine.
         """
+        if self.journal is not None:
+            self.journal.record('flag', r, c)
+        self.tally(r, c, -1)
         self.display[r][c] = 'x'
+        self.tally(r, c, 1)
         self.mines_left -= 1
 
     def unmark_mine(self, r, c):
         """
         Undeclare a mine in the sqaure at row r, column c.
         """
+        if self.journal is not None:
+            self.journal.record('unflag', r, c)
+        self.tally(r, c, -1)
         self.display[r][c] = ' '
+        self.tally(r, c, 1)
         self.mines_left += 1
 
+    def tally(self, r, c, sign):
+        """
+        Add (sign = 1) or remove (sign = -1) the square at row r, column c
+        from the counters of covered squares and flags used by check_win.
+        """
+        value = self.display[r][c]
+        if value == ' ':
+            if self.has_mine(r, c):
+                self.covered_mines += sign
+            else:
+                self.covered_safe += sign
+        elif value == 'x':
+            if self.has_mine(r, c):
+                self.correct_flags += sign
+            else:
+                self.wrong_flags += sign
+
     def neighbors(self, r, c):
         """
         Return the row and column number for each square that is adjacent
-        to the square at row r, column c.
+        to the square at row r, column c, from the adjacency index.
         """
-        potential = [[r - 1, c - 1], [r - 1, c], [r - 1, c + 1], [r, c - 1],
-                     [r, c + 1], [r + 1, c - 1], [r + 1, c], [r + 1, c + 1]]
-        return [pot for pot in potential if 0 <= pot[0] < len(self.territory)
-                and 0 <= pot[1] < len(self.territory[r])]
+        return self.adjacency.neighbors(r, c)
 
     def covered_neighbors(self, r, c):
         """
@@ -99,32 +277,323 @@ class Board(object):
         return [nei for nei in self.neighbors(r, c)
                 if self.territory[nei[0]][nei[1]] == '1']
 
-    def mark_safe(self, r, c):
+    def mark_safe(self, r, c, limit = None):
         """
         Declare that the square at row r, column c does not contain a mine.
         If wrong, the player loses.
         If correct, the number of neighboring mines is displayed in the square.
         If their are no neighboring mines, the process is repeated in
         all neighboring squares that have not been marked yet.
+        Squares are uncovered as they are pushed on an explicit stack, so
+        each one is visited once and large open areas cannot exhaust the
+        recursion limit. If limit is given, at most limit squares are
+        returned; the rest of the reveal is kept in self.unfinished and
+        carried on by resume.
+        Return a list of (row, col) pairs for the squares that changed.
         """
+        if isinstance(self.display[r][c], int):
+            return []
+        if self.journal is not None:
+            self.journal.record('safe', r, c)
+        self.tally(r, c, -1)
         if self.has_mine(r, c):
             self.dead = True
             self.display[r][c] = '!'
-            return
-        neighbor_m = self.neighbor_mines(r, c)
-        self.display[r][c] = len(neighbor_m)
-        if not neighbor_m:
-            for neighbor in self.covered_neighbors(r, c):
-                self.mark_safe(*neighbor)
+            if self.stats is not None:
+                self.stats.record_move(1, 0)
+            return [(r, c)]
+        self.display[r][c] = len(self.neighbor_mines(r, c))
+        self.unfinished.append((r, c))
+        return self.resume(limit)
+
+    def resume(self, limit = None):
+        """
+        Carry on an unfinished reveal for at most limit more squares,
+        or until it is done if limit is None. Squares already displayed
+        but still on the stack count as revealed for check_win. The number
+        of squares returned and the largest size of the stack are passed
+        to self.stats, if set.
+        Return a list of (row, col) pairs for the squares that changed.
+        """
+        revealed = []
+        stack = self.unfinished
+        before = len(stack)
+        if limit is None:
+            limit = len(self.display) * len(self.display[0])
+        depth = before
+        while stack and len(revealed) < limit:
+            r, c = stack.pop()
+            revealed.append((r, c))
+            if self.display[r][c] == 0:
+                for nr, nc in self.covered_neighbors(r, c):
+                    self.display[nr][nc] = len(self.neighbor_mines(nr, nc))
+                    stack.append((nr, nc))
+                depth = max(depth, len(stack))
+        self.covered_safe -= len(revealed) + len(stack) - before
+        if self.stats is not None:
+            self.stats.record_move(len(revealed), depth)
+        return revealed
+
+    def snapshot(self):
+        """
+        Return the player's marks as a bytearray with the state of each
+        square (COVERED, REVEALED, FLAGGED or EXPLODED) in row-major order.
+        """
+        return bytearray(_CHAR_STATES.get(col, REVEALED)
+                         for row in self.display for col in row)
+
+    def restore(self, states):
+        """
+        Replace the player's marks with a snapshot taken on a board with
+        the same layout.
+        """
+        width = len(self.display[0])
+        for i, value in enumerate(states):
+            r, c = divmod(i, width)
+            self.set_square_state(r, c, value)
+        self.recount(states)
+
+    def square_state(self, r, c):
+        """
+        Return the state of the square at row r, column c.
+        """
+        return _CHAR_STATES.get(self.display[r][c], REVEALED)
+
+    def set_square_state(self, r, c, state):
+        """
+        Set the state of the square at row r, column c, without updating
+        the counters.
+        """
+        if state == REVEALED:
+            self.display[r][c] = len(self.neighbor_mines(r, c))
+        else:
+            self.display[r][c] = _STATE_CHARS[state]
+
+    def clear_marks(self):
+        """
+        Forget every mark the player has made, building a new display
+        square by square.
+        """
+        width = len(self.display[0])
+        height = len(self.display)
+        self.display = [[' '] * width for r in range(height)]
+        self.reset_counters(self.mine_count, width * height)
+
+    def restart(self):
+        """
+        Start again on the same layout, reusing the parsed territory,
+        with the start square revealed again if there is one.
+        This is O(cells), not O(1): clear_marks builds a new display here,
+        and ArrayBoard allocates a new zeroed state array, which is O(cells)
+        too but done in a single C call. SparseBoard only drops the
+        player's marks.
+        """
+        start = self.start
+        self.clear_marks()
+        self.dead = False
+        if start is not None:
+            self.start = start
+            self.mark_safe(*start)
+        if self.journal is not None:
+            self.journal.snapshot()
+
+    def chord(self, r, c, limit = None):
+        """
+        If the square at row r, column c is a revealed number with as many
+        flags (or exploded mines) around it, reveal all of its other
+        covered neighbors. Each reveal is passed limit (see mark_safe), so
+        part of the flood fill may be left for resume. Return a list of
+        (row, col) pairs for the squares that changed.
+        """
+        if self.square_state(r, c) != REVEALED:
+            return []
+        covered = []
+        marked = 0
+        for nr, nc in self.neighbors(r, c):
+            state = self.square_state(nr, nc)
+            if state == COVERED:
+                covered.append((nr, nc))
+            elif state != REVEALED:
+                marked += 1
+        if marked != self.display[r][c]:
+            return []
+        changed = []
+        for nr, nc in covered:
+            changed += self.mark_safe(nr, nc, limit)
+        return changed
+
+    def apply_moves(self, moves):
+        """
+        Make a sequence of moves in one call. moves is a sequence of
+        (action, row, col) triples, or a flat array of action, row, col
+        integers, where action is 'safe', 'flag', 'unflag' or 'chord', or
+        the code SAFE, FLAG, UNFLAG or CHORD. Moves that do not apply to
+        their square, such as revealing a flag, are skipped, and so are
+        all moves after the game is lost or won.
+        Return (applied, changed, dead, won): the number of moves made,
+        an array of the flat indices (row * width + col) of the squares
+        that changed, once per move that changed them, and the final
+        state of the game.
+        """
+        if isinstance(moves, array.array):
+            moves = zip(moves[0::3], moves[1::3], moves[2::3])
+        width = len(self.display[0])
+        changed = array.array('I')
+        append = changed.append
+        extend = changed.extend
+        # {action: (method, state the square must be in, or None for
+        # any, True if the method returns the changed squares)}
+        handlers = {SAFE: (self.mark_safe, COVERED, True),
+                    FLAG: (self.mark_mine, COVERED, False),
+                    UNFLAG: (self.unmark_mine, FLAGGED, False),
+                    CHORD: (self.chord, None, True)}
+        handlers = dict((action, handlers[code])
+                        for action, code in _MOVE_CODES.items())
+        square_state = self.square_state
+        applied = 0
+        won = self.check_win()
+        if self.dead or won:
+            return applied, changed, self.dead, won
+        # Only the counters are read between moves; check_win, which may
+        # also scan the board, is called once at the end.
+        for action, r, c in moves:
+            method, needed, returns_squares = handlers[action]
+            if needed is not None and square_state(r, c) != needed:
+                continue
+            applied += 1
+            if returns_squares:
+                extend([nr * width + nc for nr, nc in method(r, c)])
+                if self.dead:
+                    break
+            else:
+                method(r, c)
+                append(r * width + c)
+            if not (self.covered_safe or self.covered_mines or
+                    self.wrong_flags):
+                break
+        return applied, changed, self.dead, self.check_win()
+
+    def play(self, action, r, c):
+        """
+        Make a move, 'safe', 'flag', 'unflag' or 'chord', at row r,
+        column c, and remember how to undo it: the squares it changed,
+        which were all covered except the one played, that square's old
+        state, and the old counters. Return the list of (row, col) pairs
+        that changed.
+        """
+        before = (self.covered_safe, self.covered_mines, self.correct_flags,
+                  self.wrong_flags, self.mines_left, self.dead)
+        prior = self.square_state(r, c)
+        if action == 'safe':
+            changed = self.mark_safe(r, c)
+        elif action == 'chord':
+            changed = self.chord(r, c)
+        elif action == 'flag':
+            self.mark_mine(r, c)
+            changed = [(r, c)]
+        else:
+            self.unmark_mine(r, c)
+            changed = [(r, c)]
+        if changed:
+            self.undo_stack.append((action, r, c, prior, changed, before))
+            del self.redo_stack[:]
+        return changed
+
+    def undo(self):
+        """
+        Undo the last move made with play. Return the list of (row, col)
+        pairs that changed, which is empty if there was nothing to undo.
+        """
+        if not self.undo_stack:
+            return []
+        action, r, c, prior, changed, before = self.undo_stack.pop()
+        for nr, nc in changed:
+            self.set_square_state(nr, nc, COVERED)
+        self.set_square_state(r, c, prior)
+        (self.covered_safe, self.covered_mines, self.correct_flags,
+         self.wrong_flags, self.mines_left, self.dead) = before
+        self.unfinished = []
+        self.redo_stack.append((action, r, c))
+        if self.journal is not None:
+            self.journal.snapshot()
+        return changed
+
+    def redo(self):
+        """
+        Make the last undone move again. Return the list of (row, col)
+        pairs that changed.
+        """
+        if not self.redo_stack:
+            return []
+        redo_stack = self.redo_stack
+        self.redo_stack = []
+        changed = self.play(*redo_stack.pop())
+        self.redo_stack = redo_stack
+        return changed
+
+    def checkpoint(self):
+        """
+        Return a marker for the current position, for rollback.
+        """
+        return len(self.undo_stack)
+
+    def rollback(self, checkpoint):
+        """
+        Undo every move made with play since checkpoint was taken,
+        and forget them. Return the list of (row, col) pairs that changed.
+        """
+        journal = self.journal
+        self.journal = None
+        changed = []
+        while len(self.undo_stack) > checkpoint:
+            changed += self.undo()
+        del self.redo_stack[:]
+        self.journal = journal
+        if journal is not None:
+            journal.snapshot()
+        return changed
+
+    def recount(self, states):
+        """
+        Set the counters, mines_left and dead from a full scan of the board,
+        whose snapshot is states, and forget any unfinished reveal.
+        """
+        self.unfinished = []
+        (self.covered_safe, self.covered_mines, self.correct_flags,
+         self.wrong_flags) = self.scan_counters()
+        self.mines_left = (self.mine_count - self.correct_flags -
+                           self.wrong_flags)
+        self.dead = EXPLODED in states
 
     def check_win(self):
         """
         Return True if all squares have been correctly marked.
+        The counters kept by tally make this a constant-time check.
+        If cfg.CHECK_COUNTERS is set, the counters are compared against
+        a full scan of the board.
         """
+        if cfg.CHECK_COUNTERS:
+            counters = (self.covered_safe, self.covered_mines,
+                        self.correct_flags, self.wrong_flags)
+            assert counters == self.scan_counters(), 'board counters out of sync'
+        return not (self.covered_safe or self.covered_mines or self.wrong_flags)
+
+    def scan_counters(self):
+        """
+        Count the covered safe squares, covered mines, correct flags and
+        wrong flags by walking the whole board.
+        """
+        covered_safe = covered_mines = correct_flags = wrong_flags = 0
         for r, row in enumerate(self.display):
             for c, col in enumerate(row):
                 if col == ' ':
-                    return False
-                if col == 'x' and self.territory[r][c] == '0':
-                    return False
-        return True
+                    if self.has_mine(r, c):
+                        covered_mines += 1
+                    else:
+                        covered_safe += 1
+                elif col == 'x':
+                    if self.has_mine(r, c):
+                        correct_flags += 1
+                    else:
+                        wrong_flags += 1
+        return covered_safe, covered_mines, correct_flags, wrong_flags
@@ -0,0 +1,135 @@
+"""
+A camera over the board for the pygame version of Minesweeper: which
+part of the board is on screen, and at what size.
+"""
+
+from __future__ import division
+import math
+import config as cfg
+
+class Camera(object):
+    """
+    This class maps between squares of a board and pixels of a view of
+    width x height pixels. The board is drawn with squares of
+    square_width x square_height pixels, shifted so that the board pixel
+    (x, y) is at the top left of the view. At zoom 1 the whole board
+    fits the view, unless its squares would be smaller than
+    cfg.CAMERA_MIN_SQUARE pixels; it can be zoomed in until they are
+    cfg.CAMERA_MAX_SQUARE pixels. Odd rows are drawn row_shift squares
+    to the right of even rows, half a square for a hexagonal grid.
+    """
+    def __init__(self, rows, cols, width = cfg.WIDTH, height = cfg.HEIGHT,
+                 row_shift = 0):
+        """
+        Look at a board of rows x cols squares, zoomed out as far as it
+        goes, from its top left corner.
+        """
+        self.rows = rows
+        self.cols = cols
+        self.width = width
+        self.height = height
+        self.row_shift = row_shift
+        self.base_width = width / (cols + row_shift)
+        self.base_height = height / rows
+        if min(self.base_width, self.base_height) < cfg.CAMERA_MIN_SQUARE:
+            self.base_width = self.base_height = cfg.CAMERA_MIN_SQUARE
+        self.max_zoom = max(1, cfg.CAMERA_MAX_SQUARE /
+                            min(self.base_width, self.base_height))
+        self.x = 0
+        self.y = 0
+        self.zoom = 1
+        self.square_width = self.base_width
+        self.square_height = self.base_height
+        self.clamp()
+
+    def set_zoom(self, zoom, px = None, py = None):
+        """
+        Zoom to zoom times the smallest square size, keeping the board
+        pixel under the view pixel (px, py), by default the view's
+        center, in place.
+        """
+        if px is None:
+            px, py = self.width / 2, self.height / 2
+        col = (self.x + px) / self.square_width
+        row = (self.y + py) / self.square_height
+        self.zoom = max(1, min(self.max_zoom, zoom))
+        self.square_width = self.base_width * self.zoom
+        self.square_height = self.base_height * self.zoom
+        self.x = col * self.square_width - px
+        self.y = row * self.square_height - py
+        self.clamp()
+
+    def zoom_by(self, factor, px = None, py = None):
+        """
+        Multiply the zoom by factor, keeping the board pixel under
+        (px, py) in place.
+        """
+        self.set_zoom(self.zoom * factor, px, py)
+
+    def pan(self, dx, dy):
+        """
+        Move the view by dx, dy pixels.
+        """
+        self.x += dx
+        self.y += dy
+        self.clamp()
+
+    def clamp(self):
+        """
+        Keep the view over the board, or center the board in the view
+        along an axis where it is smaller than the view.
+        """
+        board_width = (self.cols + self.row_shift) * self.square_width
+        board_height = self.rows * self.square_height
+        if board_width <= self.width:
+            self.x = (board_width - self.width) / 2
+        else:
+            self.x = max(0, min(self.x, board_width - self.width))
+        if board_height <= self.height:
+            self.y = (board_height - self.height) / 2
+        else:
+            self.y = max(0, min(self.y, board_height - self.height))
+
+    def square_at(self, px, py):
+        """
+        Return the (row, col) of the square at view pixel (px, py), or
+        None if there is no square there.
+        """
+        if not (0 <= px < self.width and 0 <= py < self.height):
+            return None
+        r = int(math.floor((self.y + py) / self.square_height))
+        c = int(math.floor((self.x + px) / self.square_width -
+                           self.row_shift * (r & 1)))
+        if 0 <= r < self.rows and 0 <= c < self.cols:
+            return r, c
+        return None
+
+    def position(self, r, c):
+        """
+        Return the view pixel of the top left corner of the square at row
+        r, column c.
+        """
+        return ((c + self.row_shift * (r & 1)) * self.square_width - self.x,
+                r * self.square_height - self.y)
+
+    def visible(self):
+        """
+        Return (top, left, bottom, right): the squares in rows top to
+        bottom - 1 and columns left to right - 1 are at least partly in
+        view.
+        """
+        top = max(0, int(self.y // self.square_height))
+        left = max(0, int(self.x // self.square_width - self.row_shift))
+        bottom = min(self.rows,
+                     int(math.ceil((self.y + self.height) / self.square_height)))
+        right = min(self.cols,
+                    int(math.ceil((self.x + self.width) / self.square_width)))
+        return top, left, bottom, right
+
+    def is_visible(self, r, c):
+        """
+        Return True if the square at row r, column c is at least partly
+        in view.
+        """
+        top, left, bottom, right = self.visible()
+        return top <= r < bottom and left <= c < right
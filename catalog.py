@@ -0,0 +1,301 @@
+"""
+A persistent index of the maps in a directory, kept in SQLite, so maps
+can be listed and searched without reading them.
+
+Every map file (named 'map' + name + '.txt' or the binary extension) has
+a row with its size in squares, mine count, density, a hash of its mine
+layout and two difficulty metrics: its openings (areas of squares with
+no neighboring mines, each cleared by one click) and its 3BV, the
+fewest clicks that clear the map. A refresh reparses only the files
+whose modification time or size changed.
+
+    python catalog.py refresh
+    python catalog.py find --width 30 --height 16 --mines 99
+"""
+
+from __future__ import division, print_function
+import argparse
+import collections
+import hashlib
+import os
+import sqlite3
+import struct
+import config as cfg
+from arrayboard import ArrayBoard
+from board import str_to_layout, COVERED
+from mapfile import HEADER, MapFile, pack_layout
+
+# Bumped whenever the table layout or a metric changes; an index with
+# another version is rebuilt.
+SCHEMA_VERSION = 1
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS maps (
+        filename TEXT PRIMARY KEY, name TEXT, extension TEXT,
+        mtime REAL, size INTEGER, width INTEGER, height INTEGER,
+        mines INTEGER, density REAL, hash TEXT, openings INTEGER,
+        bbbv INTEGER);
+    CREATE INDEX IF NOT EXISTS maps_shape ON maps (width, height, mines);
+    CREATE INDEX IF NOT EXISTS maps_name ON maps (name);
+    CREATE INDEX IF NOT EXISTS maps_hash ON maps (hash);
+    CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value);
+"""
+COLUMNS = ('filename', 'name', 'extension', 'mtime', 'size', 'width',
+           'height', 'mines', 'density', 'hash', 'openings', 'bbbv')
+MapInfo = collections.namedtuple('MapInfo', COLUMNS)
+EXTENSIONS = ('.txt', cfg.BINARY_MAP_EXTENSION)
+
+def split_name(filename):
+    """
+    Return the (name, extension) of a map file name, or None if it is
+    not the name of a map.
+    """
+    for extension in EXTENSIONS:
+        if (filename.startswith('map') and filename.endswith(extension) and
+            len(filename) > 3 + len(extension)):
+            return filename[3:-len(extension)], extension
+    return None
+
+def list_maps(directory):
+    """
+    Yield (filename, mtime, size) for every map file in directory,
+    without looking at the other files.
+    """
+    if hasattr(os, 'scandir'):
+        for entry in os.scandir(directory):
+            if split_name(entry.name) is not None:
+                stat = entry.stat()
+                yield entry.name, stat.st_mtime, stat.st_size
+        return
+    for filename in os.listdir(directory):
+        if split_name(filename) is not None:
+            stat = os.stat(os.path.join(directory, filename))
+            yield filename, stat.st_mtime, stat.st_size
+
+def layout_hash(width, height, packed):
+    """
+    Return the hash of a mine layout, given its packed bits as stored in
+    a binary map, so a map has the same hash in both formats.
+    """
+    return hashlib.sha1(struct.pack('<II', width, height) +
+                        bytes(packed)).hexdigest()
+
+def difficulty(layout, width, height):
+    """
+    Return (openings, 3BV) of a mine layout: the number of openings,
+    and the number of clicks needed to clear the board, one for each
+    opening and one for each safe square that no opening reveals.
+    """
+    board = ArrayBoard()
+    board.load_layout(layout, width, height)
+    board.dead = False
+    counts = board.counts
+    mines = board.mines
+    state = board.state
+    openings = 0
+    i = counts.find(b'\x00')
+    while i != -1:
+        if not mines[i] and state[i] == COVERED:
+            board.mark_safe(i // width, i % width)
+            openings += 1
+        i = counts.find(b'\x00', i + 1)
+    return openings, openings + board.covered_safe
+
+def read_map(path, extension):
+    """
+    Return (width, height, mines, hash, openings, 3BV) for the map file
+    at path.
+    """
+    if extension == cfg.BINARY_MAP_EXTENSION:
+        map_file = MapFile(path)
+        try:
+            width, height = map_file.width, map_file.height
+            layout = map_file.layout()
+            packed = map_file.data[HEADER.size:
+                                   HEADER.size + (width * height + 7) // 8]
+        finally:
+            map_file.close()
+    else:
+        with open(path, 'r') as file_obj:
+            layout, width, height = str_to_layout(file_obj.read())
+        packed = pack_layout(layout)
+    return ((width, height, layout.count(b'\x01'),
+             layout_hash(width, height, packed)) +
+            difficulty(layout, width, height))
+
+class Catalog(object):
+    """
+    This class keeps the index of the maps in a directory, in the file
+    cfg.CATALOG_FILE there, and answers queries from it.
+    """
+    def __init__(self, directory = None, path = None):
+        """
+        Open, or create, the index of the maps in directory (by default
+        the current directory), stored at path.
+        """
+        self.directory = directory or os.getcwd()
+        self.path = path or os.path.join(self.directory, cfg.CATALOG_FILE)
+        self.db = sqlite3.connect(self.path)
+        # Truncate the rollback journal instead of deleting it, so
+        # writing the index does not change the directory's mtime.
+        self.db.execute('PRAGMA journal_mode = TRUNCATE')
+        if self.db.execute('PRAGMA user_version').fetchone()[0] != SCHEMA_VERSION:
+            self.db.executescript('DROP TABLE IF EXISTS maps; '
+                                  'DROP TABLE IF EXISTS meta;')
+            self.db.execute('PRAGMA user_version = {}'.format(SCHEMA_VERSION))
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        """
+        Close the index.
+        """
+        self.db.close()
+
+    def refresh(self, quick = False):
+        """
+        Bring the index up to date with the directory and return the
+        number of maps (added or changed, removed). The mtime and size of
+        every file are compared with the index. If quick is set, nothing
+        is done if the directory's mtime has not changed since the last
+        refresh; files added, removed or renamed change it, but a file
+        rewritten in place may not, so its change is missed.
+        """
+        dir_mtime = os.stat(self.directory).st_mtime
+        if quick and self.meta('dir_mtime') == dir_mtime:
+            return 0, 0
+        known = dict((filename, (mtime, size)) for filename, mtime, size in
+                     self.db.execute('SELECT filename, mtime, size FROM maps'))
+        changed = []
+        for filename, mtime, size in list_maps(self.directory):
+            if known.pop(filename, None) != (mtime, size):
+                changed.append((filename, mtime, size))
+        with self.db:
+            self.db.executemany('DELETE FROM maps WHERE filename = ?',
+                                [(filename,) for filename in known])
+            for filename, mtime, size in changed:
+                self.db.execute(
+                    'INSERT OR REPLACE INTO maps VALUES '
+                    '(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    self.describe(filename, mtime, size))
+        with self.db:
+            self.set_meta('dir_mtime', dir_mtime)
+        return len(changed), len(known)
+
+    def describe(self, filename, mtime, size):
+        """
+        Read a map file and return its row. A file that cannot be read
+        as a map gets a row with no size, so it is not read again until
+        it changes.
+        """
+        name, extension = split_name(filename)
+        try:
+            width, height, mines, digest, openings, bbbv = read_map(
+                os.path.join(self.directory, filename), extension)
+        except (IOError, OSError, ValueError, IndexError, struct.error):
+            return (filename, name, extension, mtime, size) + (None,) * 7
+        return (filename, name, extension, mtime, size, width, height, mines,
+                mines / (width * height), digest, openings, bbbv)
+
+    def meta(self, key):
+        """
+        Return a value saved with set_meta, or None.
+        """
+        row = self.db.execute('SELECT value FROM meta WHERE key = ?',
+                              (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key, value):
+        """
+        Save a value in the index.
+        """
+        self.db.execute('INSERT OR REPLACE INTO meta VALUES (?, ?)',
+                        (key, value))
+
+    def find(self, width = None, height = None, mines = None,
+             min_density = None, max_density = None, min_bbbv = None,
+             max_bbbv = None, limit = None):
+        """
+        Return a MapInfo for every map that matches all of the given
+        conditions, in order of name, at most limit of them.
+        """
+        conditions = ['width IS NOT NULL']
+        values = []
+        for column, operator, value in (
+                ('width', '=', width), ('height', '=', height),
+                ('mines', '=', mines), ('density', '>=', min_density),
+                ('density', '<=', max_density), ('bbbv', '>=', min_bbbv),
+                ('bbbv', '<=', max_bbbv)):
+            if value is not None:
+                conditions.append('{} {} ?'.format(column, operator))
+                values.append(value)
+        query = ('SELECT * FROM maps WHERE ' + ' AND '.join(conditions) +
+                 ' ORDER BY length(name), name, extension')
+        if limit is not None:
+            query += ' LIMIT {:d}'.format(limit)
+        return [MapInfo(*row) for row in self.db.execute(query, values)]
+
+    def get(self, name):
+        """
+        Return the MapInfo of the map with the given name, preferring
+        the binary file if there are both, or None if there is none.
+        """
+        row = self.db.execute(
+            'SELECT * FROM maps WHERE name = ? AND width IS NOT NULL '
+            'ORDER BY extension != ? LIMIT 1',
+            (name, cfg.BINARY_MAP_EXTENSION)).fetchone()
+        return MapInfo(*row) if row else None
+
+    def names(self, limit = None):
+        """
+        Return the names of the maps, in order, at most limit of them.
+        """
+        query = ('SELECT DISTINCT name FROM maps WHERE width IS NOT NULL '
+                 'ORDER BY length(name), name')
+        if limit is not None:
+            query += ' LIMIT {:d}'.format(limit)
+        return [row[0] for row in self.db.execute(query)]
+
+    def count(self):
+        """
+        Return the number of maps.
+        """
+        return self.db.execute('SELECT COUNT(DISTINCT name) FROM maps '
+                               'WHERE width IS NOT NULL').fetchone()[0]
+
+def main(argv = None):
+    """
+    Refresh or search the index from the command line.
+    """
+    parser = argparse.ArgumentParser(description = __doc__.split('\n\n')[0])
+    parser.add_argument('--directory', help = 'map directory (default: .)')
+    commands = parser.add_subparsers(dest = 'command')
+    refresh_parser = commands.add_parser('refresh', help = 'update the index')
+    refresh_parser.add_argument('--quick', action = 'store_true',
+                                help = 'skip the files if the directory '
+                                       'mtime is unchanged')
+    find_parser = commands.add_parser('find', help = 'search the index')
+    for option in ('width', 'height', 'mines', 'min-bbbv', 'max-bbbv',
+                   'limit'):
+        find_parser.add_argument('--' + option, type = int)
+    find_parser.add_argument('--min-density', type = float)
+    find_parser.add_argument('--max-density', type = float)
+    args = parser.parse_args(argv)
+    catalog = Catalog(args.directory)
+    if args.command == 'refresh':
+        changed, removed = catalog.refresh(args.quick)
+        print('{} maps indexed, {} removed, {} in all'.format(
+            changed, removed, catalog.count()))
+    elif args.command == 'find':
+        catalog.refresh(quick = True)
+        for info in catalog.find(args.width, args.height, args.mines,
+                                 args.min_density, args.max_density,
+                                 args.min_bbbv, args.max_bbbv, args.limit):
+            print('{} {}x{} mines: {} density: {:.3f} openings: {} '
+                  '3BV: {}'.format(info.filename, info.width, info.height,
+                                   info.mines, info.density, info.openings,
+                                   info.bbbv))
+    else:
+        parser.print_help()
+    catalog.close()
+
+if __name__ == '__main__':
+    main()
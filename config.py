@@ -21,6 +21,10 @@ HEIGHT = 770
 STATUS_BAR_HEIGHT = 20
 STATUS_BAR_COLOR = BLACK
 FRAME_RATE = 60
+# Block on input instead of redrawing at FRAME_RATE.
+EVENT_DRIVEN = False
+# Milliseconds between clock updates in the event-driven loop.
+CLOCK_INTERVAL = 100
 WELCOME_MESSAGE = 'Welcome to Minesweeper! Choose a level'
 WIN_MESSAGE = 'You win! Press ENTER to return to the menu.'
 DEAD_MESSAGE = 'Oops! You hit a mine. Press ENTER to return to menu.'
@@ -36,6 +40,63 @@ HIDDEN_COLOR = WHITE
 LINE_COLOR = BLACK
 LINE_THICKNESS = 3
 BEST_TIMES_FILE = 'best_times.txt'
+# Number of rendered text surfaces kept by the tile cache.
+TEXT_CACHE_SIZE = 64
+# Repaint only the squares that changed instead of the whole board.
+DIRTY_RENDERING = True
+
+# PYGAME CAMERA:
+# Smallest and largest square sizes, in pixels, the camera zooms to.
+CAMERA_MIN_SQUARE = 4
+CAMERA_MAX_SQUARE = 64
+# Squares smaller than this many pixels get thin grid lines.
+CAMERA_THIN_LINES = 16
+# Zoom factor of one wheel click or key press.
+CAMERA_ZOOM_STEP = 1.25
+# Pixels panned by one arrow key press.
+CAMERA_PAN_STEP = 100
+# Pixels the mouse must move with a button held to drag, not click.
+CAMERA_DRAG_THRESHOLD = 5
+
+# MAP FILES:
+# Extension of binary, memory-mapped maps (see mapfile); text maps end
+# in '.txt'.
+BINARY_MAP_EXTENSION = '.bin'
+
+# TERMINAL DISPLAY:
+# Redraw only the changed squares, with ANSI escape codes, when the
+# command-line version writes to a terminal.
+ANSI_RENDERING = True
+# Lines kept below the board for prompts and messages.
+TERMINAL_PROMPT_LINES = 8
+# (columns, lines) assumed when the terminal size cannot be found.
+TERMINAL_SIZE = (80, 24)
+# Keys that scroll the board, as (rows, columns) in half-screens.
+SCROLL_KEYS = {'w': (-1, 0), 's': (1, 0), 'a': (0, -1), 'd': (0, 1)}
+
+# BOARD ENGINES:
+# 'list' keeps the board in lists of strings, 'array' in flat bytearrays,
+# 'sparse' in sets and row bitmaps; 'auto' picks one by size and density.
+ENGINE = 'list'
+# Boards with at least this many squares use the 'array' engine...
+ARRAY_MIN_SQUARES = 10000
+# ...or the 'sparse' engine if they are this big and have fewer mines
+# than this fraction of their squares.
+SPARSE_MIN_SQUARES = 1000000
+SPARSE_MAX_DENSITY = 0.01
+# Number of neighbor counts cached by the 'sparse' engine.
+SPARSE_COUNT_CACHE = 4096
+# Check the board's win counters against a full scan in check_win.
+CHECK_COUNTERS = False
+
+# BOARD TOPOLOGY:
+# Which squares are neighbors: 'square' (the eight around a square),
+# 'torus' (the same, wrapping around the edges), 'hex' (six, on a grid
+# whose odd rows are shifted half a square right), 'knight' (a knight's
+# move away) or 'radiusN' (within N rows and columns, N up to 7).
+TOPOLOGY = 'square'
+# Number of adjacency indexes, one per board shape and topology, kept.
+ADJACENCY_CACHE = 4
 
 # BOARD DISPLAY CHARACTERS:
 MINE_CHAR = 'x'
@@ -58,6 +119,97 @@ SELECTED = {True: RED, False: WHITE}
 
 BG_COLORS = {'safe': WHITE, 'flag': PINK}
 
+# ENDLESS BOARDS:
+# Width and height of a chunk, in squares.
+CHUNK_SIZE = 64
+# Fraction of squares that hold mines.
+ENDLESS_DENSITY = 0.15
+# Memory kept for an endless board, in chunks: each chunk in memory counts
+# as one, and the compressed marks of dropped chunks by their size. See
+# endless.EndlessBoard.
+ENDLESS_MAX_CHUNKS = 256
+# Squares revealed by one mark_safe call before the reveal is paused.
+ENDLESS_REVEAL_LIMIT = 100000
+
+# PROBABILITY ENGINE:
+# Milliseconds allowed for one exact probability computation.
+PROBABILITY_BUDGET = 50
+# Search steps allowed for one probability computation in simulate.py,
+# about PROBABILITY_BUDGET on a typical machine; a step budget, unlike a
+# time budget, lets a seeded simulation play the same games every run.
+PROBABILITY_STEPS = 25000
+# Largest frontier component enumerated exactly, in squares.
+PROBABILITY_MAX_CELLS = 400
+# Number of component shapes whose solutions are memoized.
+PROBABILITY_MEMO_SIZE = 10000
+
+# INSTRUMENTATION:
+# Time frames and reveals in the pygame front-end (toggled with I).
+INSTRUMENT = False
+# Number of frames and moves the rolling percentiles are taken over.
+INSTRUMENT_WINDOW = 600
+# Milliseconds between summaries on the status bar and in the log.
+INSTRUMENT_DUMP_INTERVAL = 1000
+# File the summaries are appended to as JSON lines, or None.
+INSTRUMENT_LOG = 'frames.jsonl'
+# File cProfile captures (toggled with P) are saved to.
+PROFILE_FILE = 'minesweeper.prof'
+
+# GAME SERVER:
+SERVER_HOST = '127.0.0.1'
+SERVER_PORT = 8765
+# Seconds a session may sit idle before it is closed.
+SERVER_IDLE_TIMEOUT = 300
+# Seconds between sweeps for idle sessions.
+SERVER_SWEEP_INTERVAL = 10
+# Squares revealed before a flood fill yields to other clients.
+SERVER_REVEAL_BATCH = 4096
+SERVER_MAX_SESSIONS = 10000
+# Largest board, in squares, a client may ask for.
+SERVER_MAX_SQUARES = 1000000
+# Rows and columns of an endless game must lie within this many squares
+# of 0, so its chunk coordinates fit in 64 bits.
+SERVER_ENDLESS_REACH = 2 ** 62
+# Longest request line, in bytes.
+SERVER_MAX_LINE = 65536
+
+# MOVE JOURNALS:
+# Number of moves buffered before they are written as one block.
+JOURNAL_BLOCK = 4096
+# Number of moves between snapshots of the board.
+JOURNAL_SNAPSHOT_INTERVAL = 10000
+
+# NO-GUESS BOARDS:
+# Deal boards that can be cleared by logic alone in Board.reset.
+NO_GUESS = False
+# Directory of the pools of ready boards, one file per board size.
+NOGUESS_POOL_DIR = 'noguess_pool'
+# Boards a pool is filled up to, once it holds fewer than NOGUESS_POOL_LOW.
+NOGUESS_POOL_SIZE = 50
+NOGUESS_POOL_LOW = 10
+# Worker processes generating boards, or None for one per CPU.
+NOGUESS_WORKERS = None
+# Candidates sampled for one board before giving up.
+NOGUESS_MAX_ATTEMPTS = 100000
+# Candidates sampled by Board.reset when the pool is empty, before it
+# deals a random board instead and shows NOGUESS_FALLBACK_NOTICE.
+NOGUESS_FALLBACK_ATTEMPTS = 20
+NOGUESS_FALLBACK_NOTICE = 'No no-guess board was ready: you may have to guess.'
+
+# MAP CATALOG:
+# File in the map directory that holds the index of its maps.
+CATALOG_FILE = '.mapcatalog.db'
+# Most map names listed when the command-line game asks for a map.
+CATALOG_LIST_LIMIT = 50
+
+# BENCHMARKS:
+# Number of times each benchmark is repeated; the median is reported.
+BENCH_REPEAT = 5
+# Factors by which the largest level is scaled up for the reset benchmarks.
+BENCH_SCALES = (2, 4, 8)
+# Fraction by which a benchmark must slow down to count as a regression.
+BENCH_THRESHOLD = 0.10
+
 # LEVEL DEFINITIONS
 # {level: (board width in squares, number of mines)}
 LEVELS = {0: (9, 10) , 1: (16, 40), 2: (23, 99), 3: (26, 150)}
@@ -0,0 +1,283 @@
+"""
+An endless minesweeper board, generated chunk by chunk as it is explored.
+"""
+
+from __future__ import division
+from collections import OrderedDict
+import hashlib
+import random
+import sqlite3
+import struct
+import zlib
+import config as cfg
+from arrayboard import COVERED, REVEALED, FLAGGED, EXPLODED
+
+class Chunk(object):
+    """
+    A square piece of an EndlessBoard: its mines, as a bytearray of 0/1
+    values, and the player's marks, as a bytearray of cell states (see
+    arrayboard), or None while the player has not touched it.
+    """
+    def __init__(self, mines, state = None):
+        self.mines = mines
+        self.state = state
+
+class EndlessBoard(object):
+    """
+    This class plays minesweeper on a board with no edges. The world is
+    split into chunks of cfg.CHUNK_SIZE x cfg.CHUNK_SIZE squares. A chunk's
+    mines are generated when it is first needed, from a hash of the seed
+    and the chunk's coordinates, so they can be thrown away and generated
+    again at any time. The memory used is capped at cfg.ENDLESS_MAX_CHUNKS
+    chunks: each chunk in memory counts as one, and compressed marks count
+    as the fraction of a chunk's size they take up. When the cap is
+    reached, the least recently used chunk is dropped, and if the player
+    had marked it, its marks are compressed and kept. Once compressed
+    marks take up half of the cap, the oldest are moved to a temporary
+    database on disk.
+    Rows and columns may be any integers, including negative ones. The
+    display attribute is a read-only view like Board.display, with no
+    length: display[r][c] is cell(r, c).
+    """
+    def __init__(self, seed = 0, density = cfg.ENDLESS_DENSITY,
+                 chunk_size = cfg.CHUNK_SIZE,
+                 max_chunks = cfg.ENDLESS_MAX_CHUNKS):
+        """
+        Create an endless board where a fraction density of the squares
+        hold mines.
+        """
+        self.seed = seed
+        self.size = chunk_size
+        self.chunk_mines = int(round(density * chunk_size ** 2))
+        self.max_chunks = max_chunks
+        self.chunks = OrderedDict()
+        self.compacted = OrderedDict()
+        self.compacted_size = 0
+        self.spill_db = None
+        self.spilled = 0
+        self.unfinished = []
+        self.dead = False
+        self.revealed = 0
+        self.flags = 0
+        self.display = _DisplayView(self)
+
+    def chunk_seed(self, cx, cy):
+        """
+        Return the seed used to place the mines of chunk (cx, cy).
+        """
+        key = struct.pack('<qqq', self.seed, cx, cy)
+        return int(hashlib.sha1(key).hexdigest()[:16], 16)
+
+    def chunk(self, cx, cy):
+        """
+        Return chunk (cx, cy), generating it or restoring its compressed
+        marks if it is not in memory, and mark it as recently used.
+        """
+        key = (cx, cy)
+        chunk = self.chunks.pop(key, None)
+        if chunk is None:
+            rng = random.Random(self.chunk_seed(cx, cy))
+            mines = bytearray(self.size ** 2)
+            for i in rng.sample(range(self.size ** 2), self.chunk_mines):
+                mines[i] = 1
+            state = self.compacted.pop(key, None)
+            if state is not None:
+                self.compacted_size -= len(state)
+            elif self.spilled:
+                state = self.unspill(key)
+            if state is not None:
+                state = bytearray(zlib.decompress(state))
+            chunk = Chunk(mines, state)
+            budget = self.max_chunks * self.size ** 2
+            while ((len(self.chunks) + 1) * self.size ** 2 +
+                   self.compacted_size > budget):
+                if self.compacted_size * 2 > budget or not self.chunks:
+                    self.spill()
+                else:
+                    self.evict()
+        self.chunks[key] = chunk
+        return chunk
+
+    def evict(self):
+        """
+        Drop the least recently used chunk, compressing its marks if the
+        player touched it.
+        """
+        key, chunk = self.chunks.popitem(last = False)
+        if chunk.state is not None:
+            state = zlib.compress(bytes(chunk.state))
+            self.compacted[key] = state
+            self.compacted_size += len(state)
+
+    def spill(self):
+        """
+        Move the oldest compressed marks to the spill database, a
+        temporary file that SQLite deletes when it is closed.
+        """
+        key, state = self.compacted.popitem(last = False)
+        self.compacted_size -= len(state)
+        if self.spill_db is None:
+            self.spill_db = sqlite3.connect('')
+            self.spill_db.execute('CREATE TABLE chunks (cx INTEGER, '
+                                  'cy INTEGER, state BLOB, '
+                                  'PRIMARY KEY (cx, cy))')
+        self.spill_db.execute('INSERT INTO chunks VALUES (?, ?, ?)',
+                              key + (sqlite3.Binary(state),))
+        self.spilled += 1
+
+    def unspill(self, key):
+        """
+        Take the compressed marks of chunk key out of the spill database
+        and return them, or None if they are not there.
+        """
+        row = self.spill_db.execute('SELECT state FROM chunks '
+                                    'WHERE cx = ? AND cy = ?', key).fetchone()
+        if row is None:
+            return None
+        self.spill_db.execute('DELETE FROM chunks WHERE cx = ? AND cy = ?',
+                              key)
+        self.spilled -= 1
+        return bytes(row[0])
+
+    def locate(self, r, c):
+        """
+        Return (chunk, index) for the square at row r, column c.
+        """
+        size = self.size
+        chunk = self.chunk(r // size, c // size)
+        return chunk, (r % size) * size + c % size
+
+    def has_mine(self, r, c):
+        """
+        Return True if the square at row r, column c contains a mine.
+        """
+        chunk, i = self.locate(r, c)
+        return chunk.mines[i] == 1
+
+    def state(self, r, c):
+        """
+        Return the state of the square at row r, column c.
+        """
+        chunk, i = self.locate(r, c)
+        return chunk.state[i] if chunk.state is not None else COVERED
+
+    def set_state(self, r, c, value):
+        """
+        Set the state of the square at row r, column c.
+        """
+        chunk, i = self.locate(r, c)
+        if chunk.state is None:
+            chunk.state = bytearray(self.size ** 2)
+        chunk.state[i] = value
+
+    def neighbors(self, r, c):
+        """
+        Return the row and column number for each square that is adjacent
+        to the square at row r, column c.
+        """
+        return [[r + dr, c + dc] for dr in (-1, 0, 1) for dc in (-1, 0, 1)
+                if dr or dc]
+
+    def neighbor_mines(self, r, c):
+        """
+        Return a list of neighbor squares that contain mines.
+        """
+        return [nei for nei in self.neighbors(r, c) if self.has_mine(*nei)]
+
+    def cell(self, r, c):
+        """
+        Return the display value of the square at row r, column c:
+        the hidden, mine or error character, or a neighbor count.
+        """
+        value = self.state(r, c)
+        if value == REVEALED:
+            return len(self.neighbor_mines(r, c))
+        return {COVERED: cfg.HIDDEN_CHAR, FLAGGED: cfg.MINE_CHAR,
+                EXPLODED: cfg.ERROR_CHAR}[value]
+
+    def mark_mine(self, r, c):
+        """
+        Declare that the square at row r, column c contains a mine,
+        if it is covered.
+        """
+        if self.state(r, c) != COVERED:
+            return
+        self.set_state(r, c, FLAGGED)
+        self.flags += 1
+
+    def unmark_mine(self, r, c):
+        """
+        Undeclare a mine in the square at row r, column c, if it is flagged.
+        """
+        if self.state(r, c) != FLAGGED:
+            return
+        self.set_state(r, c, COVERED)
+        self.flags -= 1
+
+    def mark_safe(self, r, c, limit = cfg.ENDLESS_REVEAL_LIMIT):
+        """
+        Declare that the square at row r, column c does not contain a mine.
+        Only covered squares can be revealed; a flag must be taken off
+        first. If wrong, the player loses. If correct, the square is
+        revealed, and the reveal spreads through the connected squares
+        that have no neighboring mines, across chunk boundaries. On a
+        sparse board that area can be unbounded, so at most limit squares
+        are revealed; the rest of the reveal is kept in self.unfinished
+        and carried on by resume. Return a list of (row, col) pairs for
+        the squares that changed.
+        """
+        if self.state(r, c) != COVERED:
+            return []
+        if self.has_mine(r, c):
+            self.dead = True
+            self.set_state(r, c, EXPLODED)
+            return [(r, c)]
+        self.set_state(r, c, REVEALED)
+        self.unfinished.append((r, c))
+        return self.resume(limit)
+
+    def resume(self, limit = cfg.ENDLESS_REVEAL_LIMIT):
+        """
+        Carry on an unfinished reveal for at most limit more squares.
+        Return a list of (row, col) pairs for the squares that changed.
+        """
+        revealed = []
+        stack = self.unfinished
+        while stack and len(revealed) < limit:
+            r, c = stack.pop()
+            revealed.append((r, c))
+            if self.neighbor_mines(r, c):
+                continue
+            for nr, nc in self.neighbors(r, c):
+                if self.state(nr, nc) == COVERED:
+                    self.set_state(nr, nc, REVEALED)
+                    stack.append((nr, nc))
+        self.revealed += len(revealed)
+        return revealed
+
+    def check_win(self):
+        """
+        An endless board can never be cleared.
+        """
+        return False
+
+class _DisplayView(object):
+    """
+    The display rows of an EndlessBoard, without end.
+    """
+    def __init__(self, board):
+        self.board = board
+
+    def __getitem__(self, r):
+        return _DisplayRow(self.board, r)
+
+class _DisplayRow(object):
+    """
+    A display row of an EndlessBoard, without end.
+    """
+    def __init__(self, board, r):
+        self.board = board
+        self.r = r
+
+    def __getitem__(self, c):
+        return self.board.cell(self.r, c)
@@ -0,0 +1,48 @@
+"""
+Random mine layouts for minesweeper boards.
+"""
+
+from __future__ import division
+import random
+import adjacency
+
+def random_layout(width, height, mines, rng = None, seed = None,
+                  safe = None, safe_radius = 1, topology = None):
+    """
+    Return a bytearray of width * height 0/1 values with exactly `mines`
+    mines placed uniformly at random, in time linear in the board size.
+    Use the random.Random object rng if one is given, otherwise a new one
+    seeded with seed. If safe is a (row, col) pair, no mine is placed
+    within safe_radius squares of it, so a first click there is safe;
+    if topology names a topology (see adjacency.get_topology), no mine is
+    placed on safe or its neighbors in that topology instead.
+    """
+    if rng is None:
+        rng = random.Random(seed)
+    cells = width * height
+    excluded = set()
+    if safe is not None:
+        row, col = safe
+        if topology is not None:
+            excluded.add(row * width + col)
+            for r, c in adjacency.get_topology(topology).neighbors(
+                    row, col, width, height):
+                excluded.add(r * width + c)
+        else:
+            for r in range(max(0, row - safe_radius),
+                           min(height, row + safe_radius + 1)):
+                for c in range(max(0, col - safe_radius),
+                               min(width, col + safe_radius + 1)):
+                    excluded.add(r * width + c)
+    allowed = cells - len(excluded)
+    if not 0 <= mines <= allowed:
+        raise ValueError('cannot place {} mines in {} squares'.format(
+            mines, allowed))
+    # Sample from the first `allowed` indices, and send any sample that
+    # lands on an excluded square to one of the allowed squares past the end.
+    spare = [i for i in range(allowed, cells) if i not in excluded]
+    remap = dict(zip(sorted(i for i in excluded if i < allowed), spare))
+    layout = bytearray(cells)
+    for i in rng.sample(range(allowed), mines):
+        layout[remap.get(i, i)] = 1
+    return layout
@@ -1,41 +1,46 @@
 """
-Helper functions used by the other minesweeper python files.
+Time formatting helpers used by the other minesweeper python files.
 """
 
 from __future__ import division
-import config as cfg
-from board import Board
+import os
+import sys
+import time
 
-def frames_to_string(frames, frame_rate):
+# Use a monotonic clock, never time.time, which jumps when the system
+# clock is set. Python 2 has no time.monotonic: there, time.clock counts
+# wall time on Windows, and os.times()[4] counts real time since a fixed
+# point in the past, in clock ticks (usually 10 ms), elsewhere.
+if hasattr(time, 'monotonic'):
+    _clock = time.monotonic
+elif sys.platform == 'win32':
+    _clock = time.clock
+else:
+    def _clock():
+        return os.times()[4]
+
+def clock_ms():
     """
-    Convert a number of frames to a time string, such as '11:45'.
+    Return the current time of a monotonic clock in milliseconds.
     """
-    total_seconds = frames // frame_rate
-    minutes = str(total_seconds // 60)
-    seconds = total_seconds % 60
-    if seconds < 10:
-        seconds = '0' + str(seconds)
-    else:
-        seconds = str(seconds)
-    return minutes + ':' + seconds
+    return int(_clock() * 1000)
 
-def string_to_frames(string, frame_rate):
+def ms_to_string(ms, decimals = 3):
     """
-    Convert a time string to the equivalent number of frames.
+    Convert a number of milliseconds to a time string, such as '11:45.250',
+    with up to three decimal places on the seconds.
     """
-    minutes, seconds = string.split(':')
-    return (int(minutes) * 60 + int(seconds)) * frame_rate
+    minutes, ms = divmod(int(ms), 60000)
+    seconds, ms = divmod(ms, 1000)
+    string = '{}:{:02d}'.format(minutes, seconds)
+    if decimals:
+        string += '.{:0{}d}'.format(ms // 10 ** (3 - decimals), decimals)
+    return string
 
-def load_map(number, extension = '.txt'):
+def string_to_ms(string):
     """
-    Given a certain map # n, open the file 'mapn.txt'.
-    Return the Board object created from that text file.
+    Convert a time string, with or without decimal places on the seconds,
+    to the equivalent number of milliseconds.
     """
-    filename = 'map' + number + extension
-    territory_str = ''
-    with open(filename, 'r') as file_obj:
-        territory_str = file_obj.read()
-    if territory_str:
-        return Board(territory_str)
-    else:
-        print filename + 'not found.'
+    minutes, seconds = string.split(':')
+    return int(minutes) * 60000 + int(round(float(seconds) * 1000))
@@ -0,0 +1,187 @@
+"""
+Opt-in instrumentation for the pygame front-end: per-frame phase timings,
+per-move reveal statistics, rolling percentiles and a cProfile switch.
+"""
+
+from __future__ import division
+from collections import deque
+from contextlib import contextmanager
+import cProfile
+import json
+import time
+import config as cfg
+
+# Use the most precise clock Python provides.
+_timer = getattr(time, 'perf_counter', time.time)
+
+# Frame phases, in the order they are reported.
+PHASES = ('input', 'simulate', 'draw')
+
+class RollingStats(object):
+    """
+    The last size samples of a measurement, with their percentiles.
+    """
+    def __init__(self, size = cfg.INSTRUMENT_WINDOW):
+        self.samples = deque(maxlen = size)
+
+    def add(self, value):
+        """
+        Add a sample, dropping the oldest one if the window is full.
+        """
+        self.samples.append(value)
+
+    def percentiles(self):
+        """
+        Return a dictionary of the p50, p95 and p99 samples: the samples
+        below which half, 95% and 99% of the samples fall.
+        """
+        ordered = sorted(self.samples) or [0]
+        last = len(ordered) - 1
+        return dict((name, ordered[min(last, int(fraction * len(ordered)))])
+                    for name, fraction in (('p50', 0.5), ('p95', 0.95),
+                                           ('p99', 0.99)))
+
+class FrameStats(object):
+    """
+    This class times each frame of the game loop, split into the phases
+    in PHASES, and the reveals made by the board (see Board.stats).
+    Phases may be nested: time spent in an inner phase is not counted
+    in the outer one. Every cfg.INSTRUMENT_DUMP_INTERVAL milliseconds,
+    the percentiles are summarized in self.summary and, if log_file is
+    given, appended to it as one line of JSON.
+    Nothing is measured while enabled is False.
+    """
+    def __init__(self, enabled = cfg.INSTRUMENT, log_file = cfg.INSTRUMENT_LOG):
+        self.enabled = enabled
+        self.log_file = log_file
+        self.frame = RollingStats()
+        self.phases = dict((name, RollingStats()) for name in PHASES)
+        self.cells = RollingStats()
+        self.depth = RollingStats()
+        self.current = dict((name, 0) for name in PHASES)
+        self.stack = []
+        self.frame_start = self.mark = _timer()
+        self.frames = 0
+        self.last_dump = self.frame_start
+        self.summary = ''
+
+    def toggle(self):
+        """
+        Turn measuring on or off, starting afresh when it is turned on.
+        """
+        self.__init__(not self.enabled, self.log_file)
+
+    def start_frame(self):
+        """
+        Start timing a new frame.
+        """
+        if self.enabled:
+            self.frame_start = self.mark = _timer()
+            self.stack = []
+            for name in PHASES:
+                self.current[name] = 0
+
+    def enter(self, name):
+        """
+        Start timing the named phase, pausing the phase it is nested in.
+        """
+        if self.enabled:
+            now = _timer()
+            if self.stack:
+                self.current[self.stack[-1]] += now - self.mark
+            self.stack.append(name)
+            self.mark = now
+
+    def exit(self):
+        """
+        Stop timing the innermost phase and resume the one around it.
+        """
+        if self.enabled and self.stack:
+            now = _timer()
+            self.current[self.stack.pop()] += now - self.mark
+            self.mark = now
+
+    @contextmanager
+    def phase(self, name):
+        """
+        Time the body of a with statement as the named phase.
+        """
+        self.enter(name)
+        try:
+            yield
+        finally:
+            self.exit()
+
+    def end_frame(self):
+        """
+        Record the frame's total and phase times, in milliseconds, and
+        dump a summary if one is due.
+        """
+        if not self.enabled:
+            return
+        now = _timer()
+        self.frame.add((now - self.frame_start) * 1000)
+        for name in PHASES:
+            self.phases[name].add(self.current[name] * 1000)
+        self.frames += 1
+        if (now - self.last_dump) * 1000 >= cfg.INSTRUMENT_DUMP_INTERVAL:
+            self.dump(now)
+
+    def record_move(self, cells, depth):
+        """
+        Record a move that revealed cells squares, with a flood fill whose
+        stack grew to depth entries.
+        """
+        if self.enabled:
+            self.cells.add(cells)
+            self.depth.add(depth)
+
+    def report(self, now):
+        """
+        Return a dictionary of the rolling percentiles.
+        """
+        report = {'time': time.time(), 'frames': self.frames,
+                  'fps': self.frames / (now - self.last_dump),
+                  'frame_ms': self.frame.percentiles(),
+                  'cells': self.cells.percentiles(),
+                  'depth': self.depth.percentiles()}
+        for name in PHASES:
+            report[name + '_ms'] = self.phases[name].percentiles()
+        return report
+
+    def dump(self, now):
+        """
+        Update self.summary and append the report to the log file.
+        """
+        report = self.report(now)
+        frame = report['frame_ms']
+        self.summary = 'FRAME p50/p95/p99: {:.1f}/{:.1f}/{:.1f} ms'.format(
+            frame['p50'], frame['p95'], frame['p99'])
+        if self.log_file:
+            with open(self.log_file, 'a') as file_obj:
+                file_obj.write(json.dumps(report, sort_keys = True) + '\n')
+        self.frames = 0
+        self.last_dump = now
+
+class Profiler(object):
+    """
+    A cProfile capture that can be started and stopped while the game runs.
+    Each capture is saved to file_name, for use with pstats.
+    """
+    def __init__(self, file_name = cfg.PROFILE_FILE):
+        self.file_name = file_name
+        self.profile = None
+
+    def toggle(self):
+        """
+        Start a capture, or stop and save the running one.
+        Return True if a capture is now running.
+        """
+        if self.profile is None:
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+            return True
+        self.profile.disable()
+        self.profile.dump_stats(self.file_name)
+        self.profile = None
+        return False
@@ -0,0 +1,259 @@
+"""
+An append-only binary journal of the moves made on a Board, with
+periodic snapshots, for replaying, auditing and resuming games.
+
+A journal starts with a 32-byte header (see HEADER) and the mine layout,
+one bit per square as in mapfile. Blocks follow, each starting with
+BLOCK (a tag and a size in bytes):
+
+    MOVES     a run of moves, three little-endian uint32 per move:
+              the action code (see ACTIONS), the row and the column
+    SNAPSHOT  a uint64 move number, then the zlib-compressed
+              Board.snapshot of the board before that move; one is
+              also written after every undo, rollback and restart,
+              which are not recorded as moves
+
+A block cut short by a crash is ignored when the journal is read, and
+cut off when it is resumed.
+
+    python journal.py replay game.msj --to 1000
+"""
+
+from __future__ import division, print_function
+import argparse
+import array
+import struct
+import zlib
+import config as cfg
+from board import str_to_layout
+from mapfile import bytes_to_bits, pack_layout
+import maps
+
+# magic, version, flags, reserved, width, height, mines, seed
+HEADER = struct.Struct('<4sBBHIIQQ')
+MAGIC = b'MSWJ'
+VERSION = 1
+HAS_SEED = 1
+# tag, size of the block's data in bytes
+BLOCK = struct.Struct('<cI')
+MOVES = b'M'
+SNAPSHOT = b'S'
+MOVE_NUMBER = struct.Struct('<Q')
+# {action: code}
+ACTIONS = {'safe': 0, 'flag': 1, 'unflag': 2}
+
+def move_array(data = b''):
+    """
+    Return an array of uint32 holding the moves encoded in data.
+    """
+    moves = array.array('I')
+    if moves.itemsize != 4:
+        moves = array.array('L')
+    if hasattr(moves, 'frombytes'):
+        moves.frombytes(data)
+    else:
+        moves.fromstring(data)
+    return moves
+
+def array_bytes(moves):
+    """
+    Return the bytes of an array of uint32.
+    """
+    if hasattr(moves, 'tobytes'):
+        return moves.tobytes()
+    return moves.tostring()
+
+class JournalWriter(object):
+    """
+    This class records the moves made on a board. Set it as the board's
+    journal and every mark_safe, mark_mine and unmark_mine call is
+    recorded before it is made. Moves are buffered and written in blocks
+    of cfg.JOURNAL_BLOCK moves; every snapshot_interval moves, a snapshot
+    of the board is written too, whenever no reveal is half done.
+    """
+    def __init__(self, file_obj, board, seed = None, resume = False,
+                 snapshot_interval = cfg.JOURNAL_SNAPSHOT_INTERVAL):
+        """
+        Start a journal for board in an open binary file. To carry on
+        an existing journal, open it for reading and writing ('r+b') and
+        set resume: the journal is read to count its moves, and anything
+        after its last complete block, left by a crash, is cut off before
+        new blocks are written. Otherwise the header and the board's
+        layout are written first, with seed, if given, for reference.
+        """
+        self.file_obj = file_obj
+        self.board = board
+        self.count = 0
+        self.snapshot_interval = snapshot_interval
+        self.pending = move_array()
+        if resume:
+            file_obj.seek(0)
+            reader = JournalReader(file_obj)
+            file_obj.seek(reader.valid_end)
+            file_obj.truncate()
+            self.count = reader.count
+        else:
+            file_obj.write(HEADER.pack(MAGIC, VERSION,
+                                       HAS_SEED if seed is not None else 0,
+                                       0, len(board.display[0]),
+                                       len(board.display), board.mine_count,
+                                       seed or 0))
+            file_obj.write(bytes(pack_layout(board.layout())))
+        self.last_snapshot = self.count
+        board.journal = self
+
+    def record(self, action, r, c):
+        """
+        Record a move about to be made.
+        """
+        if (self.count - self.last_snapshot >= self.snapshot_interval and
+            not self.board.unfinished):
+            self.snapshot()
+        self.pending.extend((ACTIONS[action], r, c))
+        self.count += 1
+        if len(self.pending) >= 3 * cfg.JOURNAL_BLOCK:
+            self.flush()
+
+    def snapshot(self):
+        """
+        Write the buffered moves and a snapshot of the board as it is now.
+        """
+        self.flush()
+        data = (MOVE_NUMBER.pack(self.count) +
+                zlib.compress(bytes(self.board.snapshot())))
+        self.file_obj.write(BLOCK.pack(SNAPSHOT, len(data)) + data)
+        self.last_snapshot = self.count
+
+    def flush(self):
+        """
+        Write the buffered moves to the file.
+        """
+        if self.pending:
+            data = array_bytes(self.pending)
+            self.file_obj.write(BLOCK.pack(MOVES, len(data)) + data)
+            self.pending = move_array()
+        self.file_obj.flush()
+
+    def close(self):
+        """
+        Write the buffered moves and stop recording.
+        """
+        self.flush()
+        if self.board.journal is self:
+            self.board.journal = None
+
+class JournalReader(object):
+    """
+    This class reads a journal: its layout, all of its moves as one flat
+    array of uint32 (action, row, col) triples, and its snapshots.
+    valid_end is the offset just past the last complete block.
+    """
+    def __init__(self, file_obj):
+        """
+        Read a journal from an open binary file.
+        """
+        data = file_obj.read()
+        (magic, version, flags, reserved, self.width, self.height,
+         self.mines, seed) = HEADER.unpack_from(data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError('not a minesweeper journal')
+        self.seed = seed if flags & HAS_SEED else None
+        cells = self.width * self.height
+        start = HEADER.size
+        end = start + (cells + 7) // 8
+        self.layout = str_to_layout(bytes_to_bits(data[start:end])[:cells])[0]
+        self.snapshots = []
+        chunks = []
+        count = 0
+        self.valid_end = end
+        while end + BLOCK.size <= len(data):
+            tag, size = BLOCK.unpack_from(data, end)
+            start = end + BLOCK.size
+            end = start + size
+            if end > len(data):
+                break
+            self.valid_end = end
+            if tag == MOVES:
+                chunks.append(data[start:end - size % 12])
+                count += size // 12
+            elif tag == SNAPSHOT:
+                self.snapshots.append((MOVE_NUMBER.unpack_from(data, start)[0],
+                                       start + MOVE_NUMBER.size, end))
+        self.data = data
+        self.moves = move_array(b''.join(chunks))
+        self.count = count
+
+    def board(self, engine = cfg.ENGINE):
+        """
+        Return a new board with the journal's layout and no moves made.
+        """
+        if engine == 'auto':
+            engine = maps.choose_engine(self.width * self.height, self.mines)
+        board = maps.make_board(engine = engine)
+        board.load_layout(bytearray(self.layout), self.width, self.height)
+        board.dead = False
+        return board
+
+    def replay(self, board, start = 0, stop = None):
+        """
+        Make moves start to stop (by default, to the end) on board, a
+        board as it was after the first start moves. The snapshots taken
+        from then until after move stop are restored as they come, so
+        undos, rollbacks and restarts, which are only written as
+        snapshots, are replayed too.
+        """
+        if stop is None or stop > self.count:
+            stop = self.count
+        moves = self.moves
+        actions = (board.mark_safe, board.mark_mine, board.unmark_mine)
+        done = start
+        for move, begin, end in self.snapshots:
+            if start <= move <= stop:
+                for i in range(3 * done, 3 * move, 3):
+                    actions[moves[i]](moves[i + 1], moves[i + 2])
+                board.restore(bytearray(zlib.decompress(self.data[begin:end])))
+                done = move
+        for i in range(3 * done, 3 * stop, 3):
+            actions[moves[i]](moves[i + 1], moves[i + 2])
+
+    def seek(self, number, engine = cfg.ENGINE):
+        """
+        Return a new board as it was after the first number moves,
+        replayed from the latest snapshot taken before then.
+        """
+        board = self.board(engine)
+        start = 0
+        for move, begin, end in self.snapshots:
+            if move <= number:
+                start = move
+        self.replay(board, start, number)
+        return board
+
+def main(argv = None):
+    """
+    Replay a journal from the command line and print the final board.
+    """
+    parser = argparse.ArgumentParser(description = __doc__.split('\n\n')[0])
+    commands = parser.add_subparsers(dest = 'command')
+    replay_parser = commands.add_parser('replay', help = 'replay a journal')
+    replay_parser.add_argument('journal')
+    replay_parser.add_argument('--to', type = int,
+                               help = 'stop after this many moves')
+    replay_parser.add_argument('--engine', choices = sorted(maps.ENGINES) + ['auto'],
+                               default = cfg.ENGINE)
+    args = parser.parse_args(argv)
+    if args.command != 'replay':
+        parser.print_help()
+        return
+    with open(args.journal, 'rb') as file_obj:
+        reader = JournalReader(file_obj)
+    number = reader.count if args.to is None else args.to
+    board = reader.seek(number, args.engine)
+    for row in board.display:
+        print(''.join(str(col) for col in row))
+    print('moves: {} of {}, mines left: {}, dead: {}, won: {}'.format(
+        min(number, reader.count), reader.count, board.mines_left,
+        board.dead, board.check_win()))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+"""
+Load-test a running server.py with many concurrent clients, and report
+request throughput and latency percentiles. Requires Python 3.7 or later.
+
+    python loadgen.py --clients 200 --seconds 10 --level 2
+    python loadgen.py --unix /tmp/minesweeper.sock --clients 1000
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+import config as cfg
+
+class Client(object):
+    """
+    One connection to the server, playing games by revealing covered
+    squares at random, and timing every request.
+    """
+    def __init__(self, reader, writer, latencies, rng):
+        self.reader = reader
+        self.writer = writer
+        self.latencies = latencies
+        self.rng = rng
+        self.errors = 0
+        self.games = 0
+
+    async def request(self, **request):
+        """
+        Send a request and return the response.
+        """
+        start = time.perf_counter()
+        self.writer.write((json.dumps(request) + '\n').encode('utf-8'))
+        response = json.loads((await self.reader.readline()).decode('utf-8'))
+        self.latencies.append(time.perf_counter() - start)
+        if not response['ok']:
+            self.errors += 1
+        return response
+
+    async def play(self, new_game, deadline):
+        """
+        Play games until the deadline.
+        """
+        while time.monotonic() < deadline:
+            game = await self.request(cmd = 'new', **new_game)
+            if not game['ok']:
+                return
+            self.games += 1
+            session = game['session']
+            covered = [(r, c) for r in range(game['height'])
+                       for c in range(game['width'])]
+            self.rng.shuffle(covered)
+            seen = set()
+            while covered and time.monotonic() < deadline:
+                r, c = covered.pop()
+                if (r, c) in seen:
+                    continue
+                result = await self.request(cmd = 'reveal', session = session,
+                                            row = r, col = c)
+                if not result['ok'] or result['dead'] or result['won']:
+                    break
+                seen.update((r, c) for r, c, value in result['changed'])
+            await self.request(cmd = 'close', session = session)
+
+def percentile(ordered, fraction):
+    """
+    Return the value below which the given fraction of the sorted list
+    ordered fall, or 0 if it is empty.
+    """
+    if not ordered:
+        return 0
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+async def run(clients, seconds, new_game, host = cfg.SERVER_HOST,
+              port = cfg.SERVER_PORT, path = None, seed = 0):
+    """
+    Run clients concurrent clients for the given number of seconds and
+    return a dictionary of results.
+    """
+    latencies = []
+    connections = []
+    for i in range(clients):
+        if path:
+            reader, writer = await asyncio.open_unix_connection(
+                path, limit = 2 ** 24)
+        else:
+            reader, writer = await asyncio.open_connection(
+                host, port, limit = 2 ** 24)
+        connections.append(Client(reader, writer, latencies,
+                                  random.Random(seed * 2 ** 32 + i)))
+    start = time.monotonic()
+    deadline = start + seconds
+    await asyncio.gather(*[client.play(new_game, deadline)
+                           for client in connections])
+    elapsed = time.monotonic() - start
+    for client in connections:
+        client.writer.close()
+    latencies.sort()
+    return {'clients': clients, 'seconds': elapsed,
+            'requests': len(latencies),
+            'requests_per_sec': len(latencies) / elapsed,
+            'games': sum(client.games for client in connections),
+            'errors': sum(client.errors for client in connections),
+            'latency_ms_p50': percentile(latencies, 0.5) * 1000,
+            'latency_ms_p95': percentile(latencies, 0.95) * 1000,
+            'latency_ms_p99': percentile(latencies, 0.99) * 1000,
+            'latency_ms_max': latencies[-1] * 1000 if latencies else 0}
+
+def main(argv = None):
+    """
+    Run the load generator from the command line and print its report.
+    """
+    parser = argparse.ArgumentParser(description = __doc__.split('\n\n')[0])
+    parser.add_argument('--host', default = cfg.SERVER_HOST)
+    parser.add_argument('--port', type = int, default = cfg.SERVER_PORT)
+    parser.add_argument('--unix', help = 'connect to this Unix socket instead')
+    parser.add_argument('--clients', type = int, default = 100)
+    parser.add_argument('--seconds', type = float, default = 10)
+    parser.add_argument('--level', type = int, choices = sorted(cfg.LEVELS),
+                        default = 2)
+    parser.add_argument('--width', type = int)
+    parser.add_argument('--height', type = int)
+    parser.add_argument('--mines', type = int)
+    parser.add_argument('--seed', type = int, default = 0)
+    parser.add_argument('--json', action = 'store_true',
+                        help = 'print the report as JSON')
+    args = parser.parse_args(argv)
+    if None in (args.width, args.height, args.mines):
+        new_game = {'level': args.level}
+    else:
+        new_game = {'width': args.width, 'height': args.height,
+                    'mines': args.mines}
+    report = asyncio.run(run(args.clients, args.seconds, new_game, args.host,
+                             args.port, args.unix, args.seed))
+    if args.json:
+        print(json.dumps(report, sort_keys = True))
+    else:
+        for key in sorted(report):
+            print('{}: {}'.format(key, report[key]))
+
+if __name__ == '__main__':
+    main()
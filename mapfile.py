@@ -0,0 +1,216 @@
+"""
+A compact binary map format, with converters to and from the text format.
+
+A binary map starts with a 32-byte header (see HEADER), followed by one
+bit per square in row-major order, most significant bit first, where
+a set bit means the square holds a mine. Maps are opened with mmap, so
+opening one takes constant time and squares are read on demand.
+
+    python mapfile.py to-binary map1.txt map1.bin
+    python mapfile.py to-text map1.bin map1.txt
+"""
+
+from __future__ import division
+import argparse
+import binascii
+import mmap
+import struct
+from board import str_to_layout
+
+# magic, version, flags, reserved, width, height, mines, seed
+HEADER = struct.Struct('<4sBBHIIQQ')
+MAGIC = b'MSWB'
+VERSION = 1
+HAS_SEED = 1
+# Number of squares converted at a time; a multiple of 8.
+CHUNK_BITS = 8 * 65536
+
+def bits_to_bytes(bits):
+    """
+    Pack a string of '0'/'1' characters, whose length is a multiple of 8,
+    into bytes.
+    """
+    if not bits:
+        return b''
+    return binascii.unhexlify('{:0{}x}'.format(int(bits, 2), len(bits) // 4))
+
+def bytes_to_bits(data):
+    """
+    Unpack bytes into a string of '0'/'1' characters.
+    """
+    if not data:
+        return ''
+    return bin(int(binascii.hexlify(data), 16))[2:].zfill(len(data) * 8)
+
+def pack_layout(layout):
+    """
+    Pack a bytearray of 0/1 values into bits, as stored in a binary map.
+    """
+    packed = bytearray((len(layout) + 7) // 8)
+    i = layout.find(b'\x01')
+    while i != -1:
+        packed[i >> 3] |= 0x80 >> (i & 7)
+        i = layout.find(b'\x01', i + 1)
+    return packed
+
+def unpack_layout(data, cells):
+    """
+    Unpack the first cells bits of data into a bytearray of 0/1 values.
+    """
+    return str_to_layout(bytes_to_bits(data)[:cells])[0]
+
+def text_to_binary(text_file, binary_file, seed = None):
+    """
+    Convert an open text map into an open binary map, one chunk at a time.
+    """
+    header_at = binary_file.tell()
+    binary_file.write(b'\0' * HEADER.size)
+    width = height = mines = 0
+    pending = ''
+    for line in text_file:
+        line = line.strip()
+        if not line:
+            continue
+        width = len(line)
+        height += 1
+        mines += line.count('1')
+        pending += line
+        if len(pending) >= CHUNK_BITS:
+            size = len(pending) - len(pending) % 8
+            binary_file.write(bits_to_bytes(pending[:size]))
+            pending = pending[size:]
+    if pending:
+        pending += '0' * (-len(pending) % 8)
+        binary_file.write(bits_to_bytes(pending))
+    end = binary_file.tell()
+    binary_file.seek(header_at)
+    binary_file.write(HEADER.pack(MAGIC, VERSION,
+                                  HAS_SEED if seed is not None else 0, 0,
+                                  width, height, mines, seed or 0))
+    binary_file.seek(end)
+
+def binary_to_text(binary_file, text_file):
+    """
+    Convert an open binary map into an open text map, one chunk at a time.
+    """
+    map_file = MapFile(binary_file)
+    width = map_file.width
+    pending = ''
+    start = HEADER.size
+    end = start + (map_file.width * map_file.height + 7) // 8
+    rows = 0
+    while rows < map_file.height:
+        if len(pending) < width:
+            chunk = map_file.data[start:min(end, start + CHUNK_BITS // 8)]
+            start += len(chunk)
+            pending += bytes_to_bits(chunk)
+            continue
+        count = min(len(pending) // width, map_file.height - rows)
+        text_file.write(''.join(pending[i * width:(i + 1) * width] + '\n'
+                                for i in range(count)))
+        pending = pending[count * width:]
+        rows += count
+    map_file.close()
+
+class MapFile(object):
+    """
+    A memory-mapped binary map. It can stand in for Board.territory: it
+    has one row per line of the map, and each row reads '0' or '1' for
+    a square straight from the mapped file.
+    """
+    def __init__(self, file_obj):
+        """
+        Map an open binary map file, or the file with the given name,
+        and read its header.
+        """
+        if not hasattr(file_obj, 'fileno'):
+            file_obj = open(file_obj, 'rb')
+        self.file_obj = file_obj
+        self.data = mmap.mmap(file_obj.fileno(), 0, access = mmap.ACCESS_READ)
+        (magic, version, flags, reserved, self.width, self.height,
+         self.mines, seed) = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError('not a binary minesweeper map')
+        self.seed = seed if flags & HAS_SEED else None
+
+    def close(self):
+        """
+        Unmap and close the file.
+        """
+        self.data.close()
+        self.file_obj.close()
+
+    def has_mine(self, r, c):
+        """
+        Return True if the square at row r, column c contains a mine.
+        """
+        i = r * self.width + c
+        byte = struct.unpack_from('B', self.data, HEADER.size + i // 8)[0]
+        return bool(byte & (0x80 >> i % 8))
+
+    def layout(self):
+        """
+        Return the whole map as a bytearray of 0/1 values.
+        """
+        cells = self.width * self.height
+        return unpack_layout(self.data[HEADER.size:
+                                       HEADER.size + (cells + 7) // 8], cells)
+
+    def __len__(self):
+        return self.height
+
+    def __getitem__(self, r):
+        if r < 0:
+            r += self.height
+        if not 0 <= r < self.height:
+            raise IndexError(r)
+        return _MappedRow(self, r)
+
+    def __iter__(self):
+        for r in range(self.height):
+            yield _MappedRow(self, r)
+
+class _MappedRow(object):
+    """
+    One row of a MapFile, read square by square.
+    """
+    def __init__(self, map_file, r):
+        self.map_file = map_file
+        self.r = r
+
+    def __len__(self):
+        return self.map_file.width
+
+    def __getitem__(self, c):
+        if c < 0:
+            c += self.map_file.width
+        if not 0 <= c < self.map_file.width:
+            raise IndexError(c)
+        return '1' if self.map_file.has_mine(self.r, c) else '0'
+
+    def __iter__(self):
+        for c in range(self.map_file.width):
+            yield self[c]
+
+def main(argv = None):
+    """
+    Convert maps between the text and binary formats from the command line.
+    """
+    parser = argparse.ArgumentParser(description = __doc__.split('\n\n')[0])
+    parser.add_argument('direction', choices = ['to-binary', 'to-text'])
+    parser.add_argument('source')
+    parser.add_argument('target')
+    parser.add_argument('--seed', type = int,
+                        help = 'seed to record in a binary map')
+    args = parser.parse_args(argv)
+    if args.direction == 'to-binary':
+        with open(args.source, 'r') as source:
+            with open(args.target, 'wb') as target:
+                text_to_binary(source, target, args.seed)
+    else:
+        with open(args.source, 'rb') as source:
+            with open(args.target, 'w') as target:
+                binary_to_text(source, target)
+
+if __name__ == '__main__':
+    main()
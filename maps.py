@@ -0,0 +1,68 @@
+"""
+Board engines, and loading maps into boards.
+"""
+
+from __future__ import division, print_function
+import config as cfg
+from board import Board
+from arrayboard import ArrayBoard
+from sparseboard import SparseBoard
+from mapfile import MapFile
+
+# {engine name: Board class}; the 'auto' engine picks one of these.
+ENGINES = {'list': Board, 'array': ArrayBoard, 'sparse': SparseBoard}
+
+def choose_engine(squares, mines):
+    """
+    Return the name of the engine best suited to a board with the given
+    number of squares and mines.
+    """
+    if (squares >= cfg.SPARSE_MIN_SQUARES and
+        mines < cfg.SPARSE_MAX_DENSITY * squares):
+        return 'sparse'
+    if squares >= cfg.ARRAY_MIN_SQUARES:
+        return 'array'
+    return 'list'
+
+def make_board(territory_str = None, engine = cfg.ENGINE, topology = None):
+    """
+    Create a Board object using the named engine from ENGINES,
+    or the one chosen by choose_engine if engine is 'auto', played
+    with the named topology (by default cfg.TOPOLOGY).
+    """
+    if engine == 'auto':
+        engine = 'list'
+        if territory_str:
+            squares = len(territory_str) - territory_str.count('\n')
+            engine = choose_engine(squares, territory_str.count('1'))
+    return ENGINES[engine](territory_str, topology)
+
+def load_map(number, extension = '.txt', engine = cfg.ENGINE,
+             topology = None):
+    """
+    Given a certain map # n, open the file 'mapn.txt'.
+    Return the Board object created from that text file.
+    Binary maps (cfg.BINARY_MAP_EXTENSION) are memory-mapped instead.
+    With engine 'auto', binary maps of cfg.SPARSE_MIN_SQUARES squares or
+    more are played with the 'sparse' engine whatever their density,
+    as it is the only one that loads them without reading every square.
+    See make_board for topology.
+    """
+    filename = 'map' + number + extension
+    if extension == cfg.BINARY_MAP_EXTENSION:
+        map_file = MapFile(filename)
+        if engine == 'auto':
+            squares = map_file.width * map_file.height
+            engine = choose_engine(squares, map_file.mines)
+            if squares >= cfg.SPARSE_MIN_SQUARES:
+                engine = 'sparse'
+        board = make_board(engine = engine, topology = topology)
+        board.load_territory(map_file)
+        return board
+    territory_str = ''
+    with open(filename, 'r') as file_obj:
+        territory_str = file_obj.read()
+    if territory_str:
+        return make_board(territory_str, engine, topology)
+    else:
+        print(filename + 'not found.')
@@ -4,17 +4,61 @@ To play the game, from the command line type:
 
     python minesweeper.py
 
+Other commands run the rest of the program; each takes its own options
+(see python minesweeper.py COMMAND --help):
+
+    python minesweeper.py gui --map 1
+    python minesweeper.py cli
+    python minesweeper.py simulate --level 3 --games 1000
+    python minesweeper.py convert-map to-binary map1.txt map1.bin
+    python minesweeper.py catalog find --width 30 --height 16
+    python minesweeper.py noguess fill --level 3
+    python minesweeper.py bench run --quick
+
+Only the modules a command needs are imported, so pygame is loaded for
+gui alone.
 """
 
-from minesweeperPG import MinesweeperPygame
-import helpers as hp
+from __future__ import print_function
+import time
+
+# Use the most precise clock Python provides.
+_timer = getattr(time, 'perf_counter', time.time)
+_start = _timer()
+
+import argparse
+import importlib
+import sys
+
+# {command: module whose main function runs it}
+COMMANDS = {'gui': 'minesweeperPG', 'cli': 'minesweeperCLI',
+            'simulate': 'simulate', 'convert-map': 'mapfile',
+            'catalog': 'catalog', 'noguess': 'noguess', 'bench': 'bench'}
 
-def main():
+def main(argv = None):
     """
-    Start a pygame version of minesweeper and enter the GUI event loop.
+    Run a command, by default the pygame game. With --import-time, print
+    how long starting up took, and how much of that went on importing
+    the command's modules, to stderr before running it.
     """
-    game = MinesweeperPygame(hp.load_map('1'))
-    game.game_loop()
+    parser = argparse.ArgumentParser(
+        description = __doc__.split('\n\n')[0].strip(),
+        usage = '%(prog)s [--import-time] [COMMAND] [ARGS...]')
+    parser.add_argument('--import-time', action = 'store_true',
+                        help = 'report the startup time')
+    parser.add_argument('command', nargs = '?', default = 'gui',
+                        choices = sorted(COMMANDS))
+    parser.add_argument('args', nargs = argparse.REMAINDER,
+                        help = 'options of the command')
+    args = parser.parse_args(argv)
+    before = _timer()
+    module = importlib.import_module(COMMANDS[args.command])
+    if args.import_time:
+        now = _timer()
+        print('startup: {:.1f} ms, importing {}: {:.1f} ms'.format(
+            (now - _start) * 1000, module.__name__, (now - before) * 1000),
+            file = sys.stderr)
+    module.main(args.args)
 
 if __name__ == '__main__':
     main()
@@ -3,20 +3,29 @@ Play minesweeper from the command line.
 """
 
 from __future__ import division
-from board import Board
-import os
+import argparse
+import maps
+import config as cfg
+import terminal
+from catalog import Catalog
 
 class MinesweeperCLI(object):
     """
     A class to play minesweeper using command-line interface.
     """
-    def __init__(self, board = None, header = ''):
+    def __init__(self, board = None, renderer = None, topology = None,
+                 engine = cfg.ENGINE):
         """
-        Initialize the game with a new Board object.
+        Initialize the game with a new Board object. Maps loaded later
+        are played with the named engine (see maps.make_board) and
+        topology, by default cfg.TOPOLOGY.
         """
         self.board = board
+        self.topology = topology
+        self.engine = engine
         self.playing = False
-        self.header = header
+        self.renderer = renderer or terminal.make_renderer()
+        self.catalog = None
 
     def game_loop(self):
         """
@@ -48,6 +57,7 @@ class MinesweeperCLI(object):
             self.playing = True
             self.game_loop()
         elif reply == 'q':
+            self.renderer.close()
             quit()
         else:
             print "Invalid Entry. Must be 'l', 'p', or 'q'."
@@ -63,43 +73,58 @@ class MinesweeperCLI(object):
 
     def game_lose(self):
         """
-        Display a defeat message and return to the main menu.
+        Display a defeat message, clear the board for another try
+        and return to the main menu.
         """
         print 'Oops! You hit a mine! Game over.'
         self.playing = False
-        new_board = Board(self.board.territory_str)
-        self.__init__(new_board, self.header)
+        self.board.restart()
 
     def input_map(self):
         """
-        Ask the user for a map # to load.
+        Ask the user for a map # to load. The catalog is fully refreshed
+        the first time; after that only if the map directory has changed.
         """
         reply = None
-        choices = os.listdir(os.getcwd())
-        choices = [choice[3:-4] for choice in choices if choice.startswith('map')]
+        if self.catalog is None:
+            self.catalog = Catalog()
+            self.catalog.refresh()
+        else:
+            self.catalog.refresh(quick = True)
         print 'Available maps:',
-        for choice in choices:
+        for choice in self.catalog.names(cfg.CATALOG_LIST_LIMIT):
             print choice + ',',
+        more = self.catalog.count() - cfg.CATALOG_LIST_LIMIT
+        if more > 0:
+            print '... and {} more'.format(more),
         print
         reply = raw_input('Enter a map number, (q)uit, or return to (m)enu: ')
         if reply == 'm':
             self.game_menu()
         elif reply == 'q':
+            self.renderer.close()
             quit()
-        elif reply in choices:
-            self.load_map(reply)
         else:
-            print "Invalid Entry. Must be a valid map number, 'q', or 'm'."
-            self.input_map()
+            info = self.catalog.get(reply)
+            if info is not None:
+                self.load_map(reply, info.extension)
+            else:
+                print "Invalid Entry. Must be a valid map number, 'q', or 'm'."
+                self.input_map()
 
     def initialize_board(self, territory_str):
         """
         Convert a territory string into a Board object to track the
         state of the game.
         """
-        self.board = Board(territory_str)
-        cols = [str(i) for i in range(len(self.board.territory[0]))]
-        self.header = '  ' + ''.join(cols)
+        self.set_board(maps.make_board(territory_str, self.engine,
+                                       self.topology))
+
+    def set_board(self, board):
+        """
+        Play on the given Board object.
+        """
+        self.board = board
 
     def load_map(self, number, extension = '.txt'):
         """
@@ -107,6 +132,11 @@ class MinesweeperCLI(object):
         Create a Board object from that text file.
         Return to the main menu.
         """
+        if extension == cfg.BINARY_MAP_EXTENSION:
+            self.set_board(maps.load_map(number, extension, self.engine,
+                                         self.topology))
+            self.game_menu()
+            return
         filename = 'map' + number + extension
         territory_str = ''
         with open(filename, 'r') as file_obj:
@@ -121,19 +151,19 @@ class MinesweeperCLI(object):
         """
         Print the game board to the console.
         """
-        cols = [i for i in range(len(self.board.territory[0]))]
-        print self.header
-        for r, row in enumerate(self.board.display):
-            print str(r) + ' ' + ''.join([str(r) for r in row])
+        self.renderer.draw(self.board)
 
     def get_next_move(self):
         """
         Get the next move from the user.
         """
-        print 'Choose a square to act upon'
+        print 'Choose a square to act upon, or scroll with w, a, s or d'
         row = self.input_row()
+        if row is None:
+            return
         col = self.input_col()
         move = self.input_move()
+        self.renderer.show(row, col)
         if move == 'mine':
             print 'Flagging a mine at ({},{}).'.format(row, col)
             self.board.mark_mine(row, col)
@@ -154,6 +184,8 @@ class MinesweeperCLI(object):
         choices = [str(i) for i in range(len(self.board.territory))]
         if row == 'q':
             self.game_menu()
+        elif row in cfg.SCROLL_KEYS:
+            self.renderer.scroll(*cfg.SCROLL_KEYS[row])
         elif row not in choices:
             print 'Invalid entry. Must be in {choices}'.format(choices = choices)
             return self.input_row()
@@ -191,3 +223,24 @@ class MinesweeperCLI(object):
         else:
             print "Invalid entry. Must be 'f', 'r', or 'd'."
             return self.input_move()
+
+def main(argv = None):
+    """
+    Start a command-line game, at the main menu or on a given map.
+    """
+    parser = argparse.ArgumentParser(description = __doc__.strip())
+    parser.add_argument('--map', help = 'number of the map to start with')
+    parser.add_argument('--engine', choices = sorted(maps.ENGINES) + ['auto'],
+                        default = cfg.ENGINE)
+    parser.add_argument('--topology', default = cfg.TOPOLOGY,
+                        help = "which squares are neighbors, such as 'torus'")
+    args = parser.parse_args(argv)
+    board = None
+    if args.map:
+        board = maps.load_map(args.map, engine = args.engine,
+                              topology = args.topology)
+    MinesweeperCLI(board, topology = args.topology,
+                   engine = args.engine).game_loop()
+
+if __name__ == '__main__':
+    main()
@@ -3,9 +3,30 @@ Play a GUI version of Minesweeper using pygame.
 """
 
 from __future__ import division
+import argparse
 import config as cfg
 import pygame as pg
 import helpers as hp
+import adjacency
+import maps
+from tiles import TileCache
+from camera import Camera
+from solver import Solver
+from instrument import FrameStats, Profiler
+
+# Timer event that wakes the event-driven loop to update the clock.
+CLOCK_EVENT = pg.USEREVENT + 1
+
+# The part of the screen the board is drawn on, above the status bar.
+BOARD_RECT = pg.Rect(0, 0, cfg.WIDTH, cfg.HEIGHT)
+
+# {key: (x, y) direction the camera pans}
+PAN_KEYS = {pg.K_LEFT: (-1, 0), pg.K_RIGHT: (1, 0),
+            pg.K_UP: (0, -1), pg.K_DOWN: (0, 1)}
+# {key or mouse button: zoom steps, in or out}
+ZOOM_KEYS = {pg.K_EQUALS: 1, pg.K_PLUS: 1, pg.K_KP_PLUS: 1,
+             pg.K_MINUS: -1, pg.K_KP_MINUS: -1}
+WHEEL_BUTTONS = {4: 1, 5: -1}
 
 class MinesweeperPygame(object):
     """
@@ -13,29 +34,54 @@ class MinesweeperPygame(object):
     """
     def __init__(self, board):
         """
-        Initialize the game with a board object.
-        Start pygame and create a pygame window.
+        Initialize the game with a board object. The pygame
+        window is opened by open_display, on the first draw.
         """
-        pg.init()
-        size = (cfg.WIDTH, cfg.HEIGHT + cfg.STATUS_BAR_HEIGHT)
-        self.screen = pg.display.set_mode(size)
-        pg.display.set_caption(cfg.GAME_TITLE)
+        self.screen = None
+        self.font = None
+        self.status_font = None
+        self.tiles = None
         self.board = board
         self.clock = pg.time.Clock()
         self.done = False
         self.status = 'pre game'
         self.message = cfg.WELCOME_MESSAGE
         self.best_message = ''
-        self.font = pg.font.SysFont(cfg.MAIN_TEXT_FONT, cfg.MAIN_TEXT_SIZE,
-                                    False, False)
-        self.status_font = pg.font.SysFont(cfg.STATUS_TEXT_FONT,
-                                           cfg.STATUS_TEXT_SIZE, False, False)
+        self.dirty = set()
+        self.full_redraw = True
         self.set_square_size()
         self.click_status = 'safe'
         self.selection = 0
         self.time = 0
+        self.start_time = 0
+        self.press = None
+        self.drag_from = None
+        self.status_text = None
+        self.autoplay = False
+        self.solver = None
+        self.frames = FrameStats()
+        self.profiler = Profiler()
+        self.board.stats = self.frames
         self.load_best_times()
 
+    def open_display(self):
+        """
+        Start pygame, create the pygame window and load the fonts,
+        unless that was already done.
+        """
+        if self.screen is not None:
+            return
+        pg.init()
+        size = (cfg.WIDTH, cfg.HEIGHT + cfg.STATUS_BAR_HEIGHT)
+        self.screen = pg.display.set_mode(size)
+        pg.display.set_caption(cfg.GAME_TITLE)
+        self.font = pg.font.SysFont(cfg.MAIN_TEXT_FONT, cfg.MAIN_TEXT_SIZE,
+                                    False, False)
+        self.status_font = pg.font.SysFont(cfg.STATUS_TEXT_FONT,
+                                           cfg.STATUS_TEXT_SIZE, False, False)
+        self.tiles = TileCache(self.font)
+        self.move_camera()
+
     def load_best_times(self):
         """
         Load the best times from file.
@@ -53,33 +99,114 @@ class MinesweeperPygame(object):
 
     def set_square_size(self):
         """
-        Use the board size and screen width/height to determine
-        square width/height.
+        Point a new camera at the board, zoomed out as far as it goes,
+        and size the squares to match. The odd rows of a topology with
+        offset rows are shifted half a square.
+        """
+        offset_rows = adjacency.get_topology(self.board.topology).offset_rows
+        self.camera = Camera(len(self.board.territory),
+                             len(self.board.territory[0]),
+                             row_shift = 0.5 if offset_rows else 0)
+        self.move_camera()
+
+    def move_camera(self):
+        """
+        After the camera panned or zoomed, take the square size from it
+        and redraw the whole board.
         """
-        self.square_width = cfg.WIDTH / len(self.board.territory[0])
-        self.square_height = cfg.HEIGHT / len(self.board.territory)
+        self.square_width = self.camera.square_width
+        self.square_height = self.camera.square_height
+        if self.tiles is not None:
+            self.tiles.set_size(self.square_width, self.square_height)
+        if min(self.square_width, self.square_height) < cfg.CAMERA_THIN_LINES:
+            self.line_thickness = 1
+        else:
+            self.line_thickness = cfg.LINE_THICKNESS
+        self.full_redraw = True
 
     def game_loop(self):
         """
         Draw the game board and wait for user input.
         Display messages between games.
+        If cfg.EVENT_DRIVEN is set, use event_loop instead.
+        During a game, each frame is timed by self.frames.
         """
+        if cfg.EVENT_DRIVEN:
+            self.event_loop()
+            return
         while not self.done:
             if self.status == 'in game':
-                self.time += 1
-                self.get_game_input()
-                self.draw_board()
-                self.update_status()
-            elif self.status == 'pre game':
-                self.draw_intro()
+                self.frames.start_frame()
+                with self.frames.phase('input'):
+                    self.get_game_input()
+                self.play_frame()
+                self.frames.end_frame()
+            else:
+                self.draw_frame()
                 self.get_intro_input()
-            elif self.status == 'post game':
-                self.draw_postgame()
-                self.get_intro_input()
-            pg.display.flip()
             self.clock.tick(cfg.FRAME_RATE)
         pg.quit()
 
+    def event_loop(self):
+        """
+        Like game_loop, but sleep in pg.event.wait until something happens.
+        A timer event every cfg.CLOCK_INTERVAL milliseconds keeps the clock
+        on the status bar current; the screen is only redrawn after input,
+        or after a clock tick during a game.
+        """
+        self.draw_frame()
+        pg.time.set_timer(CLOCK_EVENT, cfg.CLOCK_INTERVAL)
+        while not self.done:
+            events = [pg.event.wait()] + pg.event.get()
+            self.frames.start_frame()
+            for event in events:
+                if self.status == 'in game':
+                    with self.frames.phase('input'):
+                        self.handle_game_event(event)
+                else:
+                    self.handle_intro_event(event)
+            if self.status == 'in game':
+                self.play_frame()
+                self.frames.end_frame()
+                if self.status != 'in game':
+                    self.draw_frame()
+            elif any(event.type != CLOCK_EVENT for event in events):
+                self.draw_frame()
+        pg.time.set_timer(CLOCK_EVENT, 0)
+        pg.quit()
+
+    def play_frame(self):
+        """
+        Make the solver's move if autoplay is on, draw the frame and check
+        whether the game is over, timing each phase.
+        """
+        with self.frames.phase('simulate'):
+            if self.autoplay:
+                self.auto_move()
+        with self.frames.phase('draw'):
+            self.draw_frame()
+        with self.frames.phase('simulate'):
+            self.update_status()
+
+    def draw_frame(self):
+        """
+        Draw the screen for the current status and push it to the display,
+        opening the display first if need be.
+        """
+        self.open_display()
+        rects = None
+        if self.status == 'in game':
+            self.time = hp.clock_ms() - self.start_time
+            rects = self.draw_board()
+        elif self.status == 'pre game':
+            self.draw_intro()
+        elif self.status == 'post game':
+            self.draw_postgame()
+        if rects is None:
+            pg.display.flip()
+        elif rects:
+            pg.display.update(rects)
+
     def update_status(self):
         """
         After each move, check if the player has won or lost.
@@ -99,9 +226,9 @@ class MinesweeperPygame(object):
         """
         If a player gets a new best time, write it to file.
         """
-        old_best = hp.string_to_frames(self.best_times[self.selection], cfg.FRAME_RATE)
+        old_best = hp.string_to_ms(self.best_times[self.selection])
         if self.time < old_best:
-            new_best = hp.frames_to_string(self.time, cfg.FRAME_RATE)
+            new_best = hp.ms_to_string(self.time)
             self.best_times[self.selection] = new_best
             self.best_message = 'New record time: {}'.format(new_best)
             with open(cfg.BEST_TIMES_FILE, 'wb+') as file_obj:
@@ -113,51 +240,61 @@ class MinesweeperPygame(object):
         Get user input during pre- and post-game.
         """
         for event in pg.event.get():
-            if event.type == pg.QUIT:
-                self.done = True
-            elif event.type == pg.KEYDOWN:
-                if event.key == pg.K_RETURN:
-                    if self.status == 'pre game':
-                        self.status = 'in game'
-                        self.board.reset(self.selection)
-                        self.set_square_size()
-                        self.time = 0
-                        self.best_message = ''
-                    elif self.status == 'post game':
-                        self.status = 'pre game'
-                        self.message = cfg.WELCOME_MESSAGE
+            self.handle_intro_event(event)
+
+    def handle_intro_event(self, event):
+        """
+        Respond to one pre- or post-game event.
+        """
+        if event.type == pg.QUIT:
+            self.done = True
+        elif event.type == pg.KEYDOWN:
+            if event.key == pg.K_RETURN:
                 if self.status == 'pre game':
-                    if event.key == pg.K_DOWN:
-                        self.selection = (self.selection + 1) % len(cfg.LEVELS)
-                    elif event.key == pg.K_UP:
-                        self.selection = (self.selection - 1) % len(cfg.LEVELS)
+                    self.status = 'in game'
+                    self.board.reset(self.selection)
+                    self.set_square_size()
+                    self.time = 0
+                    self.start_time = hp.clock_ms()
+                    self.solver = Solver(self.board)
+                    self.dirty.clear()
+                    self.full_redraw = True
+                    self.best_message = ''
+                elif self.status == 'post game':
+                    self.status = 'pre game'
+                    self.message = cfg.WELCOME_MESSAGE
+            if self.status == 'pre game':
+                if event.key == pg.K_DOWN:
+                    self.selection = (self.selection + 1) % len(cfg.LEVELS)
+                elif event.key == pg.K_UP:
+                    self.selection = (self.selection - 1) % len(cfg.LEVELS)
 
     def draw_intro(self):
         """
         Draw the intro level select screen.
         """
         self.screen.fill(cfg.INTRO_BACKGROUND)
-        text = self.font.render(self.message, True, cfg.TEXT_COLORS[self.status])
+        text = self.tiles.text(self.font, self.message, cfg.TEXT_COLORS[self.status])
         xval = cfg.WIDTH / 2 - text.get_width() / 2
         yval = cfg.HEIGHT / 2 - 4 * text.get_height()
         self.screen.blit(text, [xval, yval])
         easy_message = 'EASY (10 mines) (best time: {})'.format(self.best_times[0])
-        easy = self.font.render(easy_message, True, cfg.SELECTED[self.selection == 0])
+        easy = self.tiles.text(self.font, easy_message, cfg.SELECTED[self.selection == 0])
         xval = cfg.WIDTH / 2 - easy.get_width() / 2
         yval = cfg.HEIGHT / 2 - 2 * easy.get_height()
         self.screen.blit(easy, [xval, yval])
         medium_message = 'MEDIUM (40 mines) (best time: {})'.format(self.best_times[1])
-        medium = self.font.render(medium_message, True, cfg.SELECTED[self.selection == 1])
+        medium = self.tiles.text(self.font, medium_message, cfg.SELECTED[self.selection == 1])
         xval = cfg.WIDTH / 2 - medium.get_width() / 2
         yval = cfg.HEIGHT / 2
         self.screen.blit(medium, [xval, yval])
         hard_message = 'HARD (99 mines) (best time: {})'.format(self.best_times[2])
-        hard = self.font.render(hard_message, True, cfg.SELECTED[self.selection == 2])
+        hard = self.tiles.text(self.font, hard_message, cfg.SELECTED[self.selection == 2])
         xval = cfg.WIDTH / 2 - hard.get_width() / 2
         yval = cfg.HEIGHT / 2 + 2 * hard.get_height()
         self.screen.blit(hard, [xval, yval])
         insane_message = 'INSANE (150 mines) (best time: {})'.format(self.best_times[3])
-        insane = self.font.render(insane_message, True, cfg.SELECTED[self.selection == 3])
+        insane = self.tiles.text(self.font, insane_message, cfg.SELECTED[self.selection == 3])
         xval = cfg.WIDTH / 2 - insane.get_width() / 2
         yval = cfg.HEIGHT / 2 + 4 * insane.get_height()
         self.screen.blit(insane, [xval, yval])
@@ -168,14 +305,14 @@ class MinesweeperPygame(object):
         Display a 'game over' message.
         If player got a new best time, display a message.
         """
-        text = self.font.render(self.message, True, cfg.TEXT_COLORS[self.status])
+        text = self.tiles.text(self.font, self.message, cfg.TEXT_COLORS[self.status])
         xval = cfg.WIDTH / 2 - text.get_rect().width / 2
         yval = cfg.HEIGHT - text.get_rect().height
         pg.draw.rect(self.screen, cfg.POSTGAME_BACKGROUND,
                      [xval, yval, text.get_width(), text.get_height()])
         self.screen.blit(text, [xval, yval])
         if self.best_message:
-            text = self.font.render(self.best_message, True, cfg.TEXT_COLORS[self.status])
+            text = self.tiles.text(self.font, self.best_message, cfg.TEXT_COLORS[self.status])
             xval = cfg.WIDTH / 2 - text.get_rect().width / 2
             yval = cfg.HEIGHT / 2 - text.get_rect().height / 2
             pg.draw.rect(self.screen, cfg.POSTGAME_BACKGROUND,
@@ -187,89 +324,271 @@ class MinesweeperPygame(object):
         Get user input during game.
         """
         for event in pg.event.get():
-            if event.type == pg.QUIT:
-                self.done = True
-            elif event.type == pg.KEYDOWN:
-                if event.key == pg.K_SPACE:
-                    self.click_status = 'flag'
-            elif event.type == pg.KEYUP:
-                if event.key == pg.K_SPACE:
-                    self.click_status = 'safe'
-            elif event.type == pg.MOUSEBUTTONDOWN:
-                mouse_x, mouse_y = pg.mouse.get_pos()
-                self.evaluate_click(mouse_x, mouse_y)
-
-    def evaluate_click(self, mouse_x, mouse_y):
-        """
-        Find out which square was clicked, and perform
-        the appropriate action for that square.
-        """
-        row = int(mouse_y / self.square_height)
-        col = int(mouse_x / self.square_width)
-        if (0 <= row < len(self.board.territory) and
-            0 <= col < len(self.board.territory[0])):
-            if self.click_status == 'safe' and self.board.display[row][col] == cfg.HIDDEN_CHAR:
-                self.board.mark_safe(row, col)
+            self.handle_game_event(event)
+
+    def handle_game_event(self, event):
+        """
+        Respond to one event during a game.
+        """
+        if event.type == pg.QUIT:
+            self.done = True
+        elif event.type == pg.KEYDOWN:
+            if event.key == pg.K_SPACE:
+                self.click_status = 'flag'
+                self.full_redraw = True
+            elif event.key == pg.K_a:
+                self.autoplay = not self.autoplay
+            elif event.key == pg.K_i:
+                self.frames.toggle()
+            elif event.key == pg.K_p:
+                self.profiler.toggle()
+            elif event.key == pg.K_z:
+                with self.frames.phase('simulate'):
+                    self.apply_changes(self.board.undo())
+            elif event.key == pg.K_y:
+                with self.frames.phase('simulate'):
+                    self.apply_changes(self.board.redo())
+            elif event.key in PAN_KEYS:
+                dx, dy = PAN_KEYS[event.key]
+                self.camera.pan(dx * cfg.CAMERA_PAN_STEP,
+                                dy * cfg.CAMERA_PAN_STEP)
+                self.move_camera()
+            elif event.key in ZOOM_KEYS:
+                self.camera.zoom_by(cfg.CAMERA_ZOOM_STEP ** ZOOM_KEYS[event.key])
+                self.move_camera()
+            elif event.key == pg.K_0:
+                self.camera.set_zoom(1)
+                self.move_camera()
+        elif event.type == pg.KEYUP:
+            if event.key == pg.K_SPACE:
+                self.click_status = 'safe'
+                self.full_redraw = True
+        elif event.type == pg.MOUSEBUTTONDOWN:
+            if event.button in WHEEL_BUTTONS:
+                self.camera.zoom_by(
+                    cfg.CAMERA_ZOOM_STEP ** WHEEL_BUTTONS[event.button],
+                    event.pos[0], event.pos[1])
+                self.move_camera()
+            else:
+                self.press = event.button, event.pos
+                self.drag_from = None
+        elif event.type == pg.MOUSEMOTION and self.press is not None:
+            self.drag(event.pos)
+        elif (event.type == pg.MOUSEBUTTONUP and self.press is not None and
+              event.button == self.press[0]):
+            if self.drag_from is None:
+                mouse_x, mouse_y = self.press[1]
+                with self.frames.phase('simulate'):
+                    self.evaluate_click(mouse_x, mouse_y, event.button)
+            self.press = None
+
+    def drag(self, pos):
+        """
+        Pan the camera with the mouse, once it has moved far enough from
+        where the button was pressed to be a drag rather than a click.
+        """
+        if self.drag_from is None:
+            x, y = self.press[1]
+            if (abs(pos[0] - x) + abs(pos[1] - y) <
+                cfg.CAMERA_DRAG_THRESHOLD):
+                return
+            self.drag_from = x, y
+        self.camera.pan(self.drag_from[0] - pos[0], self.drag_from[1] - pos[1])
+        self.drag_from = pos
+        self.move_camera()
+
+    def evaluate_click(self, mouse_x, mouse_y, button = 1):
+        """
+        Find out which square was clicked, through the
+        camera, and perform the appropriate action for that
+        square. A middle click chords: it reveals the covered
+        neighbors of a number whose mines are all flagged.
+        """
+        square = self.camera.square_at(mouse_x, mouse_y)
+        if square is not None:
+            row, col = square
+            changed = []
+            if button == 2:
+                changed = self.board.play('chord', row, col)
+            elif self.click_status == 'safe' and self.board.display[row][col] == cfg.HIDDEN_CHAR:
+                changed = self.board.play('safe', row, col)
             elif self.click_status == 'flag':
                 if self.board.display[row][col] == 'x':
-                    self.board.unmark_mine(row, col)
+                    changed = self.board.play('unflag', row, col)
                 elif self.board.display[row][col] == cfg.HIDDEN_CHAR:
-                    self.board.mark_mine(row, col)
+                    changed = self.board.play('flag', row, col)
+            self.apply_changes(changed)
+
+    def apply_changes(self, changed):
+        """
+        Redraw the (row, col) squares changed by a move, an undo or a redo,
+        and tell the solver about them.
+        """
+        self.dirty.update(changed)
+        self.solver.update(changed)
+
+    def auto_move(self):
+        """
+        Play one move that the solver has proven to be certain, if any.
+        """
+        move = self.solver.next_move()
+        if move is None:
+            return
+        action, row, col = move
+        self.apply_changes(self.board.play(action, row, col))
 
     def draw_board(self):
         """
         Draw the game board.
+        Only the squares in view of the camera are drawn.
+        With cfg.DIRTY_RENDERING, only the squares changed since the last
+        frame and the status bar are repainted, unless something forced
+        a full redraw. Return the list of screen rectangles to update,
+        or None if the whole screen was redrawn.
         """
+        if cfg.DIRTY_RENDERING and not self.full_redraw:
+            return self.draw_changes()
+        self.full_redraw = False
+        self.dirty.clear()
         self.screen.fill(cfg.BG_COLORS[self.click_status])
-        for r, row in enumerate(self.board.display):
-            for c, col in enumerate(row):
-                xval = c * self.square_width + 1
-                yval = r * self.square_height + 1
-                if col not in [cfg.HIDDEN_CHAR]:
-                    color = cfg.COLORS[col]
-                    pg.draw.rect(self.screen, color,
-                                 [xval, yval, self.square_width,
-                                  self.square_height])
-                    if col == 'x':
-                        self.draw_flag(xval, yval)
-                    elif col == cfg.ERROR_CHAR:
-                        self.draw_error(xval, yval)
-                if col in list(range(1, 9)):
-                    text = self.font.render(str(col), True, cfg.TEXT_COLORS[col])
-                    x = xval + 0.5 * self.square_width - text.get_width() / 2
-                    y = yval + 0.5 * self.square_height - text.get_height() / 2
-                    self.screen.blit(text, [x, y])
-                if r == len(self.board.display) - 1:
-                    pg.draw.line(self.screen, cfg.LINE_COLOR, [c * self.square_width, 0],
-                         [c * self.square_width, cfg.HEIGHT], cfg.LINE_THICKNESS)
-            pg.draw.line(self.screen, cfg.LINE_COLOR, [0, r * self.square_height],
-                         [cfg.WIDTH, r * self.square_height], cfg.LINE_THICKNESS)
+        self.screen.set_clip(BOARD_RECT)
+        top, left, bottom, right = self.camera.visible()
+        display = self.board.display
+        for r in range(top, bottom):
+            row = display[r]
+            for c in range(left, right):
+                col = row[c]
+                if col != cfg.HIDDEN_CHAR:
+                    self.draw_square(r, c, col)
+        if self.camera.row_shift:
+            for r in range(top, bottom):
+                for c in range(left, right):
+                    self.draw_outline(*self.camera.position(r, c))
+        else:
+            self.draw_grid(top, left, bottom, right)
+        self.screen.set_clip(None)
+        self.status_text = None
+        self.draw_status()
+        return None
+
+    def draw_changes(self):
+        """
+        Repaint the squares in self.dirty that are in view, with their
+        grid lines, and the status bar if its text changed. Return the
+        changed rectangles.
+        """
+        rects = []
+        margin = self.line_thickness // 2 + 1
+        top, left, bottom, right = self.camera.visible()
+        self.screen.set_clip(BOARD_RECT)
+        for r, c in self.dirty:
+            if not (top <= r < bottom and left <= c < right):
+                continue
+            x, y = self.camera.position(r, c)
+            pg.draw.rect(self.screen, cfg.BG_COLORS[self.click_status],
+                         [x, y, self.square_width + 1, self.square_height + 1])
+            col = self.board.display[r][c]
+            if col != cfg.HIDDEN_CHAR:
+                self.draw_square(r, c, col)
+            self.draw_outline(x, y)
+            rects.append(pg.Rect(x - margin, y - margin,
+                                 self.square_width + 2 * margin,
+                                 self.square_height + 2 * margin
+                                 ).clip(BOARD_RECT))
+        self.screen.set_clip(None)
+        self.dirty.clear()
+        if self.draw_status():
+            rects.append(pg.Rect(0, cfg.HEIGHT, cfg.WIDTH,
+                                 cfg.STATUS_BAR_HEIGHT))
+        return rects
+
+    def draw_grid(self, top, left, bottom, right):
+        """
+        Draw the grid lines around the squares in rows top to bottom - 1
+        and columns left to right - 1, as whole lines across them.
+        """
+        x_start, y_start = self.camera.position(top, left)
+        x_end, y_end = self.camera.position(bottom, right)
+        for c in range(left, right + 1):
+            x = x_start + (c - left) * self.square_width
+            pg.draw.line(self.screen, cfg.LINE_COLOR, [x, y_start],
+                         [x, y_end], self.line_thickness)
+        for r in range(top, bottom + 1):
+            y = y_start + (r - top) * self.square_height
+            pg.draw.line(self.screen, cfg.LINE_COLOR, [x_start, y],
+                         [x_end, y], self.line_thickness)
+
+    def draw_outline(self, x, y):
+        """
+        Draw the grid lines around the square whose top left corner is
+        at (x, y).
+        """
+        right_x = x + self.square_width
+        bottom_y = y + self.square_height
+        pg.draw.line(self.screen, cfg.LINE_COLOR, [x, y], [right_x, y],
+                     self.line_thickness)
+        pg.draw.line(self.screen, cfg.LINE_COLOR, [x, y], [x, bottom_y],
+                     self.line_thickness)
+        pg.draw.line(self.screen, cfg.LINE_COLOR, [x, bottom_y],
+                     [right_x, bottom_y], self.line_thickness)
+        pg.draw.line(self.screen, cfg.LINE_COLOR, [right_x, y],
+                     [right_x, bottom_y], self.line_thickness)
+
+    def draw_square(self, r, c, col):
+        """
+        Draw the uncovered or flagged square at row r, column c,
+        whose display value is col.
+        """
+        xval, yval = self.camera.position(r, c)
+        self.screen.blit(self.tiles.tile(col), [xval + 1, yval + 1])
+
+    def draw_status(self):
+        """
+        Draw the status bar if the mine count, time, board notice or
+        instrumentation summary shown on it changed. Return True if it
+        was drawn.
+        """
+        time = hp.ms_to_string(self.time, 0)
+        overlay = self.board.notice or ''
+        if self.frames.enabled:
+            overlay = self.frames.summary
+        if self.profiler.profile is not None:
+            overlay = ('PROFILING ' + overlay).strip()
+        status_text = (self.board.mines_left, time, overlay)
+        if status_text == self.status_text:
+            return False
+        self.status_text = status_text
         pg.draw.rect(self.screen, cfg.STATUS_BAR_COLOR,
                      [0, cfg.HEIGHT, cfg.WIDTH, cfg.STATUS_BAR_HEIGHT])
         status_message = 'MINES LEFT: ' + str(self.board.mines_left)
         mines_text = self.status_font.render(status_message,
                                       True, cfg.TEXT_COLORS['status'])
         self.screen.blit(mines_text, [0, cfg.HEIGHT])
-        time = hp.frames_to_string(self.time, cfg.FRAME_RATE)
         time_text = self.status_font.render(time, True, cfg.TEXT_COLORS['status'])
         self.screen.blit(time_text, [cfg.WIDTH - time_text.get_width(), cfg.HEIGHT])
+        if overlay:
+            overlay_text = self.status_font.render(overlay, True,
+                                                   cfg.TEXT_COLORS['status'])
+            self.screen.blit(overlay_text,
+                             [cfg.WIDTH / 2 - overlay_text.get_width() / 2,
+                              cfg.HEIGHT])
+        return True
 
-    def draw_flag(self, x, y):
-        """
-        Draw a flag image in the square at position (x, y).
-        """
-        xval = x + self.square_width / 4
-        yval = y + self.square_height / 4
-        pg.draw.rect(self.screen, cfg.RED, [xval, yval, self.square_width / 2, self.square_height / 2])
-        xval = x + self.square_width / 3
-        yval = y + self.square_height / 3
-        pg.draw.rect(self.screen, cfg.BLACK, [xval, yval, self.square_width / 3, self.square_height / 3])
+def main(argv = None):
+    """
+    Start a pygame version of minesweeper and enter the GUI event loop.
+    """
+    parser = argparse.ArgumentParser(description = __doc__.strip())
+    parser.add_argument('--map', default = '1',
+                        help = 'number of the map to start with')
+    parser.add_argument('--engine', choices = sorted(maps.ENGINES) + ['auto'],
+                        default = cfg.ENGINE)
+    parser.add_argument('--topology', default = cfg.TOPOLOGY,
+                        help = "which squares are neighbors, such as 'hex'")
+    args = parser.parse_args(argv)
+    game = MinesweeperPygame(maps.load_map(args.map, engine = args.engine,
+                                           topology = args.topology))
+    game.game_loop()
 
-    def draw_error(self, x, y):
-        """
-        Draw a big 'X' in a square if player mistakenly marked it safe.
-        """
-        pg.draw.line(self.screen, cfg.RED, [x + self.square_width / 4, y + self.square_height / 4],
-                     [x + 3 * self.square_width / 4, y + 3 * self.square_height / 4], 10)
-        pg.draw.line(self.screen, cfg.RED, [x + self.square_width / 4, y + 3 * self.square_height / 4],
-                     [x + 3 * self.square_width / 4, y + self.square_height / 4], 10)
+if __name__ == '__main__':
+    main()
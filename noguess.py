@@ -0,0 +1,296 @@
+"""
+No-guess boards: boards that the Solver clears from their start square
+by logic alone. Candidates are sampled and checked on a process pool,
+and finished boards are kept in an on-disk pool per board size, so
+Board.reset can take one at once when cfg.NO_GUESS is set.
+
+    python noguess.py fill --level 2 --count 50
+    python noguess.py status
+"""
+
+from __future__ import division, print_function
+import argparse
+import multiprocessing
+import os
+import random
+import struct
+import subprocess
+import sys
+import config as cfg
+import generator
+from arrayboard import ArrayBoard
+from mapfile import pack_layout, unpack_layout
+from solver import Solver
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# The start square of a pooled board: row, col.
+START = struct.Struct('<II')
+# {pool path: the fill process started by BoardPool.refill}
+_fills = {}
+
+def start_square(width, height):
+    """
+    Return the (row, col) every no-guess board of this size starts from.
+    """
+    return height // 2, width // 2
+
+def is_solvable(layout, width, height, start, topology = cfg.TOPOLOGY):
+    """
+    Return True if the Solver clears the board, played with the named
+    topology, from the start square without ever having to guess.
+    """
+    board = ArrayBoard(topology = topology)
+    board.load_layout(layout, width, height)
+    board.dead = False
+    board.mark_safe(*start)
+    solver = Solver(board)
+    display = board.display
+    won = board.check_win()
+    while not won:
+        moves = [(action, r, c) for action, r, c in solver.moves()
+                 if display[r][c] == cfg.HIDDEN_CHAR]
+        if not moves:
+            return False
+        applied, changed, dead, won = board.apply_moves(moves)
+        if dead:
+            return False
+        solver.update([divmod(i, width) for i in changed])
+    return True
+
+def generate(width, height, mines, rng = None, seed = None,
+             attempts = cfg.NOGUESS_MAX_ATTEMPTS, topology = cfg.TOPOLOGY):
+    """
+    Return (layout, start) for a random no-guess board with the named
+    topology, sampling up to attempts candidates. Raise ValueError if
+    none of them is solvable.
+    """
+    if rng is None:
+        rng = random.Random(seed)
+    start = start_square(width, height)
+    for attempt in range(attempts):
+        layout = generator.random_layout(width, height, mines, rng,
+                                         safe = start, topology = topology)
+        if is_solvable(layout, width, height, start, topology):
+            return layout, start
+    raise ValueError('no solvable board in {} attempts'.format(attempts))
+
+def generate_job(job):
+    """
+    Generate one board in a worker process. job is a tuple of (width,
+    height, mines, seed, topology). Return the pooled record of the board.
+    """
+    width, height, mines, seed, topology = job
+    layout, start = generate(width, height, mines, seed = seed,
+                             topology = topology)
+    return START.pack(*start) + bytes(pack_layout(layout))
+
+class BoardPool(object):
+    """
+    A file of ready no-guess boards of one size and topology. Each record
+    holds the start square (see START) and the packed layout, so all
+    records have the same size: boards are added at the end and taken
+    from the end.
+    The file is locked while it is changed, where fcntl is available.
+    """
+    def __init__(self, width, height, mines, directory = cfg.NOGUESS_POOL_DIR,
+                 topology = cfg.TOPOLOGY):
+        self.width = width
+        self.height = height
+        self.mines = mines
+        self.directory = directory
+        self.topology = topology
+        suffix = '' if topology == 'square' else '-' + topology
+        self.path = os.path.join(directory, '{}x{}-{}{}.pool'.format(
+            width, height, mines, suffix))
+        self.record_size = START.size + (width * height + 7) // 8
+
+    def __len__(self):
+        try:
+            return os.path.getsize(self.path) // self.record_size
+        except OSError:
+            return 0
+
+    def make_directory(self):
+        """
+        Create the pool directory if it does not exist.
+        """
+        if not os.path.isdir(self.directory):
+            try:
+                os.makedirs(self.directory)
+            except OSError:
+                if not os.path.isdir(self.directory):
+                    raise
+
+    def open(self):
+        """
+        Open the pool file for reading and writing, creating it if need be,
+        and lock it.
+        """
+        self.make_directory()
+        file_obj = open(self.path, 'ab+')
+        if fcntl is not None:
+            fcntl.flock(file_obj.fileno(), fcntl.LOCK_EX)
+        return file_obj
+
+    def push(self, records):
+        """
+        Add records made by generate_job to the pool.
+        """
+        with self.open() as file_obj:
+            file_obj.seek(0, os.SEEK_END)
+            file_obj.seek(file_obj.tell() - file_obj.tell() % self.record_size)
+            file_obj.truncate()
+            file_obj.write(b''.join(records))
+
+    def pop(self):
+        """
+        Take a board from the pool and return (layout, start), or None if
+        the pool is empty.
+        """
+        with self.open() as file_obj:
+            file_obj.seek(0, os.SEEK_END)
+            count = file_obj.tell() // self.record_size
+            if not count:
+                return None
+            file_obj.seek((count - 1) * self.record_size)
+            record = file_obj.read(self.record_size)
+            file_obj.truncate((count - 1) * self.record_size)
+        start = START.unpack_from(record, 0)
+        layout = unpack_layout(record[START.size:], self.width * self.height)
+        return layout, start
+
+    def fill(self, count, workers = cfg.NOGUESS_WORKERS, seed = None):
+        """
+        Generate count boards on a pool of worker processes, adding each
+        one to the pool as soon as it is ready.
+        """
+        if seed is None:
+            seed = random.SystemRandom().getrandbits(32)
+        jobs = [(self.width, self.height, self.mines, seed * 2 ** 32 + i,
+                 self.topology) for i in range(count)]
+        pool = multiprocessing.Pool(workers)
+        try:
+            for record in pool.imap_unordered(generate_job, jobs):
+                self.push([record])
+        finally:
+            pool.close()
+            pool.join()
+
+    def filling(self):
+        """
+        Return True if a fill of this pool is running: one started by
+        refill in this process that has not exited, or, where fcntl is
+        available, any fill holding the pool's fill lock.
+        """
+        process = _fills.get(self.path)
+        if process is not None:
+            if process.poll() is None:
+                return True
+            del _fills[self.path]
+        if fcntl is None:
+            return False
+        self.make_directory()
+        with open(self.path + '.fill', 'a') as lock:
+            try:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except IOError:
+                return True
+        return False
+
+    def refill(self):
+        """
+        If the pool holds fewer than cfg.NOGUESS_POOL_LOW boards, fill it
+        back up to cfg.NOGUESS_POOL_SIZE in a background process, unless
+        one is already doing so.
+        """
+        missing = cfg.NOGUESS_POOL_SIZE - len(self)
+        if (len(self) >= cfg.NOGUESS_POOL_LOW or missing <= 0 or
+            self.filling()):
+            return
+        script = os.path.abspath(__file__)
+        if script.endswith(('.pyc', '.pyo')):
+            script = script[:-1]
+        with open(os.devnull, 'r+') as devnull:
+            _fills[self.path] = subprocess.Popen(
+                [sys.executable, script, 'fill', '--width', str(self.width),
+                 '--height', str(self.height), '--mines', str(self.mines),
+                 '--count', str(missing), '--topology', self.topology,
+                 '--once'],
+                cwd = os.getcwd(), stdin = devnull, stdout = devnull,
+                stderr = devnull)
+
+def take_board(width, height, mines, topology = cfg.TOPOLOGY,
+               attempts = cfg.NOGUESS_FALLBACK_ATTEMPTS):
+    """
+    Return (layout, start) for a no-guess board with the named topology,
+    from the pool if it has one, and start refilling the pool if it is
+    running low. If the pool is empty, sample up to attempts candidates
+    now, and raise ValueError if none of them is solvable.
+    """
+    pool = BoardPool(width, height, mines, topology = topology)
+    board = pool.pop()
+    pool.refill()
+    if board is None:
+        board = generate(width, height, mines, attempts = attempts,
+                         topology = topology)
+    return board
+
+def main(argv = None):
+    """
+    Fill the pools, or show how full they are, from the command line.
+    """
+    parser = argparse.ArgumentParser(description = __doc__.split('\n\n')[0])
+    commands = parser.add_subparsers(dest = 'command')
+    fill_parser = commands.add_parser('fill', help = 'generate boards')
+    fill_parser.add_argument('--level', type = int, choices = sorted(cfg.LEVELS),
+                             help = 'fill the pool of this level')
+    fill_parser.add_argument('--width', type = int)
+    fill_parser.add_argument('--height', type = int)
+    fill_parser.add_argument('--mines', type = int)
+    fill_parser.add_argument('--count', type = int,
+                             default = cfg.NOGUESS_POOL_SIZE)
+    fill_parser.add_argument('--workers', type = int,
+                             default = cfg.NOGUESS_WORKERS)
+    fill_parser.add_argument('--seed', type = int)
+    fill_parser.add_argument('--topology', default = cfg.TOPOLOGY)
+    fill_parser.add_argument('--once', action = 'store_true',
+                             help = 'do nothing if another fill of the '
+                                    'same pool is running')
+    status_parser = commands.add_parser('status',
+                                        help = 'show the size of each pool')
+    status_parser.add_argument('--topology', default = cfg.TOPOLOGY)
+    args = parser.parse_args(argv)
+    if args.command == 'fill':
+        if args.level is not None:
+            width, mines = cfg.LEVELS[args.level]
+            height = width
+        elif None in (args.width, args.height, args.mines):
+            fill_parser.error('give --level, or --width, --height and '
+                              '--mines')
+        else:
+            width, height, mines = args.width, args.height, args.mines
+        pool = BoardPool(width, height, mines, topology = args.topology)
+        if args.once and fcntl is not None:
+            pool.make_directory()
+            lock = open(pool.path + '.fill', 'a')
+            try:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except IOError:
+                return
+        pool.fill(args.count, args.workers, args.seed)
+        print('{}: {} boards'.format(pool.path, len(pool)))
+    elif args.command == 'status':
+        for level in sorted(cfg.LEVELS):
+            width, mines = cfg.LEVELS[level]
+            pool = BoardPool(width, width, mines, topology = args.topology)
+            print('level {} ({}x{}, {} mines): {} boards'.format(
+                level, width, width, mines, len(pool)))
+    else:
+        parser.print_help()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,334 @@
+"""
+Mine probabilities for the covered squares of a minesweeper Board.
+"""
+
+from __future__ import division
+from fractions import Fraction
+import time
+import config as cfg
+
+# Use a monotonic clock where Python provides one.
+_clock = getattr(time, 'monotonic', time.time)
+
+class OutOfTime(Exception):
+    """
+    Raised when enumerating a component runs past the time or step
+    budget, or the component is too large to enumerate.
+    """
+    pass
+
+def combinations(n, k):
+    """
+    Return the number of ways to choose k items from n.
+    """
+    if not 0 <= k <= n:
+        return 0
+    k = min(k, n - k)
+    result = 1
+    for i in range(k):
+        result = result * (n - i) // (i + 1)
+    return result
+
+def ratio(numerator, denominator):
+    """
+    Return numerator / denominator as a float, even when both are
+    integers too large to convert to floats.
+    """
+    return float(Fraction(numerator, denominator))
+
+def convolve(first, second):
+    """
+    Combine two {mines: ways} distributions of independent components
+    into the distribution of their total.
+    """
+    result = {}
+    for k1, ways1 in first.items():
+        for k2, ways2 in second.items():
+            result[k1 + k2] = result.get(k1 + k2, 0) + ways1 * ways2
+    return result
+
+class ProbabilityEngine(object):
+    """
+    This class computes, for every covered square, the probability that it
+    holds a mine, given the revealed numbers, the flags and the number of
+    mines left. The frontier (covered squares next to a revealed number)
+    is split into independent components. Each component's solutions are
+    counted by backtracking; the counts are memoized by the component's
+    shape, so a pattern that appears again is not enumerated twice.
+    The components and the interior squares, which no number touches,
+    are combined with binomial weights over the mines left.
+    If enumeration does not finish within the time budget (or the step
+    budget, if one is set), the remaining components get an estimate
+    from their constraints' mine densities, and exact is set to False.
+    """
+    def __init__(self, board, budget = cfg.PROBABILITY_BUDGET, steps = None):
+        """
+        Prepare to compute probabilities for board, spending at most
+        budget milliseconds (no limit if None) on each call to compute,
+        and, if steps is given, at most about that many search steps.
+        Unlike the time budget, a step budget gives the same results for
+        the same board on any machine.
+        """
+        self.board = board
+        self.budget = budget
+        self.steps = steps
+        self.steps_left = None
+        self.memo = {}
+        self.frontier = {}
+        self.interior = 0
+        self.interior_cells = 0
+        self.exact = True
+
+    def constraints(self):
+        """
+        Return a list of (cells, mines) constraints, one for each revealed
+        number with covered neighbors, where cells is a tuple of (row, col)
+        pairs and mines is how many of them hold mines.
+        """
+        display = self.board.display
+        constraints = []
+        for r, row in enumerate(display):
+            for c, col in enumerate(row):
+                if not isinstance(col, int) or col == 0:
+                    continue
+                cells = []
+                mines = col
+                for nr, nc in self.board.neighbors(r, c):
+                    value = display[nr][nc]
+                    if value == cfg.HIDDEN_CHAR:
+                        cells.append((nr, nc))
+                    elif value == cfg.MINE_CHAR or value == cfg.ERROR_CHAR:
+                        mines -= 1
+                if cells:
+                    constraints.append((tuple(sorted(cells)), mines))
+        return constraints
+
+    def components(self, constraints):
+        """
+        Split constraints into groups that share no covered squares.
+        """
+        parent = {}
+        def find(cell):
+            while parent[cell] != cell:
+                parent[cell] = parent[parent[cell]]
+                cell = parent[cell]
+            return cell
+        for cells, mines in constraints:
+            for cell in cells:
+                parent.setdefault(cell, cell)
+            root = find(cells[0])
+            for cell in cells[1:]:
+                other = find(cell)
+                if other != root:
+                    parent[other] = root
+        groups = {}
+        for constraint in constraints:
+            groups.setdefault(find(constraint[0][0]), []).append(constraint)
+        return list(groups.values())
+
+    def compute(self):
+        """
+        Compute the probabilities, storing them in self.frontier as
+        {(row, col): probability}, and the probability shared by every
+        interior square in self.interior. Return self.frontier.
+        """
+        deadline = None
+        if self.budget is not None:
+            deadline = _clock() + self.budget / 1000
+        self.steps_left = self.steps
+        self.exact = True
+        groups = self.components(self.constraints())
+        solved = []
+        for group in groups:
+            try:
+                solved.append(self.solve(group, deadline))
+            except OutOfTime:
+                self.exact = False
+                solved.append(self.estimate(group))
+        frontier_cells = sum(len(cells) for cells, counts in solved)
+        covered = (self.board.covered_safe + self.board.covered_mines)
+        interior = covered - frontier_cells
+        mines_left = self.board.mines_left
+        self.interior_cells = interior
+        self.frontier = {}
+        self.interior = 0
+        if not self.exact:
+            self.combine_estimates(solved, interior, mines_left)
+            return self.frontier
+        # The distribution of mines in all components except the i-th,
+        # built from prefix and suffix convolutions.
+        prefixes = [{0: 1}]
+        for cells, counts in solved:
+            prefixes.append(convolve(prefixes[-1],
+                                     dict((k, ways) for k, (ways, cell_counts)
+                                          in counts.items())))
+        suffixes = [{0: 1}]
+        for cells, counts in reversed(solved):
+            suffixes.append(convolve(suffixes[-1],
+                                     dict((k, ways) for k, (ways, cell_counts)
+                                          in counts.items())))
+        suffixes.reverse()
+        total = 0
+        interior_mines = 0
+        for k, ways in prefixes[-1].items():
+            weight = ways * combinations(interior, mines_left - k)
+            total += weight
+            interior_mines += weight * (mines_left - k)
+        if not total:
+            self.exact = False
+            self.combine_estimates(solved, interior, mines_left)
+            return self.frontier
+        if interior:
+            self.interior = ratio(interior_mines, interior * total)
+        for i, (cells, counts) in enumerate(solved):
+            others = convolve(prefixes[i], suffixes[i + 1])
+            mine_weights = [0] * len(cells)
+            for k, (ways, cell_counts) in counts.items():
+                weight = sum(other_ways *
+                             combinations(interior, mines_left - k - other_k)
+                             for other_k, other_ways in others.items())
+                if weight:
+                    for j, count in enumerate(cell_counts):
+                        mine_weights[j] += count * weight
+            for cell, weight in zip(cells, mine_weights):
+                self.frontier[cell] = ratio(weight, total)
+        return self.frontier
+
+    def solve(self, group, deadline):
+        """
+        Count the solutions of a component. Return (cells, counts), where
+        counts maps each possible number of mines k to (solutions with k
+        mines, list of how many of those put a mine in each cell).
+        """
+        top = min(r for cells, mines in group for r, c in cells)
+        left = min(c for cells, mines in group for r, c in cells)
+        shape = tuple(sorted((tuple((r - top, c - left) for r, c in cells),
+                              mines) for cells, mines in group))
+        if shape not in self.memo:
+            if len(self.memo) >= cfg.PROBABILITY_MEMO_SIZE:
+                self.memo = {}
+            self.memo[shape] = self.enumerate(shape, deadline)
+        relative, counts = self.memo[shape]
+        return [(r + top, c + left) for r, c in relative], counts
+
+    def enumerate(self, shape, deadline):
+        """
+        Count the solutions of a component given in relative coordinates
+        by backtracking over its cells.
+        """
+        cells = sorted(set(cell for members, mines in shape for cell in members))
+        if len(cells) > cfg.PROBABILITY_MAX_CELLS:
+            raise OutOfTime()
+        index = dict((cell, i) for i, cell in enumerate(cells))
+        limits = [mines for members, mines in shape]
+        unassigned = [len(members) for members, mines in shape]
+        assigned = [0] * len(shape)
+        touching = [[] for cell in cells]
+        for j, (members, mines) in enumerate(shape):
+            for cell in members:
+                touching[index[cell]].append(j)
+        values = [0] * len(cells)
+        counts = {}
+        steps = [0]
+
+        def search(i, mines):
+            steps[0] += 1
+            if steps[0] & 1023 == 0:
+                self.spend(1024, deadline)
+            if i == len(cells):
+                ways, cell_counts = counts.get(mines, (0, [0] * len(cells)))
+                for j, value in enumerate(values):
+                    cell_counts[j] += value
+                counts[mines] = (ways + 1, cell_counts)
+                return
+            for value in (0, 1):
+                ok = True
+                for j in touching[i]:
+                    unassigned[j] -= 1
+                    assigned[j] += value
+                    if (assigned[j] > limits[j] or
+                        assigned[j] + unassigned[j] < limits[j]):
+                        ok = False
+                if ok:
+                    values[i] = value
+                    search(i + 1, mines + value)
+                for j in touching[i]:
+                    unassigned[j] += 1
+                    assigned[j] -= value
+            values[i] = 0
+
+        search(0, 0)
+        return cells, counts
+
+    def spend(self, steps, deadline):
+        """
+        Count steps more search steps against the step budget, and raise
+        OutOfTime if it or the time budget, which ends at deadline, has
+        run out.
+        """
+        if deadline is not None and _clock() > deadline:
+            raise OutOfTime()
+        if self.steps_left is not None:
+            self.steps_left -= steps
+            if self.steps_left < 0:
+                raise OutOfTime()
+
+    def estimate(self, group):
+        """
+        Approximate a component without enumerating it: give each cell the
+        average mine density of the constraints that touch it. Return
+        (cells, densities).
+        """
+        densities = {}
+        for cells, mines in group:
+            for cell in cells:
+                densities.setdefault(cell, []).append(mines / len(cells))
+        cells = sorted(densities)
+        return cells, [sum(densities[cell]) / len(densities[cell])
+                       for cell in cells]
+
+    def combine_estimates(self, solved, interior, mines_left):
+        """
+        Fill in self.frontier and self.interior from a mix of exact and
+        estimated components, spreading the mines not expected on the
+        frontier evenly over the interior.
+        """
+        expected = 0
+        for cells, counts in solved:
+            if isinstance(counts, dict):
+                ways = sum(ways for ways, cell_counts in counts.values())
+                probabilities = [0] * len(cells)
+                for k, (count, cell_counts) in counts.items():
+                    for j, value in enumerate(cell_counts):
+                        probabilities[j] += ratio(value, ways)
+            else:
+                probabilities = counts
+            for cell, probability in zip(cells, probabilities):
+                self.frontier[cell] = probability
+                expected += probability
+        if interior:
+            self.interior = min(1, max(0, (mines_left - expected) / interior))
+
+    def probability(self, r, c):
+        """
+        Return the probability, from the last call to compute, that the
+        covered square at row r, column c holds a mine.
+        """
+        return self.frontier.get((r, c), self.interior)
+
+    def best_guess(self):
+        """
+        Compute the probabilities and return the (row, col) of a covered
+        square least likely to hold a mine.
+        """
+        self.compute()
+        best = None
+        if self.frontier:
+            best = min(self.frontier, key = self.frontier.get)
+        if self.interior_cells and (best is None or
+                                    self.interior < self.frontier[best]):
+            for r, row in enumerate(self.board.display):
+                for c, col in enumerate(row):
+                    if col == cfg.HIDDEN_CHAR and (r, c) not in self.frontier:
+                        return r, c
+        return best
@@ -0,0 +1,478 @@
+"""
+Host many minesweeper games in one process, over TCP or a Unix socket.
+Requires Python 3.7 or later.
+
+    python server.py --port 8765
+    python server.py --unix /tmp/minesweeper.sock
+
+Clients send one JSON object per line and get one JSON object per line
+back, in order. Every request has a "cmd"; an "id", if given, is echoed
+in the response. Responses have "ok": true, or "ok": false and an
+"error" message.
+
+    {"cmd": "new", "level": 2}
+    {"cmd": "new", "width": 30, "height": 16, "mines": 99,
+     "seed": 7, "safe": [0, 0], "engine": "array"}
+        -> {"ok": true, "session": "...", "width": 30, "height": 16,
+            "mines": 99}
+    {"cmd": "reveal", "session": "...", "row": 0, "col": 0}
+    {"cmd": "flag", "session": "...", "row": 3, "col": 4}
+    {"cmd": "unflag", "session": "...", "row": 3, "col": 4}
+    {"cmd": "chord", "session": "...", "row": 2, "col": 4}
+        -> {"ok": true, "changed": [[row, col, "1"], ...],
+            "dead": false, "won": false, "mines_left": 99}
+    {"cmd": "state", "session": "...", "top": 0, "left": 0,
+     "height": 16, "width": 30}
+        -> {"ok": true, "rows": ["  1x", ...], "dead": false,
+            "won": false, "mines_left": 98}
+    {"cmd": "close", "session": "..."}
+    {"cmd": "stats"}
+    {"cmd": "new", "engine": "endless", "seed": 7}
+        -> {"ok": true, "session": "...", "endless": true}
+
+Squares are sent as one character: ' ' covered, 'x' flagged, '!' an
+exploded mine, or the digit of a revealed number. "top", "left",
+"height" and "width" in a state request are optional and default to the
+whole board.
+
+An endless board (see endless.EndlessBoard) has no edges: its rows and
+columns may be any integers, negative ones too, a state request must
+give its "height" and "width", and responses carry "flags" instead of
+"mines_left". Chord is not supported on it. A reveal there stops after
+cfg.ENDLESS_REVEAL_LIMIT squares with "unfinished": true; another reveal,
+of any square, carries it on.
+"""
+
+import argparse
+import asyncio
+import json
+import time
+import uuid
+import config as cfg
+from endless import EndlessBoard
+import maps
+
+class ProtocolError(Exception):
+    """
+    Raised for a request the server cannot carry out; its message is
+    sent back to the client.
+    """
+    pass
+
+class Session(object):
+    """
+    One game hosted by the server. The lock makes the session's commands
+    run one at a time, even when a reveal yields in the middle. An
+    endless game has no width or height.
+    """
+    def __init__(self, board, width, height):
+        self.board = board
+        self.width = width
+        self.height = height
+        self.lock = asyncio.Lock()
+        self.last_used = time.monotonic()
+
+class GameServer(object):
+    """
+    This class keeps the sessions and answers requests. A flood fill is
+    carried out batch squares at a time, yielding to the event loop
+    between batches, and new boards are dealt on a worker thread, so one
+    huge game cannot stall the other clients; a big state request is
+    likewise built batch squares at a time. Sessions idle for longer
+    than idle_timeout seconds are closed.
+    """
+    def __init__(self, idle_timeout = cfg.SERVER_IDLE_TIMEOUT,
+                 batch = cfg.SERVER_REVEAL_BATCH,
+                 max_sessions = cfg.SERVER_MAX_SESSIONS):
+        self.idle_timeout = idle_timeout
+        self.batch = batch
+        self.max_sessions = max_sessions
+        self.sessions = {}
+        # Number of new games whose boards are still being dealt.
+        self.dealing = 0
+        self.requests = 0
+        self.commands = {'new': self.new_game, 'reveal': self.reveal,
+                         'flag': self.flag, 'unflag': self.unflag,
+                         'chord': self.chord,
+                         'state': self.state, 'close': self.close,
+                         'stats': self.stats}
+
+    async def handle_client(self, reader, writer):
+        """
+        Answer the requests of one connection until it closes.
+        """
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except (asyncio.LimitOverrunError, ValueError):
+                    writer.write(self.encode({'ok': False,
+                                              'error': 'request too long'}))
+                    break
+                if not line:
+                    break
+                writer.write(self.encode(await self.answer(line)))
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    def encode(self, response):
+        """
+        Return a response as one line of JSON. A "changed" entry holds
+        the pieces of its list already encoded by encode_squares.
+        """
+        pieces = response.pop('changed', None)
+        text = json.dumps(response, separators = (',', ':'))
+        if pieces is not None:
+            text = (text[:-1] + ',"changed":[' +
+                    ','.join(piece for piece in pieces if piece) + ']}')
+        return (text + '\n').encode('utf-8')
+
+    def encode_squares(self, board, squares):
+        """
+        Encode the (row, col) squares of board as the items of a JSON
+        list of [row, col, value] triples, without the brackets.
+        """
+        display = board.display
+        return json.dumps([[r, c, str(display[r][c])] for r, c in squares],
+                          separators = (',', ':'))[1:-1]
+
+    async def answer(self, line):
+        """
+        Carry out one request line and return the response.
+        """
+        self.requests += 1
+        request_id = None
+        try:
+            request = json.loads(line.decode('utf-8'))
+            if not isinstance(request, dict):
+                raise ProtocolError('request must be a JSON object')
+            request_id = request.get('id')
+            name = request.get('cmd')
+            command = self.commands.get(name) if isinstance(name, str) else None
+            if command is None:
+                raise ProtocolError('unknown command')
+            response = await command(request)
+            response['ok'] = True
+        except ProtocolError as error:
+            response = {'ok': False, 'error': str(error)}
+        except ValueError:
+            response = {'ok': False, 'error': 'malformed request'}
+        if request_id is not None:
+            response['id'] = request_id
+        return response
+
+    def integer(self, value, name, low, high):
+        """
+        Return value, checking that it is an integer in [low, high).
+        """
+        if (isinstance(value, bool) or not isinstance(value, int) or
+            not low <= value < high):
+            raise ProtocolError('{} must be an integer from {} to {}'.format(
+                name, low, high - 1))
+        return value
+
+    def session(self, request):
+        """
+        Return the session named in a request.
+        """
+        name = request.get('session')
+        session = self.sessions.get(name) if isinstance(name, str) else None
+        if session is None:
+            raise ProtocolError('no such session')
+        session.last_used = time.monotonic()
+        return session
+
+    def square(self, request, session):
+        """
+        Return the (row, col) of the square named in a request.
+        """
+        if session.width is None:
+            reach = cfg.SERVER_ENDLESS_REACH
+            return (self.integer(request.get('row'), 'row', -reach, reach),
+                    self.integer(request.get('col'), 'col', -reach, reach))
+        return (self.integer(request.get('row'), 'row', 0, session.height),
+                self.integer(request.get('col'), 'col', 0, session.width))
+
+    def status(self, session):
+        """
+        Return the state of a session's game, as sent with every move.
+        """
+        board = session.board
+        status = {'dead': board.dead, 'won': board.check_win()}
+        if session.width is None:
+            status['flags'] = board.flags
+            status['unfinished'] = bool(board.unfinished)
+        else:
+            status['mines_left'] = board.mines_left
+        return status
+
+    def result(self, session, pieces):
+        """
+        Return the response to a move, given the squares it changed as
+        pieces encoded by encode_squares.
+        """
+        response = self.status(session)
+        response['changed'] = pieces
+        return response
+
+    def check_playing(self, session):
+        """
+        Refuse moves on a finished game.
+        """
+        if session.board.dead or session.board.check_win():
+            raise ProtocolError('game over')
+
+    async def new_game(self, request):
+        """
+        Start a game on a random board, given by level or by size. The
+        board is dealt on the event loop's default executor, as a big one
+        takes a while.
+        """
+        if len(self.sessions) + self.dealing >= self.max_sessions:
+            raise ProtocolError('too many sessions')
+        if request.get('engine') == 'endless':
+            return self.new_endless(request)
+        if 'level' in request:
+            level = self.integer(request['level'], 'level', 0, len(cfg.LEVELS))
+            width, mines = cfg.LEVELS[level]
+            height = width
+        else:
+            width = self.integer(request.get('width'), 'width', 1,
+                                 cfg.SERVER_MAX_SQUARES + 1)
+            height = self.integer(request.get('height'), 'height', 1,
+                                  cfg.SERVER_MAX_SQUARES // width + 1)
+            mines = self.integer(request.get('mines'), 'mines', 0,
+                                 width * height + 1)
+        engine = request.get('engine', 'auto')
+        if engine == 'auto':
+            engine = maps.choose_engine(width * height, mines)
+        elif not isinstance(engine, str) or engine not in maps.ENGINES:
+            raise ProtocolError('no such engine')
+        seed = request.get('seed')
+        if seed is not None:
+            seed = self.integer(seed, 'seed', 0, 2 ** 63)
+        safe = request.get('safe')
+        if safe is not None:
+            if not isinstance(safe, list) or len(safe) != 2:
+                raise ProtocolError('safe must be a [row, col] pair')
+            safe = (self.integer(safe[0], 'row', 0, height),
+                    self.integer(safe[1], 'col', 0, width))
+        self.dealing += 1
+        try:
+            board = await asyncio.get_event_loop().run_in_executor(
+                None, self.deal, engine, width, height, mines, seed, safe)
+        except ValueError as error:
+            raise ProtocolError(str(error))
+        finally:
+            self.dealing -= 1
+        name = uuid.uuid4().hex
+        self.sessions[name] = Session(board, width, height)
+        return {'session': name, 'width': width, 'height': height,
+                'mines': mines}
+
+    def new_endless(self, request):
+        """
+        Start a game on an endless board, whose chunks are only generated
+        as they are explored, so it is made on the event loop.
+        """
+        seed = self.integer(request.get('seed', 0), 'seed', 0, 2 ** 63)
+        name = uuid.uuid4().hex
+        self.sessions[name] = Session(EndlessBoard(seed), None, None)
+        return {'session': name, 'endless': True}
+
+    def deal(self, engine, width, height, mines, seed, safe):
+        """
+        Return a new board of the named engine with a random layout.
+        """
+        board = maps.make_board(engine = engine)
+        board.randomize(width, height, mines, seed = seed, safe = safe)
+        return board
+
+    async def finish_reveal(self, board, changed, limit = None):
+        """
+        Carry on the board's unfinished reveal batch squares at a time,
+        yielding between batches, until it is done or, if limit is given,
+        that many squares have changed. Return the squares changed,
+        starting with changed, as pieces encoded by encode_squares.
+        """
+        pieces = [self.encode_squares(board, changed)]
+        count = len(changed)
+        while board.unfinished and (limit is None or count < limit):
+            await asyncio.sleep(0)
+            batch = self.batch if limit is None else min(self.batch,
+                                                          limit - count)
+            changed = board.resume(batch)
+            count += len(changed)
+            pieces.append(self.encode_squares(board, changed))
+        return pieces
+
+    async def reveal(self, request):
+        """
+        Reveal a covered square, yielding between batches of a flood fill.
+        """
+        session = self.session(request)
+        async with session.lock:
+            self.check_playing(session)
+            r, c = self.square(request, session)
+            board = session.board
+            limit = None
+            if session.width is None:
+                limit = cfg.ENDLESS_REVEAL_LIMIT
+            pieces = []
+            if board.display[r][c] == cfg.HIDDEN_CHAR:
+                pieces = await self.finish_reveal(
+                    board, board.mark_safe(r, c, self.batch), limit)
+            elif board.unfinished:
+                pieces = await self.finish_reveal(board, [], limit)
+            return self.result(session, pieces)
+
+    async def flag(self, request):
+        """
+        Flag a covered square.
+        """
+        session = self.session(request)
+        async with session.lock:
+            self.check_playing(session)
+            r, c = self.square(request, session)
+            pieces = []
+            if session.board.display[r][c] == cfg.HIDDEN_CHAR:
+                session.board.mark_mine(r, c)
+                pieces.append(self.encode_squares(session.board, [(r, c)]))
+            return self.result(session, pieces)
+
+    async def unflag(self, request):
+        """
+        Remove the flag from a square.
+        """
+        session = self.session(request)
+        async with session.lock:
+            self.check_playing(session)
+            r, c = self.square(request, session)
+            pieces = []
+            if session.board.display[r][c] == cfg.MINE_CHAR:
+                session.board.unmark_mine(r, c)
+                pieces.append(self.encode_squares(session.board, [(r, c)]))
+            return self.result(session, pieces)
+
+    async def chord(self, request):
+        """
+        Reveal the covered neighbors of a number with enough flags,
+        yielding between batches of the flood fills, as reveal does.
+        """
+        session = self.session(request)
+        if session.width is None:
+            raise ProtocolError('no chord on an endless board')
+        async with session.lock:
+            self.check_playing(session)
+            r, c = self.square(request, session)
+            board = session.board
+            pieces = await self.finish_reveal(
+                board, board.chord(r, c, self.batch))
+            return self.result(session, pieces)
+
+    async def state(self, request):
+        """
+        Return a rectangle of the board, by default all of it, built
+        about batch squares at a time, yielding between batches.
+        """
+        session = self.session(request)
+        async with session.lock:
+            if session.width is None:
+                reach = cfg.SERVER_ENDLESS_REACH
+                top = self.integer(request.get('top', 0), 'top', -reach, reach)
+                left = self.integer(request.get('left', 0), 'left', -reach,
+                                    reach)
+                height = self.integer(request.get('height'), 'height', 1,
+                                      cfg.SERVER_MAX_SQUARES + 1)
+                width = self.integer(request.get('width'), 'width', 1,
+                                     cfg.SERVER_MAX_SQUARES // height + 1)
+            else:
+                top = self.integer(request.get('top', 0), 'top', 0,
+                                   session.height)
+                left = self.integer(request.get('left', 0), 'left', 0,
+                                    session.width)
+                height = self.integer(
+                    request.get('height', session.height - top), 'height', 1,
+                    session.height - top + 1)
+                width = self.integer(
+                    request.get('width', session.width - left), 'width', 1,
+                    session.width - left + 1)
+            display = session.board.display
+            step = max(1, self.batch // width)
+            rows = []
+            for first in range(top, top + height, step):
+                if rows:
+                    await asyncio.sleep(0)
+                rows += [''.join(str(display[r][c])
+                                 for c in range(left, left + width))
+                         for r in range(first, min(first + step,
+                                                   top + height))]
+            response = self.status(session)
+            response['rows'] = rows
+            return response
+
+    async def close(self, request):
+        """
+        End a session.
+        """
+        self.session(request)
+        del self.sessions[request['session']]
+        return {}
+
+    async def stats(self, request):
+        """
+        Return the number of open sessions and requests answered.
+        """
+        return {'sessions': len(self.sessions), 'requests': self.requests}
+
+    async def sweep(self, interval = cfg.SERVER_SWEEP_INTERVAL):
+        """
+        Close idle sessions every interval seconds, forever.
+        """
+        while True:
+            await asyncio.sleep(interval)
+            now = time.monotonic()
+            for name, session in list(self.sessions.items()):
+                if (now - session.last_used > self.idle_timeout and
+                    not session.lock.locked()):
+                    del self.sessions[name]
+
+async def serve(host = cfg.SERVER_HOST, port = cfg.SERVER_PORT, path = None,
+                game_server = None):
+    """
+    Run a GameServer on a TCP port, or on the Unix socket at path,
+    until cancelled.
+    """
+    game_server = game_server or GameServer()
+    if path:
+        server = await asyncio.start_unix_server(
+            game_server.handle_client, path, limit = cfg.SERVER_MAX_LINE)
+    else:
+        server = await asyncio.start_server(
+            game_server.handle_client, host, port, limit = cfg.SERVER_MAX_LINE)
+    sweeper = asyncio.ensure_future(game_server.sweep())
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        sweeper.cancel()
+
+def main(argv = None):
+    """
+    Start the server from the command line.
+    """
+    parser = argparse.ArgumentParser(description = __doc__.split('\n\n')[0])
+    parser.add_argument('--host', default = cfg.SERVER_HOST)
+    parser.add_argument('--port', type = int, default = cfg.SERVER_PORT)
+    parser.add_argument('--unix', help = 'listen on this Unix socket instead')
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
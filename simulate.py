@@ -0,0 +1,277 @@
+"""
+Play minesweeper games headless, in parallel, to load-test the board
+engines and measure how well a move policy plays.
+
+    python simulate.py --level 3 --games 10000 --policy random --seed 1
+"""
+
+from __future__ import division, print_function
+import argparse
+import json
+import multiprocessing
+import random
+import time
+import config as cfg
+import maps
+from solver import Solver
+from probability import ProbabilityEngine
+
+# Use the most precise clock Python provides.
+_timer = getattr(time, 'perf_counter', time.time)
+
+# Per-move latency histogram buckets, in microseconds: bucket i counts
+# the moves that took less than LATENCY_BUCKETS[i].
+LATENCY_BUCKETS = [2 ** (i / 4) for i in range(4 * 24)]
+
+class RandomPolicy(object):
+    """
+    A move policy that reveals covered squares at random.
+    Every policy is created once per game with the board and the game's
+    random number generator, hands out moves from next_move, or several
+    at a time from next_moves, and is told about the squares each move
+    changed through update.
+    """
+    def __init__(self, board, rng):
+        self.board = board
+        self.rng = rng
+
+    def next_move(self):
+        """
+        Return a move that reveals a covered square chosen at random.
+        """
+        board = self.board
+        rng = self.rng
+        height = len(board.territory)
+        width = len(board.territory[0])
+        for attempt in range(16):
+            r = rng.randrange(height)
+            c = rng.randrange(width)
+            if board.display[r][c] == cfg.HIDDEN_CHAR:
+                return 'safe', r, c
+        covered = [(r, c) for r, row in enumerate(board.display)
+                   for c, col in enumerate(row) if col == cfg.HIDDEN_CHAR]
+        r, c = rng.choice(covered)
+        return 'safe', r, c
+
+    def next_moves(self):
+        """
+        Return a list of moves to make in one batch.
+        """
+        return [self.next_move()]
+
+    def update(self, changed):
+        """
+        Note the (row, col) squares changed by the last move.
+        """
+        pass
+
+class SolverPolicy(RandomPolicy):
+    """
+    A move policy that plays every certain move found by the Solver,
+    and guesses at random only when there is none.
+    """
+    def __init__(self, board, rng):
+        RandomPolicy.__init__(self, board, rng)
+        self.solver = Solver(board)
+
+    def next_move(self):
+        """
+        Return a certain move if there is one, otherwise a random reveal.
+        """
+        return self.solver.next_move() or RandomPolicy.next_move(self)
+
+    def next_moves(self):
+        """
+        Return every certain move, or a list of one guess if there are none.
+        """
+        display = self.board.display
+        moves = [(action, r, c) for action, r, c in self.solver.moves()
+                 if display[r][c] == cfg.HIDDEN_CHAR]
+        return moves or [self.next_move()]
+
+    def update(self, changed):
+        """
+        Pass the (row, col) squares changed by the last move to the solver.
+        """
+        self.solver.update(changed)
+
+class ProbabilityPolicy(SolverPolicy):
+    """
+    A move policy that plays every certain move found by the Solver,
+    and otherwise reveals the square least likely to hold a mine. The
+    probabilities are limited by cfg.PROBABILITY_STEPS search steps
+    rather than by time, so seeded runs are reproducible.
+    """
+    def __init__(self, board, rng):
+        SolverPolicy.__init__(self, board, rng)
+        self.engine = ProbabilityEngine(board, None, cfg.PROBABILITY_STEPS)
+
+    def next_move(self):
+        """
+        Return a certain move if there is one, otherwise the best guess.
+        """
+        move = self.solver.next_move()
+        if move is None:
+            r, c = self.engine.best_guess()
+            move = 'safe', r, c
+        return move
+
+# {policy name: policy class}
+POLICIES = {'random': RandomPolicy, 'solver': SolverPolicy,
+            'probability': ProbabilityPolicy}
+
+def game_seed(base_seed, game):
+    """
+    Return the seed of a game's random number generator, so each game
+    gets its own reproducible stream whichever worker plays it.
+    """
+    return base_seed * 2 ** 32 + game
+
+def play_game(board, width, height, mines, policy, rng, latencies):
+    """
+    Play one game on board with a new random layout, starting with a safe
+    first click, and making every later move with one instance of the
+    policy class, created for this game. The moves the policy hands out together are made with
+    one call to apply_moves, and each is counted in the latencies
+    histogram with an equal share of the time that call took.
+    Return (won, moves, seconds), where seconds is the total time spent
+    applying moves.
+    """
+    first = (rng.randrange(height), rng.randrange(width))
+    board.randomize(width, height, mines, rng = rng, safe = first)
+    policy = policy(board, rng)
+    moves = 0
+    seconds = 0
+    batch = [('safe',) + first]
+    while True:
+        start = _timer()
+        applied, changed, dead, won = board.apply_moves(batch)
+        elapsed = _timer() - start
+        for move in range(applied):
+            record_latency(latencies, elapsed * 1e6 / applied)
+        seconds += elapsed
+        moves += applied
+        if dead or won:
+            return won, moves, seconds
+        policy.update([divmod(i, width) for i in changed])
+        batch = policy.next_moves()
+
+def record_latency(latencies, micros):
+    """
+    Count a move that took micros microseconds in the latencies histogram.
+    """
+    low, high = 0, len(LATENCY_BUCKETS) - 1
+    while low < high:
+        mid = (low + high) // 2
+        if micros < LATENCY_BUCKETS[mid]:
+            high = mid
+        else:
+            low = mid + 1
+    latencies[low] += 1
+
+def play_batch(job):
+    """
+    Play a batch of games in a worker process. job is a tuple of
+    (first game number, number of games, width, height, mines, policy
+    name, base seed, engine). Return (wins, moves, move time, latencies).
+    """
+    first, games, width, height, mines, policy, base_seed, engine = job
+    if engine == 'auto':
+        engine = maps.choose_engine(width * height, mines)
+    board = maps.make_board(engine = engine)
+    latencies = [0] * len(LATENCY_BUCKETS)
+    wins = moves = move_time = 0
+    for game in range(first, first + games):
+        rng = random.Random(game_seed(base_seed, game))
+        won, count, seconds = play_game(board, width, height, mines,
+                                        POLICIES[policy], rng, latencies)
+        wins += won
+        moves += count
+        move_time += seconds
+    return wins, moves, move_time, latencies
+
+def percentile(latencies, fraction):
+    """
+    Return the bucket bound below which the given fraction of the moves
+    in the latencies histogram fall.
+    """
+    target = fraction * sum(latencies)
+    seen = 0
+    for bound, count in zip(LATENCY_BUCKETS, latencies):
+        seen += count
+        if count and seen >= target:
+            return bound
+    return LATENCY_BUCKETS[-1]
+
+def simulate(width, height, mines, games, policy = 'random', seed = 0,
+             workers = None, batch = 100, engine = cfg.ENGINE):
+    """
+    Play games across a pool of worker processes and return a dictionary
+    of results: throughput, win rate and per-move latency percentiles.
+    """
+    jobs = [(first, min(batch, games - first), width, height, mines,
+             policy, seed, engine) for first in range(0, games, batch)]
+    start = _timer()
+    if workers == 1:
+        results = [play_batch(job) for job in jobs]
+    else:
+        pool = multiprocessing.Pool(workers)
+        try:
+            results = pool.map(play_batch, jobs)
+        finally:
+            pool.close()
+            pool.join()
+    elapsed = _timer() - start
+    wins = sum(result[0] for result in results)
+    moves = sum(result[1] for result in results)
+    move_time = sum(result[2] for result in results)
+    latencies = [sum(counts) for counts in zip(*[result[3]
+                                                 for result in results])]
+    return {'width': width, 'height': height, 'mines': mines,
+            'games': games, 'policy': policy, 'seed': seed,
+            'engine': engine, 'seconds': elapsed,
+            'games_per_sec': games / elapsed if elapsed else 0,
+            'win_rate': wins / games if games else 0,
+            'moves': moves,
+            'move_us_mean': move_time * 1e6 / moves if moves else 0,
+            'move_us_p50': percentile(latencies, 0.5),
+            'move_us_p95': percentile(latencies, 0.95),
+            'move_us_p99': percentile(latencies, 0.99)}
+
+def main(argv = None):
+    """
+    Run the simulator from the command line and print its report.
+    """
+    parser = argparse.ArgumentParser(description = __doc__.split('\n\n')[0])
+    parser.add_argument('--level', type = int, choices = sorted(cfg.LEVELS))
+    parser.add_argument('--width', type = int)
+    parser.add_argument('--height', type = int)
+    parser.add_argument('--mines', type = int)
+    parser.add_argument('--games', type = int, default = 1000)
+    parser.add_argument('--policy', choices = sorted(POLICIES),
+                        default = 'random')
+    parser.add_argument('--seed', type = int, default = 0)
+    parser.add_argument('--workers', type = int)
+    parser.add_argument('--batch', type = int, default = 100)
+    parser.add_argument('--engine', choices = sorted(maps.ENGINES) + ['auto'],
+                        default = cfg.ENGINE)
+    parser.add_argument('--json', action = 'store_true',
+                        help = 'print the report as JSON')
+    args = parser.parse_args(argv)
+    if args.level is not None:
+        width, mines = cfg.LEVELS[args.level]
+        height = width
+    elif None in (args.width, args.height, args.mines):
+        parser.error('give either --level or --width, --height and --mines')
+    else:
+        width, height, mines = args.width, args.height, args.mines
+    report = simulate(width, height, mines, args.games, args.policy,
+                      args.seed, args.workers, args.batch, args.engine)
+    if args.json:
+        print(json.dumps(report, sort_keys = True))
+    else:
+        for key in sorted(report):
+            print('{}: {}'.format(key, report[key]))
+
+if __name__ == '__main__':
+    main()
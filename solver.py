@@ -0,0 +1,154 @@
+"""
+A constraint-propagation solver that finds squares which are certainly
+safe or certainly mines, given what the player can see on a Board.
+"""
+
+from __future__ import division
+import config as cfg
+
+class Solver(object):
+    """
+    This class keeps the squares it has proven safe or mined on a board,
+    and a queue of revealed numbers whose constraints need another look.
+    Each revealed number n says that n of its covered neighbors hold mines.
+    The solver applies two rules: a number whose mines are all accounted
+    for (or whose covered neighbors must all be mines) settles every
+    covered neighbor, and two nearby numbers that share covered squares
+    can settle the squares that only one of them touches.
+    After a move, call update with the squares that changed; only the
+    numbers around those squares are looked at again.
+    """
+    def __init__(self, board):
+        """
+        Start solving a board, queueing every number already revealed.
+        """
+        self.board = board
+        self.safe = set()
+        self.mines = set()
+        self.pending = set()
+        for r, row in enumerate(board.display):
+            for c, col in enumerate(row):
+                if self.is_number(col):
+                    self.pending.add((r, c))
+
+    def is_number(self, value):
+        """
+        Return True if value is the display value of a revealed number
+        that may still constrain covered squares.
+        """
+        return isinstance(value, int) and value > 0
+
+    def update(self, changed):
+        """
+        Forget settled squares among the (row, col) pairs in changed, and
+        queue the revealed numbers on and around them.
+        """
+        for r, c in changed:
+            self.safe.discard((r, c))
+            self.mines.discard((r, c))
+            self.queue_around(r, c)
+
+    def queue_around(self, r, c):
+        """
+        Queue the revealed numbers at and next to row r, column c.
+        """
+        display = self.board.display
+        if self.is_number(display[r][c]):
+            self.pending.add((r, c))
+        for nr, nc in self.board.neighbors(r, c):
+            if self.is_number(display[nr][nc]):
+                self.pending.add((nr, nc))
+
+    def constraint(self, r, c):
+        """
+        Return (cells, mines) for the number at row r, column c: the set
+        of its neighbors not yet settled, and how many of them are mines.
+        """
+        display = self.board.display
+        cells = set()
+        mines = display[r][c]
+        for nr, nc in self.board.neighbors(r, c):
+            value = display[nr][nc]
+            if value == cfg.HIDDEN_CHAR:
+                if (nr, nc) in self.mines:
+                    mines -= 1
+                elif (nr, nc) not in self.safe:
+                    cells.add((nr, nc))
+            elif value == cfg.MINE_CHAR or value == cfg.ERROR_CHAR:
+                mines -= 1
+        return cells, mines
+
+    def settle(self, cells, target):
+        """
+        Add cells to the safe or mine set target, and queue the numbers
+        whose constraints that changes.
+        """
+        for r, c in cells:
+            if (r, c) not in target:
+                target.add((r, c))
+                self.queue_around(r, c)
+
+    def run(self):
+        """
+        Examine queued numbers until no rule settles anything new.
+        """
+        display = self.board.display
+        while self.pending:
+            r, c = self.pending.pop()
+            cells, mines = self.constraint(r, c)
+            if not cells:
+                continue
+            if mines == 0:
+                self.settle(cells, self.safe)
+                continue
+            if mines == len(cells):
+                self.settle(cells, self.mines)
+                continue
+            others = set()
+            for cell in cells:
+                others.update(self.board.neighbors(*cell))
+            others.discard((r, c))
+            for nr, nc in others:
+                if self.is_number(display[nr][nc]):
+                    self.compare(cells, mines, *self.constraint(nr, nc))
+
+    def compare(self, cells, mines, other_cells, other_mines):
+        """
+        Apply the pairwise rule to two constraints. If one number needs
+        as many mines in the shared squares as the other has in total,
+        the other's own squares are safe and the first one's own squares
+        are mines.
+        """
+        if not cells & other_cells:
+            return
+        only = cells - other_cells
+        other_only = other_cells - cells
+        if mines - len(only) == other_mines:
+            self.settle(only, self.mines)
+            self.settle(other_only, self.safe)
+        elif other_mines - len(other_only) == mines:
+            self.settle(other_only, self.mines)
+            self.settle(only, self.safe)
+
+    def moves(self):
+        """
+        Return every certain move as a list of ('safe', row, col) and
+        ('flag', row, col) tuples.
+        """
+        self.run()
+        return ([('safe', r, c) for r, c in self.safe] +
+                [('flag', r, c) for r, c in self.mines])
+
+    def next_move(self):
+        """
+        Return one certain move, preferring reveals, or None if there are
+        no certain moves left.
+        """
+        self.run()
+        for cells, action in ((self.safe, 'safe'), (self.mines, 'flag')):
+            while cells:
+                r, c = cells.pop()
+                if self.board.display[r][c] == cfg.HIDDEN_CHAR:
+                    cells.add((r, c))
+                    return action, r, c
+        return None
@@ -0,0 +1,373 @@
+"""
+A sparse Board engine for huge minesweeper maps with few mines.
+"""
+
+from __future__ import division
+from collections import OrderedDict
+import config as cfg
+import adjacency
+from board import str_to_layout, COVERED, REVEALED, FLAGGED, EXPLODED
+from arrayboard import ArrayBoard
+
+class SparseBoard(ArrayBoard):
+    """
+    A Board that only stores what is rare on a huge, sparse map: the mines,
+    as a set of flat indices (or a mapfile.MapFile read on demand), the
+    flags and exploded mines, as sets, and the revealed squares, as one
+    bitmap per row that the player has touched. Neighbor counts are
+    computed when needed and the most recent ones are kept in a small
+    cache. An adjacency index would take more memory than the board
+    itself, so neighbors are worked out from the topology's steps.
+    """
+    def __init__(self, territory_str = None, topology = None):
+        """
+        If a string is supplied, create a board from that string.
+        Otherwise, create a random board. See Board for topology.
+        """
+        self.map_file = None
+        ArrayBoard.__init__(self, territory_str, topology)
+
+    def make_territory(self):
+        """
+        Convert a territory string into the set of mines, or clear the
+        player's marks if the board already has a layout.
+        """
+        if self._territory_str:
+            self.set_layout(*str_to_layout(self._territory_str))
+        elif self.width:
+            self.clear_marks()
+
+    def load_territory(self, territory):
+        """
+        Play on a mapfile.MapFile, reading its squares on demand,
+        which takes constant time.
+        """
+        self._territory_str = None
+        self.map_file = territory
+        self.mines = None
+        self.width = territory.width
+        self.height = territory.height
+        self.mine_count = territory.mines
+        self.clear_marks()
+        self.dead = False
+
+    def set_layout(self, mines, width, height):
+        """
+        Store the positions of the mines in a bytearray of 0/1 values
+        and clear the player's marks, leaving territory_str untouched.
+        """
+        self.map_file = None
+        self.mines = set()
+        find = mines.find
+        i = find(b'\x01')
+        while i != -1:
+            self.mines.add(i)
+            i = find(b'\x01', i + 1)
+        self.width = width
+        self.height = height
+        self.mine_count = len(self.mines)
+        self.clear_marks()
+
+    def clear_marks(self):
+        """
+        Forget every mark the player has made.
+        """
+        self.revealed = {}
+        self.flags = set()
+        self.exploded = set()
+        self.count_cache = OrderedDict()
+        self.make_views()
+        self.make_adjacency(self.width, self.height)
+        self.reset_counters(self.mine_count, self.width * self.height)
+
+    def snapshot(self):
+        """
+        Return the player's marks; see Board.snapshot.
+        """
+        width = self.width
+        states = bytearray(width * self.height)
+        for r in self.revealed:
+            for c in range(width):
+                if self.is_revealed(r, c):
+                    states[r * width + c] = REVEALED
+        for i in self.flags:
+            states[i] = FLAGGED
+        for i in self.exploded:
+            states[i] = EXPLODED
+        return states
+
+    def restore(self, states):
+        """
+        Replace the player's marks with a snapshot; see Board.restore.
+        """
+        width = self.width
+        self.revealed = {}
+        self.flags = set()
+        self.exploded = set()
+        for i, value in enumerate(states):
+            if value == REVEALED:
+                self.set_revealed(*divmod(i, width))
+            elif value == FLAGGED:
+                self.flags.add(i)
+            elif value == EXPLODED:
+                self.exploded.add(i)
+        self.recount(states)
+
+    def layout(self):
+        """
+        Return the mine layout as a bytearray of 0/1 values.
+        """
+        if self.map_file is not None:
+            return self.map_file.layout()
+        layout = bytearray(self.width * self.height)
+        for i in self.mines:
+            layout[i] = 1
+        return layout
+
+    def territory_row(self, r):
+        """
+        Return row r of the mine layout as a string of '0'/'1' characters.
+        """
+        return ''.join('1' if self.has_mine(r, c) else '0'
+                       for c in range(self.width))
+
+    def has_mine(self, r, c):
+        """
+        Return True if the square at row r, column c contains a mine.
+        """
+        if self.map_file is not None:
+            return self.map_file.has_mine(r, c)
+        return r * self.width + c in self.mines
+
+    def is_revealed(self, r, c):
+        """
+        Return True if the square at row r, column c has been revealed.
+        """
+        row = self.revealed.get(r)
+        return row is not None and bool(row[c >> 3] & (1 << (c & 7)))
+
+    def set_revealed(self, r, c):
+        """
+        Mark the square at row r, column c as revealed.
+        """
+        row = self.revealed.get(r)
+        if row is None:
+            row = self.revealed[r] = bytearray((self.width + 7) // 8)
+        row[c >> 3] |= 1 << (c & 7)
+
+    def square_state(self, r, c):
+        """
+        Return the state of the square at row r, column c.
+        """
+        i = r * self.width + c
+        if i in self.exploded:
+            return EXPLODED
+        if i in self.flags:
+            return FLAGGED
+        if self.is_revealed(r, c):
+            return REVEALED
+        return COVERED
+
+    def set_square_state(self, r, c, state):
+        """
+        Set the state of the square at row r, column c, without updating
+        the counters.
+        """
+        i = r * self.width + c
+        self.exploded.discard(i)
+        self.flags.discard(i)
+        row = self.revealed.get(r)
+        if row is not None:
+            row[c >> 3] &= ~(1 << (c & 7)) & 0xff
+        if state == REVEALED:
+            self.set_revealed(r, c)
+        elif state == FLAGGED:
+            self.flags.add(i)
+        elif state == EXPLODED:
+            self.exploded.add(i)
+
+    def is_covered(self, r, c):
+        """
+        Return True if the square at row r, column c is neither revealed
+        nor flagged.
+        """
+        return (not self.is_revealed(r, c) and
+                r * self.width + c not in self.flags and
+                r * self.width + c not in self.exploded)
+
+    def make_adjacency(self, width, height):
+        """
+        Look up the board's topology, without building an index, and
+        turn its steps into flat index offsets, which hold for squares
+        far enough from the edges.
+        """
+        self.adjacency = None
+        self.neighborhood = adjacency.get_topology(self.topology)
+        self.deltas = [[dr * width + dc for dr, dc in steps]
+                       for steps in self.neighborhood.steps]
+
+    def neighbors(self, r, c):
+        """
+        Return the row and column number for each square that is adjacent
+        to the square at row r, column c, from the topology's steps.
+        """
+        return self.neighborhood.neighbors(r, c, self.width, self.height)
+
+    def count(self, r, c):
+        """
+        Return the number of mines next to the square at row r, column c.
+        """
+        key = r * self.width + c
+        count = self.count_cache.pop(key, None)
+        if count is None:
+            count = 0
+            reach = self.neighborhood.reach
+            if (self.map_file is None and reach <= r < self.height - reach
+                and reach <= c < self.width - reach):
+                mines = self.mines
+                for delta in self.deltas[r & 1]:
+                    if key + delta in mines:
+                        count += 1
+            else:
+                for nr, nc in self.neighbors(r, c):
+                    if self.has_mine(nr, nc):
+                        count += 1
+            if len(self.count_cache) >= cfg.SPARSE_COUNT_CACHE:
+                self.count_cache.popitem(last = False)
+        self.count_cache[key] = count
+        return count
+
+    def cell(self, r, c):
+        """
+        Return the display value of the square at row r, column c:
+        the hidden, mine or error character, or a neighbor count.
+        """
+        i = r * self.width + c
+        if i in self.exploded:
+            return cfg.ERROR_CHAR
+        if i in self.flags:
+            return cfg.MINE_CHAR
+        if self.is_revealed(r, c):
+            return self.count(r, c)
+        return cfg.HIDDEN_CHAR
+
+    def tally(self, r, c, sign):
+        """
+        Add (sign = 1) or remove (sign = -1) the square at row r, column c
+        from the counters of covered squares and flags used by check_win.
+        """
+        i = r * self.width + c
+        if i in self.flags:
+            if self.has_mine(r, c):
+                self.correct_flags += sign
+            else:
+                self.wrong_flags += sign
+        elif i not in self.exploded and not self.is_revealed(r, c):
+            if self.has_mine(r, c):
+                self.covered_mines += sign
+            else:
+                self.covered_safe += sign
+
+    def mark_mine(self, r, c):
+        """
+        Declare that the square at row r, column c contains a mine.
+        """
+        if self.journal is not None:
+            self.journal.record('flag', r, c)
+        self.tally(r, c, -1)
+        self.flags.add(r * self.width + c)
+        self.tally(r, c, 1)
+        self.mines_left -= 1
+
+    def unmark_mine(self, r, c):
+        """
+        Undeclare a mine in the sqaure at row r, column c.
+        """
+        if self.journal is not None:
+            self.journal.record('unflag', r, c)
+        self.tally(r, c, -1)
+        self.flags.discard(r * self.width + c)
+        self.tally(r, c, 1)
+        self.mines_left += 1
+
+    def covered_neighbors(self, r, c):
+        """
+        Return only the neighbors that have not yet been marked by the player.
+        """
+        return [nei for nei in self.neighbors(r, c) if self.is_covered(*nei)]
+
+    def neighbor_mines(self, r, c):
+        """
+        Return a list of neighbor squares that contain mines.
+        """
+        return [nei for nei in self.neighbors(r, c) if self.has_mine(*nei)]
+
+    def mark_safe(self, r, c, limit = None):
+        """
+        Declare that the square at row r, column c does not contain a mine.
+        If wrong, the player loses. If correct, the square is revealed,
+        and the reveal spreads through every connected square that has no
+        neighboring mines, using an explicit stack.
+        See Board.mark_safe for limit.
+        Return a list of (row, col) pairs for the squares that changed.
+        """
+        if self.is_revealed(r, c):
+            return []
+        if self.journal is not None:
+            self.journal.record('safe', r, c)
+        self.tally(r, c, -1)
+        self.flags.discard(r * self.width + c)
+        if self.has_mine(r, c):
+            self.dead = True
+            self.exploded.add(r * self.width + c)
+            if self.stats is not None:
+                self.stats.record_move(1, 0)
+            return [(r, c)]
+        self.set_revealed(r, c)
+        self.unfinished.append((r, c))
+        return self.resume(limit)
+
+    def resume(self, limit = None):
+        """
+        Carry on an unfinished reveal; see Board.resume.
+        """
+        width = self.width
+        height = self.height
+        steps = self.neighborhood.steps
+        wrap = self.neighborhood.wrap
+        rows = self.revealed
+        flags = self.flags
+        revealed = []
+        stack = self.unfinished
+        before = len(stack)
+        if limit is None:
+            limit = width * height
+        depth = before
+        while stack and len(revealed) < limit:
+            r, c = stack.pop()
+            revealed.append((r, c))
+            if self.count(r, c):
+                continue
+            # The steps are taken here rather than through neighbors, as
+            # this is the hot loop; a square reached twice, or the square
+            # itself on a small torus, is already revealed.
+            for dr, dc in steps[r & 1]:
+                nr = r + dr
+                nc = c + dc
+                if wrap:
+                    nr %= height
+                    nc %= width
+                elif not (0 <= nr < height and 0 <= nc < width):
+                    continue
+                row = rows.get(nr)
+                if row is None:
+                    row = rows[nr] = bytearray((width + 7) // 8)
+                if (not row[nc >> 3] & (1 << (nc & 7)) and
+                    nr * width + nc not in flags):
+                    row[nc >> 3] |= 1 << (nc & 7)
+                    stack.append((nr, nc))
+            depth = max(depth, len(stack))
+        self.covered_safe -= len(revealed) + len(stack) - before
+        if self.stats is not None:
+            self.stats.record_move(len(revealed), depth)
+        return revealed
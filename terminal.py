@@ -0,0 +1,245 @@
+"""
+Terminal renderers for the command-line version of Minesweeper.
+"""
+
+from __future__ import division
+import os
+import sys
+import config as cfg
+
+# ANSI escape sequences.
+CLEAR_SCREEN = '\x1b[r\x1b[2J\x1b[H'
+CLEAR_LINE = '\x1b[K'
+SAVE_CURSOR = '\x1b7'
+RESTORE_CURSOR = '\x1b8'
+RESET_SCROLL_REGION = '\x1b[r'
+
+# One character for each neighbor count, as counts pass 9 under some
+# topologies; larger counts are shown as '+'.
+COUNT_CHARS = dict(enumerate('0123456789abcdefghijklmnopqrstuvwxyz'))
+
+def goto(line, column):
+    """
+    Return the escape sequence that moves the cursor to a line and
+    column of the screen, both counted from 0.
+    """
+    return '\x1b[{};{}H'.format(line + 1, column + 1)
+
+def terminal_size(stream = sys.stdout):
+    """
+    Return the (columns, lines) of the terminal stream writes to, or
+    cfg.TERMINAL_SIZE if it cannot be found.
+    """
+    try:
+        return tuple(os.get_terminal_size(stream.fileno()))
+    except (AttributeError, ValueError, OSError):
+        pass
+    try:
+        import fcntl
+        import struct
+        import termios
+        lines, columns = struct.unpack('hh', fcntl.ioctl(
+            stream.fileno(), termios.TIOCGWINSZ, b'\0' * 4))
+        if columns and lines:
+            return columns, lines
+    except (ImportError, AttributeError, ValueError, IOError, OSError):
+        pass
+    return cfg.TERMINAL_SIZE
+
+def column_labels(left, count, digits = None):
+    """
+    Return the lines of labels for count columns starting at column left:
+    each number is written downwards, one digit per line, so every column
+    stays one character wide. There are digits lines, by default as many
+    as the last number needs.
+    """
+    numbers = [str(c) for c in range(left, left + count)]
+    digits = digits or len(numbers[-1])
+    numbers = [number.rjust(digits) for number in numbers]
+    return [''.join(number[i] for number in numbers) for i in range(digits)]
+
+def square_char(value):
+    """
+    Return the character that shows a square whose display value is value.
+    """
+    if isinstance(value, int):
+        return COUNT_CHARS.get(value, '+')
+    return value
+
+def board_lines(board, top = 0, left = 0, height = None, width = None):
+    """
+    Return the rows of a rectangle of the board's display, by default all
+    of it, as strings of one character per square.
+    """
+    display = board.display
+    height = len(display) - top if height is None else height
+    width = len(display[0]) - left if width is None else width
+    return [''.join(square_char(display[r][c])
+                    for c in range(left, left + width))
+            for r in range(top, top + height)]
+
+class PlainRenderer(object):
+    """
+    This class prints the whole board after every move, for output that
+    is not a terminal, such as a file or a pipe.
+    """
+    def __init__(self, stream = sys.stdout):
+        self.stream = stream
+
+    def draw(self, board):
+        """
+        Print the board with its row and column numbers.
+        """
+        rows = board_lines(board)
+        label_width = len(str(len(rows) - 1))
+        lines = [' ' * (label_width + 1) + line
+                 for line in column_labels(0, len(rows[0]))]
+        lines += [str(r).rjust(label_width) + ' ' + row
+                  for r, row in enumerate(rows)]
+        self.stream.write('\n'.join(lines) + '\n')
+        self.stream.flush()
+
+    def scroll(self, rows, cols):
+        """
+        Do nothing: the whole board is always shown.
+        """
+        pass
+
+    def show(self, r, c):
+        """
+        Do nothing: the whole board is always shown.
+        """
+        pass
+
+    def close(self):
+        """
+        Do nothing: the terminal was not changed.
+        """
+        pass
+
+class AnsiRenderer(object):
+    """
+    This class keeps the board at the top of the terminal and rewrites
+    only the squares that changed since the last draw, in one write.
+    A board too big for the terminal is shown through a viewport that
+    can be scrolled. The lines below the board are set as the terminal's
+    scrolling region, so prompts scroll there without moving the board.
+    """
+    def __init__(self, stream = sys.stdout,
+                 prompt_lines = cfg.TERMINAL_PROMPT_LINES):
+        self.stream = stream
+        self.prompt_lines = prompt_lines
+        self.top = 0
+        self.left = 0
+        self.shown = None
+        self.rows = []
+
+    def layout(self, board):
+        """
+        Work out the size of the viewport from the terminal's size, and
+        keep it inside the board. The screen holds a status line, the
+        column labels, then the rows, each after its row label.
+        """
+        columns, lines = terminal_size(self.stream)
+        board_height = len(board.display)
+        board_width = len(board.display[0])
+        self.label_width = len(str(board_height - 1))
+        self.header = 1 + len(str(board_width - 1))
+        self.columns = columns
+        self.lines = lines
+        self.height = max(1, min(board_height,
+                                 lines - self.header - self.prompt_lines))
+        self.width = max(1, min(board_width, columns - self.label_width - 1))
+        self.top = max(0, min(self.top, board_height - self.height))
+        self.left = max(0, min(self.left, board_width - self.width))
+        return (board, lines, self.top, self.left, self.height, self.width)
+
+    def status(self, board):
+        """
+        Return the status line: the mines left and the part of the board
+        in view.
+        """
+        return 'Mines left: {}  rows {}-{} of {}, columns {}-{} of {}'.format(
+            board.mines_left, self.top, self.top + self.height - 1,
+            len(board.display), self.left, self.left + self.width - 1,
+            len(board.display[0]))[:self.columns - 1]
+
+    def draw(self, board):
+        """
+        Bring the screen up to date with the board. Everything is drawn
+        when the board, the terminal size or the viewport changed;
+        otherwise only the squares that changed are.
+        """
+        key = self.layout(board)
+        rows = board_lines(board, self.top, self.left, self.height, self.width)
+        out = [SAVE_CURSOR, goto(0, 0), self.status(board), CLEAR_LINE]
+        if key != self.shown:
+            out = [CLEAR_SCREEN, self.status(board)]
+            indent = ' ' * (self.label_width + 1)
+            for line in column_labels(self.left, self.width,
+                                      self.header - 1):
+                out.append('\n' + indent + line)
+            for r, row in enumerate(rows):
+                out.append('\n' + str(self.top + r).rjust(self.label_width) +
+                           ' ' + row)
+            out.append('\x1b[{};{}r'.format(self.header + self.height + 1,
+                                            self.lines))
+            out.append(goto(self.lines - 1, 0))
+            self.shown = key
+        else:
+            start = self.label_width + 1
+            for r, (old, new) in enumerate(zip(self.rows, rows)):
+                if old == new:
+                    continue
+                last = None
+                for c in range(self.width):
+                    if old[c] != new[c]:
+                        if c != last:
+                            out.append(goto(self.header + r, start + c))
+                        out.append(new[c])
+                        last = c + 1
+            out.append(RESTORE_CURSOR)
+        self.rows = rows
+        self.stream.write(''.join(out))
+        self.stream.flush()
+
+    def scroll(self, rows, cols):
+        """
+        Move the viewport by rows and cols half-screens; draw keeps it
+        inside the board.
+        """
+        if self.shown is not None:
+            self.top = max(0, self.top + rows * max(1, self.height // 2))
+            self.left = max(0, self.left + cols * max(1, self.width // 2))
+
+    def show(self, r, c):
+        """
+        Scroll the viewport, if need be, so the square at row r, column c
+        is in view.
+        """
+        if self.shown is None:
+            return
+        if not self.top <= r < self.top + self.height:
+            self.top = max(0, r - self.height // 2)
+        if not self.left <= c < self.left + self.width:
+            self.left = max(0, c - self.width // 2)
+
+    def close(self):
+        """
+        Give the whole terminal back for scrolling.
+        """
+        if self.shown is not None:
+            self.stream.write(RESET_SCROLL_REGION + goto(self.lines - 1, 0) +
+                              '\n')
+            self.stream.flush()
+            self.shown = None
+
+def make_renderer(stream = sys.stdout):
+    """
+    Return an AnsiRenderer if stream is a terminal and cfg.ANSI_RENDERING
+    is on, otherwise a PlainRenderer.
+    """
+    isatty = getattr(stream, 'isatty', None)
+    if cfg.ANSI_RENDERING and isatty is not None and isatty():
+        return AnsiRenderer(stream)
+    return PlainRenderer(stream)
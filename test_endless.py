@@ -0,0 +1,130 @@
+"""
+Tests for the endless board: a board whose memory cap forces chunks out,
+compressed and spilled to disk must play exactly like one that keeps
+everything in memory.
+
+    python -m unittest test_endless
+"""
+
+from __future__ import division
+import random
+import unittest
+from endless import EndlessBoard
+from arrayboard import COVERED, REVEALED, FLAGGED
+
+SIZE = 8
+# Small enough that a few hundred scattered moves overflow it.
+SMALL_CAP = 4
+LARGE_CAP = 100000
+
+def make_pair(seed, density = 0.2):
+    """
+    Return a board with a small memory cap and one with a large cap,
+    both with the given seed and density.
+    """
+    return [EndlessBoard(seed, density, SIZE, cap)
+            for cap in (SMALL_CAP, LARGE_CAP)]
+
+def random_moves(rng, count, reach = 100):
+    """
+    Return count random (action, row, col) moves within reach squares
+    of the origin, so they land in many different chunks.
+    """
+    return [(rng.choice(['safe', 'flag', 'flag', 'unflag']),
+             rng.randrange(-reach, reach), rng.randrange(-reach, reach))
+            for move in range(count)]
+
+def make_move(board, action, r, c):
+    """
+    Make one move on board and return the squares it changed. Mines are
+    never revealed, so the game goes on.
+    """
+    if action == 'safe':
+        if board.has_mine(r, c):
+            return []
+        return board.mark_safe(r, c)
+    if action == 'flag':
+        board.mark_mine(r, c)
+    else:
+        board.unmark_mine(r, c)
+    return [(r, c)]
+
+class EndlessTests(unittest.TestCase):
+    def assertSameSquares(self, first, second, squares):
+        for r, c in squares:
+            self.assertEqual(first.cell(r, c), second.cell(r, c))
+            self.assertEqual(first.has_mine(r, c), second.has_mine(r, c))
+
+    def test_small_cap_plays_like_large_cap(self):
+        small, large = make_pair(1)
+        touched = set()
+        for action, r, c in random_moves(random.Random(1), 600):
+            changed = make_move(small, action, r, c)
+            self.assertEqual(changed, make_move(large, action, r, c))
+            touched.update(changed)
+            touched.add((r, c))
+        self.assertGreater(small.spilled, 0)
+        self.assertEqual(large.spilled, 0)
+        self.assertEqual(len(large.compacted), 0)
+        self.assertEqual((small.revealed, small.flags, small.dead),
+                         (large.revealed, large.flags, large.dead))
+        self.assertSameSquares(small, large, touched)
+
+    def test_eviction_keeps_the_cap(self):
+        board = EndlessBoard(2, 0.2, SIZE, SMALL_CAP)
+        for cx in range(20):
+            board.mark_mine(cx * SIZE, 0)
+            self.assertLessEqual(len(board.chunks) * SIZE ** 2 +
+                                 board.compacted_size,
+                                 SMALL_CAP * SIZE ** 2)
+        self.assertLessEqual(len(board.chunks), SMALL_CAP)
+
+    def test_compressed_marks_round_trip(self):
+        board = EndlessBoard(3, 0.2, SIZE, SMALL_CAP)
+        board.mark_mine(1, 2)
+        board.set_state(5, 6, REVEALED)
+        for cx in range(1, SMALL_CAP + 1):
+            board.state(cx * SIZE, 0)
+        self.assertNotIn((0, 0), board.chunks)
+        self.assertIn((0, 0), board.compacted)
+        self.assertEqual(board.state(1, 2), FLAGGED)
+        self.assertEqual(board.state(5, 6), REVEALED)
+        self.assertEqual(board.state(0, 0), COVERED)
+        self.assertNotIn((0, 0), board.compacted)
+
+    def test_spill_and_unspill(self):
+        board = EndlessBoard(4, 0.2, SIZE, SMALL_CAP)
+        marked = [(cx * SIZE, 3) for cx in range(-30, 30)]
+        for r, c in marked:
+            board.mark_mine(r, c)
+        self.assertGreater(board.spilled, 0)
+        spilled = 'SELECT COUNT(*) FROM chunks WHERE cx = -30 AND cy = 0'
+        self.assertEqual(board.spill_db.execute(spilled).fetchone()[0], 1)
+        self.assertEqual(board.state(-30 * SIZE, 3), FLAGGED)
+        self.assertIn((-30, 0), board.chunks)
+        self.assertEqual(board.spill_db.execute(spilled).fetchone()[0], 0)
+        for r, c in marked:
+            self.assertEqual(board.state(r, c), FLAGGED)
+            self.assertEqual(board.state(r, c + 1), COVERED)
+        self.assertEqual(board.flags, len(marked))
+
+    def test_reveal_limit_across_chunks(self):
+        small, large = make_pair(5, 0)
+        changed = small.mark_safe(0, 0, 50)
+        self.assertEqual(changed, large.mark_safe(0, 0, 50))
+        self.assertEqual(len(changed), 50)
+        revealed = set(changed)
+        for batch in range(20):
+            changed = small.resume(50)
+            self.assertEqual(changed, large.resume(50))
+            self.assertEqual(len(changed), 50)
+            revealed.update(changed)
+        self.assertTrue(small.unfinished)
+        self.assertEqual(len(revealed), 21 * 50)
+        self.assertGreater(len(set((r // SIZE, c // SIZE)
+                                   for r, c in revealed)), SMALL_CAP)
+        self.assertSameSquares(small, large, revealed)
+        self.assertEqual(small.revealed, large.revealed)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,353 @@
+"""
+Behavioral tests run on every board engine in maps.ENGINES.
+
+    python -m unittest test_engines
+"""
+
+from __future__ import division
+import random
+import unittest
+import adjacency
+import config as cfg
+import maps
+
+# A 5 x 5 board with four mines and an open area in its top right.
+LAYOUT = ('10000\n'
+          '00000\n'
+          '00000\n'
+          '00011\n'
+          '00010\n')
+MINES = [(0, 0), (3, 3), (3, 4), (4, 3)]
+# Topologies with their own path through AdjacencyIndex.count_mines:
+# wrapping, steps that depend on the row's parity, steps that skip
+# squares, and steps more than one square away.
+TOPOLOGIES = ['square', 'torus', 'hex', 'knight', 'radius2', 'radius3']
+
+def reference_counts(layout):
+    """
+    Return the number of neighboring mines of every square of a layout,
+    as a list of rows, counted without any engine.
+    """
+    rows = layout.splitlines()
+    height, width = len(rows), len(rows[0])
+    return [[sum(rows[nr][nc] == '1'
+                 for nr in range(max(0, r - 1), min(height, r + 2))
+                 for nc in range(max(0, c - 1), min(width, c + 2))
+                 if (nr, nc) != (r, c))
+             for c in range(width)] for r in range(height)]
+
+def topology_counts(layout, width, height, topology):
+    """
+    Return the number of neighboring mines of every square of a layout,
+    given as a bytearray of 0/1 values, under the named topology, by
+    asking the topology for each square's neighbors.
+    """
+    neighbors = adjacency.get_topology(topology).neighbors
+    return bytearray(sum(layout[nr * width + nc]
+                         for nr, nc in neighbors(r, c, width, height))
+                     for r in range(height) for c in range(width))
+
+def reference_reveal(layout, r, c):
+    """
+    Return the set of squares a click at row r, column c reveals on a
+    layout, with no squares marked yet.
+    """
+    counts = reference_counts(layout)
+    height, width = len(counts), len(counts[0])
+    revealed = set([(r, c)])
+    stack = [(r, c)]
+    while stack:
+        r, c = stack.pop()
+        if counts[r][c]:
+            continue
+        for nr in range(max(0, r - 1), min(height, r + 2)):
+            for nc in range(max(0, c - 1), min(width, c + 2)):
+                if (nr, nc) not in revealed:
+                    revealed.add((nr, nc))
+                    stack.append((nr, nc))
+    return revealed
+
+class EngineTests(object):
+    """
+    The tests every engine must pass; a TestCase is made for each engine
+    below. cfg.CHECK_COUNTERS is on, so every check_win also compares
+    the engine's counters with a full scan of the board.
+    """
+    engine = None
+
+    def setUp(self):
+        self.check_counters = cfg.CHECK_COUNTERS
+        cfg.CHECK_COUNTERS = True
+        self.board = maps.make_board(LAYOUT, self.engine)
+
+    def tearDown(self):
+        cfg.CHECK_COUNTERS = self.check_counters
+
+    def display(self):
+        """
+        Return the board's display as a list of lists.
+        """
+        return [list(row) for row in self.board.display]
+
+    def test_new_board(self):
+        board = self.board
+        self.assertEqual(len(board.territory), 5)
+        self.assertEqual(len(board.territory[0]), 5)
+        self.assertEqual(board.mines_left, len(MINES))
+        self.assertFalse(board.dead)
+        self.assertFalse(board.check_win())
+        self.assertEqual(self.display(), [[cfg.HIDDEN_CHAR] * 5] * 5)
+        for r in range(5):
+            for c in range(5):
+                self.assertEqual(board.has_mine(r, c), (r, c) in MINES)
+
+    def test_reveal_number(self):
+        self.assertEqual(self.board.mark_safe(1, 1), [(1, 1)])
+        self.assertEqual(self.board.display[1][1], 1)
+        self.assertEqual(self.board.mark_safe(1, 1), [])
+        self.assertFalse(self.board.dead)
+
+    def test_flood_fill(self):
+        changed = self.board.mark_safe(0, 4)
+        expected = reference_reveal(LAYOUT, 0, 4)
+        self.assertEqual(sorted(changed), sorted(expected))
+        counts = reference_counts(LAYOUT)
+        for r in range(5):
+            for c in range(5):
+                value = self.board.display[r][c]
+                if (r, c) in expected:
+                    self.assertEqual(value, counts[r][c])
+                else:
+                    self.assertEqual(value, cfg.HIDDEN_CHAR)
+        self.assertEqual(self.board.covered_safe,
+                         25 - len(MINES) - len(expected))
+
+    def test_limited_reveal(self):
+        changed = self.board.mark_safe(0, 4, 3)
+        self.assertEqual(len(changed), 3)
+        while self.board.unfinished:
+            changed += self.board.resume(3)
+        self.assertEqual(sorted(changed),
+                         sorted(reference_reveal(LAYOUT, 0, 4)))
+
+    def test_flag_and_unflag(self):
+        board = self.board
+        board.mark_mine(0, 0)
+        self.assertEqual(board.display[0][0], cfg.MINE_CHAR)
+        self.assertEqual(board.mines_left, len(MINES) - 1)
+        board.mark_mine(2, 2)
+        self.assertEqual(board.mines_left, len(MINES) - 2)
+        board.unmark_mine(2, 2)
+        self.assertEqual(board.display[2][2], cfg.HIDDEN_CHAR)
+        self.assertEqual(board.mines_left, len(MINES) - 1)
+        self.assertEqual((board.correct_flags, board.wrong_flags), (1, 0))
+        self.assertFalse(board.check_win())
+
+    def test_lose(self):
+        self.assertEqual(self.board.mark_safe(3, 3), [(3, 3)])
+        self.assertTrue(self.board.dead)
+        self.assertEqual(self.board.display[3][3], cfg.ERROR_CHAR)
+        self.assertFalse(self.board.check_win())
+
+    def test_win(self):
+        board = self.board
+        for r in range(5):
+            for c in range(5):
+                if (r, c) not in MINES:
+                    board.mark_safe(r, c)
+        self.assertFalse(board.check_win())
+        for r, c in MINES:
+            board.mark_mine(r, c)
+        self.assertTrue(board.check_win())
+        self.assertFalse(board.dead)
+        self.assertEqual(board.mines_left, 0)
+
+    def test_wrong_flag_blocks_win(self):
+        board = self.board
+        board.mark_safe(0, 4)
+        for r, c in MINES:
+            board.mark_mine(r, c)
+        for r in range(5):
+            for c in range(5):
+                if board.display[r][c] == cfg.HIDDEN_CHAR:
+                    board.mark_mine(r, c)
+        self.assertFalse(board.check_win())
+
+    def test_play_undo_redo(self):
+        board = self.board
+        before = self.display()
+        counters = (board.covered_safe, board.covered_mines,
+                    board.correct_flags, board.wrong_flags, board.mines_left)
+        changed = board.play('safe', 0, 4)
+        after = self.display()
+        board.play('flag', 0, 0)
+        self.assertEqual(board.undo(), [(0, 0)])
+        self.assertEqual(self.display(), after)
+        self.assertEqual(sorted(board.undo()), sorted(changed))
+        self.assertEqual(self.display(), before)
+        self.assertEqual((board.covered_safe, board.covered_mines,
+                          board.correct_flags, board.wrong_flags,
+                          board.mines_left), counters)
+        self.assertEqual(board.undo(), [])
+        self.assertEqual(sorted(board.redo()), sorted(changed))
+        self.assertEqual(self.display(), after)
+        self.assertEqual(board.redo(), [(0, 0)])
+        self.assertEqual(board.redo(), [])
+        self.assertFalse(board.check_win())
+
+    def test_undo_loss(self):
+        board = self.board
+        board.play('safe', 3, 3)
+        self.assertTrue(board.dead)
+        board.undo()
+        self.assertFalse(board.dead)
+        self.assertEqual(board.display[3][3], cfg.HIDDEN_CHAR)
+        self.assertFalse(board.check_win())
+
+    def test_chord(self):
+        board = self.board
+        board.mark_safe(1, 1)
+        self.assertEqual(board.chord(1, 1), [])
+        board.mark_mine(0, 0)
+        changed = board.chord(1, 1)
+        self.assertIn((1, 0), changed)
+        self.assertIn((2, 2), changed)
+        self.assertFalse(board.dead)
+        for r, c in [(0, 1), (0, 2), (1, 0), (1, 2), (2, 0), (2, 1), (2, 2)]:
+            self.assertNotEqual(board.display[r][c], cfg.HIDDEN_CHAR)
+        self.assertFalse(board.check_win())
+
+    def test_chord_on_wrong_flag_explodes(self):
+        board = self.board
+        board.mark_safe(1, 1)
+        board.mark_mine(1, 0)
+        board.chord(1, 1)
+        self.assertTrue(board.dead)
+        self.assertEqual(board.display[0][0], cfg.ERROR_CHAR)
+
+    def test_apply_moves(self):
+        board = self.board
+        applied, changed, dead, won = board.apply_moves(
+            [('flag', 0, 0), ('safe', 0, 0), ('unflag', 1, 1),
+             ('safe', 0, 4)])
+        self.assertEqual(applied, 2)
+        self.assertEqual(sorted(divmod(i, 5) for i in changed),
+                         sorted(set([(0, 0)]) |
+                                reference_reveal(LAYOUT, 0, 4)))
+        self.assertEqual((dead, won), (False, False))
+        moves = [('safe', r, c) for r in range(5) for c in range(5)
+                 if (r, c) not in MINES]
+        moves += [('flag', r, c) for r, c in MINES]
+        applied, changed, dead, won = board.apply_moves(moves)
+        self.assertEqual((dead, won), (False, True))
+        self.assertEqual(board.mines_left, 0)
+        self.assertEqual(board.apply_moves([('safe', 1, 1)])[0], 0)
+
+    def test_counters_match_scan(self):
+        board = self.board
+        rng = random.Random(1)
+        for move in range(60):
+            r, c = rng.randrange(5), rng.randrange(5)
+            action = rng.choice(['safe', 'flag', 'unflag', 'chord'])
+            value = board.display[r][c]
+            if action == 'flag' and value != cfg.HIDDEN_CHAR:
+                continue
+            if action == 'unflag' and value != cfg.MINE_CHAR:
+                continue
+            if action == 'safe' and (value != cfg.HIDDEN_CHAR or
+                                     board.has_mine(r, c)):
+                continue
+            board.play(action, r, c)
+            board.check_win()
+            self.assertEqual((board.covered_safe, board.covered_mines,
+                              board.correct_flags, board.wrong_flags),
+                             board.scan_counters())
+
+class TopologyCounts(unittest.TestCase):
+    """
+    AdjacencyIndex.count_mines agrees with the topology's own neighbors
+    on every topology, including boards narrower than its steps.
+    """
+    def test_count_mines(self):
+        rng = random.Random(1)
+        for topology in TOPOLOGIES:
+            for size in range(20):
+                width, height = rng.randint(1, 14), rng.randint(1, 14)
+                layout = bytearray(rng.random() < 0.3
+                                   for i in range(width * height))
+                index = adjacency.index(topology, width, height)
+                self.assertEqual(index.count_mines(layout),
+                                 topology_counts(layout, width, height,
+                                                 topology),
+                                 (topology, width, height))
+
+class EnginesAgree(unittest.TestCase):
+    """
+    Random games played move for move on every engine end up with the
+    same display and counters, under every topology.
+    """
+    def test_random_games(self):
+        self.play_random_games('square', range(20))
+
+    def test_random_games_on_topologies(self):
+        for topology in TOPOLOGIES:
+            self.play_random_games(topology, range(8))
+
+    def play_random_games(self, topology, seeds):
+        """
+        Play a random game under topology for each seed on every engine,
+        checking after each move that the engines agree and that every
+        revealed number is the topology's count of neighboring mines.
+        """
+        for seed in seeds:
+            rng = random.Random(seed)
+            width, height = rng.randint(1, 12), rng.randint(1, 12)
+            mines = rng.randint(0, width * height // 4)
+            boards = [maps.make_board(engine = engine, topology = topology)
+                      for engine in sorted(maps.ENGINES)]
+            for board in boards:
+                board.randomize(width, height, mines, seed = seed)
+            counts = topology_counts(boards[0].layout(), width, height,
+                                     topology)
+            for move in range(40):
+                action = rng.choice(['safe', 'flag', 'unflag', 'chord',
+                                     'undo'])
+                r, c = rng.randrange(height), rng.randrange(width)
+                value = boards[0].display[r][c]
+                if action == 'flag' and value != cfg.HIDDEN_CHAR:
+                    continue
+                if action == 'unflag' and value != cfg.MINE_CHAR:
+                    continue
+                if action == 'safe' and value != cfg.HIDDEN_CHAR:
+                    continue
+                for board in boards:
+                    if action == 'undo':
+                        board.undo()
+                    else:
+                        board.play(action, r, c)
+                first = boards[0]
+                for r in range(height):
+                    for c in range(width):
+                        value = first.display[r][c]
+                        if isinstance(value, int):
+                            self.assertEqual(value, counts[r * width + c])
+                for board in boards[1:]:
+                    self.assertEqual([list(row) for row in board.display],
+                                     [list(row) for row in first.display])
+                    self.assertEqual(
+                        (board.covered_safe, board.covered_mines,
+                         board.correct_flags, board.wrong_flags,
+                         board.mines_left, board.dead),
+                        (first.covered_safe, first.covered_mines,
+                         first.correct_flags, first.wrong_flags,
+                         first.mines_left, first.dead))
+                if first.dead:
+                    break
+
+for _engine in sorted(maps.ENGINES):
+    _name = '{}EngineTests'.format(_engine.capitalize())
+    globals()[_name] = type(_name, (EngineTests, unittest.TestCase),
+                            {'engine': _engine})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+"""
+Tests for reading, replaying and resuming journals.
+
+    python -m unittest test_journal
+"""
+
+from __future__ import division
+import io
+import random
+import unittest
+import config as cfg
+import journal
+import maps
+
+def play_random(board, rng, moves):
+    """
+    Play random moves and undos on board, never revealing a mine.
+    """
+    height, width = len(board.display), len(board.display[0])
+    for move in range(moves):
+        r, c = rng.randrange(height), rng.randrange(width)
+        value = board.display[r][c]
+        if rng.random() < 0.1:
+            board.undo()
+        elif value == cfg.MINE_CHAR:
+            board.play('unflag', r, c)
+        elif value == cfg.HIDDEN_CHAR:
+            board.play('flag' if board.has_mine(r, c) else 'safe', r, c)
+
+class JournalTests(unittest.TestCase):
+    def record(self, moves, seed = 1):
+        """
+        Return a journal of a random game and the board it was played on.
+        """
+        board = maps.make_board(engine = 'array')
+        board.randomize(30, 20, 90, seed = seed)
+        file_obj = io.BytesIO()
+        writer = journal.JournalWriter(file_obj, board, seed = seed,
+                                       snapshot_interval = 25)
+        play_random(board, random.Random(seed), moves)
+        writer.close()
+        return file_obj.getvalue(), board
+
+    def test_replay_matches_game(self):
+        data, board = self.record(300)
+        reader = journal.JournalReader(io.BytesIO(data))
+        self.assertEqual(reader.seed, 1)
+        self.assertEqual(bytes(reader.seek(reader.count).snapshot()),
+                         bytes(board.snapshot()))
+
+    def test_replay_matches_seek(self):
+        data, board = self.record(300)
+        reader = journal.JournalReader(io.BytesIO(data))
+        for number in (0, 1, 24, 25, 26, 100, reader.count):
+            replayed = reader.board('array')
+            reader.replay(replayed, 0, number)
+            self.assertEqual(bytes(replayed.snapshot()),
+                             bytes(reader.seek(number, 'array').snapshot()))
+
+    def test_resume_after_crash(self):
+        data, board = self.record(300)
+        whole = journal.JournalReader(io.BytesIO(data))
+        cut = io.BytesIO(data[:-5])
+        reader = journal.JournalReader(cut)
+        self.assertLess(reader.valid_end, len(data) - 5)
+        self.assertLess(reader.count, whole.count)
+        board = reader.seek(reader.count, 'array')
+        cut.seek(0)
+        writer = journal.JournalWriter(cut, board, resume = True,
+                                       snapshot_interval = 25)
+        self.assertEqual(writer.count, reader.count)
+        play_random(board, random.Random(2), 100)
+        writer.close()
+        resumed = journal.JournalReader(io.BytesIO(cut.getvalue()))
+        self.assertEqual(resumed.valid_end, len(cut.getvalue()))
+        self.assertGreater(resumed.count, reader.count)
+        self.assertEqual(bytes(resumed.seek(resumed.count).snapshot()),
+                         bytes(board.snapshot()))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+"""
+Pre-rendered surfaces for the pygame version of Minesweeper.
+"""
+
+from __future__ import division
+import config as cfg
+import pygame as pg
+
+class TileCache(object):
+    """
+    This class renders each kind of square (a neighbor count, a flag or
+    an error) once per square size and color theme, and each piece of
+    text once per font and color, so drawing a frame only needs blits.
+    """
+    def __init__(self, font, colors = None, text_colors = None):
+        """
+        Create an empty cache that renders numbers with the given font.
+        """
+        self.font = font
+        self.width = 0
+        self.height = 0
+        self.tiles = {}
+        self.texts = {}
+        self.set_theme(colors or cfg.COLORS, text_colors or cfg.TEXT_COLORS)
+
+    def set_size(self, width, height):
+        """
+        Set the square size. Tiles are rebuilt only if the size changed.
+        """
+        width = int(round(width))
+        height = int(round(height))
+        if (width, height) != (self.width, self.height):
+            self.width = width
+            self.height = height
+            self.tiles = {}
+
+    def set_theme(self, colors, text_colors):
+        """
+        Use new square and text color mappings, like cfg.COLORS and
+        cfg.TEXT_COLORS, and drop the tiles drawn with the old ones.
+        """
+        self.colors = colors
+        self.text_colors = text_colors
+        self.tiles = {}
+
+    def tile(self, value):
+        """
+        Return the surface for a square whose display value is value.
+        """
+        surface = self.tiles.get(value)
+        if surface is None:
+            surface = self.tiles[value] = self.render_tile(value)
+        return surface
+
+    def text(self, font, message, color):
+        """
+        Return the rendered surface for a piece of text.
+        """
+        key = (font, message, color)
+        surface = self.texts.get(key)
+        if surface is None:
+            if len(self.texts) >= cfg.TEXT_CACHE_SIZE:
+                self.texts = {}
+            surface = self.texts[key] = font.render(message, True, color)
+        return surface
+
+    def render_tile(self, value):
+        """
+        Draw a new surface for a square whose display value is value.
+        Counts past the largest one in the theme, which some topologies
+        reach, take the colors of the largest.
+        """
+        style = value
+        if value not in self.colors:
+            style = max(key for key in self.colors if isinstance(key, int))
+        surface = pg.Surface((self.width, self.height))
+        surface.fill(self.colors[style])
+        if value == cfg.MINE_CHAR:
+            self.draw_flag(surface)
+        elif value == cfg.ERROR_CHAR:
+            self.draw_error(surface)
+        elif style in self.text_colors:
+            text = self.font.render(str(value), True, self.text_colors[style])
+            x = self.width / 2 - text.get_width() / 2
+            y = self.height / 2 - text.get_height() / 2
+            surface.blit(text, [x, y])
+        return surface
+
+    def draw_flag(self, surface):
+        """
+        Draw a flag image on a square surface.
+        """
+        pg.draw.rect(surface, cfg.RED, [self.width / 4, self.height / 4,
+                                        self.width / 2, self.height / 2])
+        pg.draw.rect(surface, cfg.BLACK, [self.width / 3, self.height / 3,
+                                          self.width / 3, self.height / 3])
+
+    def draw_error(self, surface):
+        """
+        Draw a big 'X' on a square surface, for a square the player
+        mistakenly marked safe.
+        """
+        pg.draw.line(surface, cfg.RED, [self.width / 4, self.height / 4],
+                     [3 * self.width / 4, 3 * self.height / 4], 10)
+        pg.draw.line(surface, cfg.RED, [self.width / 4, 3 * self.height / 4],
+                     [3 * self.width / 4, self.height / 4], 10)